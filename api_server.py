@@ -0,0 +1,356 @@
+"""
+Async HTTP API for sales briefs, follow-up Q&A and interview questions.
+
+Exposes utils.services to callers outside Streamlit: the CRM, scripts, and
+the Streamlit apps themselves when JOBREADY_API_URL points here. Run several
+workers; they share the page, brief and PDF caches, the chat sessions and
+the LLM admission slots through the SQLite files under JOBREADY_CACHE_DIR.
+
+Backpressure: each worker runs at most API_MAX_ACTIVE requests and queues up
+to API_MAX_QUEUED more. A request arriving at a full queue gets 429. A
+request that waits longer than API_QUEUE_TIMEOUT_SECONDS, or gets no LLM slot
+(LLM_MAX_IN_FLIGHT across workers) within LLM_SLOT_TIMEOUT_SECONDS, gets 503.
+Both come with Retry-After. A question whose turn loses the race against
+another question on the same session gets 409 and can simply be asked again.
+
+Endpoints take and return JSON. With "stream": true, brief and ask return
+NDJSON lines: {"token": ...} per token, then {"result": ...}, or
+{"error": ..., "status": ...} if the request fails midway.
+
+    GET    /healthz
+    GET    /v1/stats
+    POST   /v1/brief                  timespro_url, competitor_url, model, use_cache, session_id, stream
+    POST   /v1/preview                program_url, competitor_url
+    POST   /v1/sessions               program_url, competitor_url, extra_programs, brief
+    GET    /v1/sessions/{id}
+    PATCH  /v1/sessions/{id}          program_url, competitor_url, extra_programs, brief
+    DELETE /v1/sessions/{id}
+    POST   /v1/sessions/{id}/ask      question, stream
+    POST   /v1/interview-questions    job_id, job_description or pdf_base64, num_questions, system_prompt, model
+
+Usage:
+    GCP_SERVICE_ACCOUNT_FILE=sa.json python api_server.py --port 8000 --workers 4
+    JOBREADY_API_URL=http://localhost:8000 streamlit run chatbot_app.py
+"""
+import os
+
+# Workers share LLM admission slots; must be set before utils.presence is imported.
+os.environ.setdefault("PRESENCE_BACKEND", "sqlite")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import base64  # noqa: E402
+import binascii  # noqa: E402
+import contextlib  # noqa: E402
+import functools  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.background import BackgroundTask  # noqa: E402
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import JSONResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from utils import services  # noqa: E402
+from utils.interview import DEFAULT_SYSTEM_PROMPT  # noqa: E402
+from utils.llm_clients import LLMBusyError  # noqa: E402
+from utils.sessions import SESSION_FIELDS, SessionConflict, SessionNotFound  # noqa: E402
+
+API_MAX_ACTIVE = int(os.environ.get("API_MAX_ACTIVE", 8))
+API_MAX_QUEUED = int(os.environ.get("API_MAX_QUEUED", 32))
+API_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("API_QUEUE_TIMEOUT_SECONDS", 30))
+RETRY_AFTER_SECONDS = 5
+
+
+class QueueFull(Exception):
+    pass
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class RequestQueue:
+    """Per-worker admission: `max_active` requests run, `max_queued` wait, the rest are refused."""
+
+    def __init__(self, max_active: int, max_queued: int, timeout: float):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise QueueFull(f"{self.queued} requests already queued")
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueTimeout(f"Waited {self.timeout:.0f}s for a free worker slot")
+        finally:
+            self.queued -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active, "queued": self.queued, "rejected": self.rejected,
+            "max_active": self.max_active, "max_queued": self.max_queued,
+        }
+
+
+request_queue = RequestQueue(API_MAX_ACTIVE, API_MAX_QUEUED, API_QUEUE_TIMEOUT_SECONDS)
+
+
+def _status_for(error: Exception) -> int:
+    if isinstance(error, QueueFull):
+        return 429
+    if isinstance(error, (QueueTimeout, LLMBusyError)):
+        return 503
+    if isinstance(error, SessionNotFound):
+        return 404
+    if isinstance(error, SessionConflict):
+        return 409
+    if isinstance(error, (ValueError, KeyError, binascii.Error)):
+        return 400
+    return 500
+
+
+def _error_response(error: Exception) -> JSONResponse:
+    status = _status_for(error)
+    if isinstance(error, SessionNotFound):
+        message = f"Unknown or expired session {error.args[0]}"
+    elif isinstance(error, KeyError):
+        message = f"Missing field {error.args[0]!r}"
+    else:
+        message = str(error) or type(error).__name__
+    headers = {"Retry-After": str(RETRY_AFTER_SECONDS)} if status in (429, 503) else None
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+def endpoint(queued: bool = True):
+    """Maps service errors to HTTP statuses; `queued` endpoints take a RequestQueue slot."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request: Request):
+            release = None
+            try:
+                if queued:
+                    await request_queue.acquire()
+                    release = _once(request_queue.release)
+                response = await handler(request, release)
+            except Exception as e:
+                if release is not None:
+                    release()
+                return _error_response(e)
+            # Streams hold their slot until the body is sent (see _stream).
+            if release is not None and not isinstance(response, StreamingResponse):
+                release()
+            return response
+        return wrapper
+    return decorate
+
+
+def _once(fn):
+    done = []
+
+    def call():
+        if not done:
+            done.append(True)
+            fn()
+    return call
+
+
+def _line(**payload) -> bytes:
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+
+_END = object()
+
+
+async def _stream(make_tokens, final, release) -> StreamingResponse:
+    """
+    Start a token stream and return it as NDJSON.
+
+    The first token is pulled before the response starts, so errors raised
+    up front (unknown session, no LLM slot) still become proper HTTP statuses.
+    """
+    tokens = iter(await run_in_threadpool(make_tokens))
+    first = await run_in_threadpool(next, tokens, _END)
+
+    async def body():
+        try:
+            if first is not _END:
+                yield _line(token=first)
+                async for token in iterate_in_threadpool(tokens):
+                    yield _line(token=token)
+            yield _line(result=final())
+        except Exception as e:
+            yield _line(error=str(e) or type(e).__name__, status=_status_for(e))
+        finally:
+            release()
+
+    # The background task also releases the slot when the client disconnects mid-stream.
+    return StreamingResponse(body(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+
+async def _json(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    return body
+
+
+@endpoint(queued=False)
+async def healthz(request, release):
+    return JSONResponse({"status": "ok", "queue": request_queue.stats()})
+
+
+@endpoint(queued=False)
+async def stats(request, release):
+    return JSONResponse({**await run_in_threadpool(services.stats), "queue": request_queue.stats()})
+
+
+@endpoint()
+async def brief(request, release):
+    body = await _json(request)
+    args = dict(
+        timespro_url=body["timespro_url"],
+        competitor_url=body["competitor_url"],
+        model=body.get("model", "gpt-4o"),
+        use_cache=body.get("use_cache", True),
+    )
+    session_id = body.get("session_id")
+    if body.get("stream"):
+        response = {}
+
+        def start():
+            response["brief"] = services.stream_brief(**args, session_id=session_id)
+            return response["brief"]
+        return await _stream(start, lambda: {"brief": response["brief"].text}, release)
+
+    text = await run_in_threadpool(services.generate_brief, **args)
+    if session_id:
+        await run_in_threadpool(services.update_session, session_id, brief=text)
+    return JSONResponse({"brief": text})
+
+
+@endpoint()
+async def preview(request, release):
+    body = await _json(request)
+    return JSONResponse(
+        await run_in_threadpool(services.preview, body["program_url"], body.get("competitor_url", ""))
+    )
+
+
+@endpoint()
+async def create_session(request, release):
+    body = await _json(request)
+    session = await run_in_threadpool(
+        services.create_session,
+        body["program_url"],
+        body.get("competitor_url", ""),
+        body.get("extra_programs", []),
+        body.get("brief", ""),
+    )
+    return JSONResponse(session, status_code=201)
+
+
+@endpoint(queued=False)
+async def get_session(request, release):
+    return JSONResponse(await run_in_threadpool(services.get_session, request.path_params["session_id"]))
+
+
+@endpoint()
+async def update_session(request, release):
+    body = await _json(request)
+    fields = {name: body[name] for name in SESSION_FIELDS if name in body}
+    return JSONResponse(
+        await run_in_threadpool(functools.partial(services.update_session, request.path_params["session_id"], **fields))
+    )
+
+
+@endpoint(queued=False)
+async def delete_session(request, release):
+    await run_in_threadpool(services.delete_session, request.path_params["session_id"])
+    return JSONResponse({"deleted": request.path_params["session_id"]})
+
+
+@endpoint()
+async def ask(request, release):
+    session_id = request.path_params["session_id"]
+    body = await _json(request)
+    question = body["question"]
+    if body.get("stream"):
+        result = {}
+        return await _stream(
+            lambda: services.stream_ask(session_id, question, result), lambda: result["output"], release
+        )
+    return JSONResponse(await run_in_threadpool(services.ask, session_id, question))
+
+
+@endpoint()
+async def interview_questions(request, release):
+    body = await _json(request)
+    pdf_bytes = base64.b64decode(body["pdf_base64"], validate=True) if body.get("pdf_base64") else None
+    questions = await run_in_threadpool(
+        services.interview_questions,
+        str(body["job_id"]),
+        body.get("job_description", ""),
+        pdf_bytes,
+        int(body.get("num_questions", 10)),
+        body.get("system_prompt") or DEFAULT_SYSTEM_PROMPT,
+        body.get("model", "gpt-4"),
+    )
+    return JSONResponse({"job_id": body["job_id"], "questions": questions})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Fill the vectorstore mirror and program index before the first request needs them.
+    services.prefetch()
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/healthz", healthz),
+    Route("/v1/stats", stats),
+    Route("/v1/brief", brief, methods=["POST"]),
+    Route("/v1/preview", preview, methods=["POST"]),
+    Route("/v1/sessions", create_session, methods=["POST"]),
+    Route("/v1/sessions/{session_id}", get_session, methods=["GET"]),
+    Route("/v1/sessions/{session_id}", update_session, methods=["PATCH"]),
+    Route("/v1/sessions/{session_id}", delete_session, methods=["DELETE"]),
+    Route("/v1/sessions/{session_id}/ask", ask, methods=["POST"]),
+    Route("/v1/interview-questions", interview_questions, methods=["POST"]),
+])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the JobReady HTTP API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,14 @@
 import streamlit as st
-import PyPDF2
 import openai
 
-openai.api_key = st.secrets["openai"]["api_key"]
+from utils.api_client import get_client
+from utils.llm_clients import LLMBusyError
+from utils.s3_store import read_upload
 
-def extract_text_from_pdf(pdf_file):
-    """Extracts text from an uploaded PDF file."""
-    reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text.strip()
+openai.api_key = st.secrets["openai"]["api_key"]
 
-def generate_questions(job_description, job_id):
-    """Generates 10 interview questions using GPT-4 based on the job description and job ID."""
-    prompt = f"""
-    You are a hiring manager creating interview questions for a job candidate.
-    Based on the following job description and job ID, generate 10 relevant and thoughtful interview questions.
-    
-    ### Job Description:
-    {job_description}
-    
-    ### Job ID:
-    {job_id}
-    
-    The questions should assess technical skills, job-specific knowledge, and behavioral traits.
-    
-    Respond ONLY with a numbered list of 10 questions.
-    """
-    
-    response = openai.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an expert recruiter generating job interview questions."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    
-    questions = response.choices[0].message.content.strip()
-    return questions.split("\n")  # Splitting numbered questions into a list
+# Calls the JobReady API when JOBREADY_API_URL is set, else generates in this process.
+client = get_client()
 
 # Streamlit UI
 st.title("AI Interview Question Generator")
@@ -49,11 +19,15 @@ job_desc_file = st.file_uploader("Upload Job Description (PDF)", type=["pdf"])
 job_id = st.text_input("Enter Job ID")
 
 if job_desc_file and job_id:
-    job_description = extract_text_from_pdf(job_desc_file)
+    file_data = read_upload(job_desc_file)
     
     if st.button("Generate Interview Questions"):
         with st.spinner("Generating questions..."):
-            questions = generate_questions(job_description, job_id)
+            try:
+                questions = client.interview_questions(job_id, pdf_bytes=file_data, num_questions=10)
+            except LLMBusyError:
+                st.warning("⏳ The question generator is busy right now. Please try again in a moment.")
+                st.stop()
             st.subheader("Generated Interview Questions:")
             for question in questions:
                 st.write(question)
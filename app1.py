@@ -1,30 +1,27 @@
 import streamlit as st
-import boto3
 import os
 from botocore.exceptions import NoCredentialsError
 
+from utils.s3_store import JOB_BUCKET, get_s3_store, job_description_key, read_upload
+
 # Load AWS credentials from Streamlit secrets
 AWS_ACCESS_KEY_ID = st.secrets["aws"]["AWS_ACCESS_KEY"]
 AWS_SECRET_ACCESS_KEY = st.secrets["aws"]["AWS_SECRET_KEY"]
 AWS_REGION = st.secrets["aws"]["REGION_NAME"]
 
-def upload_to_s3(file, job_id):
-    """Welcome to JobReady AI question generator"""
-    bucket_name = "tensorflow-titans-bucket"
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_REGION
-    )
-    
-    file_extension = file.name.split('.')[-1]
-    s3_filename = f"job_descriptions/{job_id}.{file_extension}"
-    
+# Shared across reruns and sessions, so the boto3 client and its connections are reused.
+s3_store = get_s3_store(
+    JOB_BUCKET,
+    aws_access_key_id=AWS_ACCESS_KEY_ID,
+    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+    region_name=AWS_REGION,
+)
+
+def upload_to_s3(data, filename, job_id):
+    """Uploads the file to S3 unless identical content is already stored; returns the UploadResult."""
+    file_extension = filename.split('.')[-1]
     try:
-        s3.upload_fileobj(file, bucket_name, s3_filename)
-        file_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_filename}"
-        return file_url
+        return s3_store.upload(job_description_key(job_id, file_extension), data, content_type="application/pdf")
     except NoCredentialsError:
         st.error("AWS credentials not found. Please configure them correctly.")
         return None
@@ -41,9 +38,13 @@ job_id = st.text_input("Enter Job ID from the SenseHQ portal:", "")
 uploaded_file = st.file_uploader("Upload the job description PDF file", type=["pdf"])
 
 if uploaded_file and job_id:
+    # Read once into bytes that can be re-read, unlike the upload's file object.
+    file_data = read_upload(uploaded_file)
     if st.button("Upload file to JobReady system"):
-        file_url = upload_to_s3(uploaded_file, job_id)
-        if file_url:
-            st.success(f"File successfully uploaded! [View File]({file_url})")
+        upload = upload_to_s3(file_data, uploaded_file.name, job_id)
+        if upload and upload.skipped:
+            st.info(f"This file is already in the JobReady system. [View File]({upload.url})")
+        elif upload:
+            st.success(f"File successfully uploaded! [View File]({upload.url})")
 else:
     st.warning("Please enter a Job ID and upload a PDF file.")
@@ -1,74 +1,41 @@
 import streamlit as st
-import boto3
 import os
-import PyPDF2
 import openai
 from botocore.exceptions import NoCredentialsError
 
+from utils.api_client import get_client
+from utils.llm_clients import LLMBusyError
+from utils.s3_store import JOB_BUCKET, get_s3_store, job_description_key, read_upload
+
 # Load AWS credentials from Streamlit secrets
 AWS_ACCESS_KEY_ID = st.secrets["aws"]["AWS_ACCESS_KEY"]
 AWS_SECRET_ACCESS_KEY = st.secrets["aws"]["AWS_SECRET_KEY"]
 AWS_REGION = st.secrets["aws"]["REGION_NAME"]
 
+# Shared across reruns and sessions, so the boto3 client and its connections are reused.
+s3_store = get_s3_store(
+    JOB_BUCKET,
+    aws_access_key_id=AWS_ACCESS_KEY_ID,
+    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+    region_name=AWS_REGION,
+)
+
 openai.api_key = st.secrets["openai"]["api_key"]
 
-def upload_to_s3(file, job_id):
-    """Uploads the file to S3 and returns the file URL."""
-    bucket_name = "tensorflow-titans-bucket"
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_REGION
-    )
-    
-    file_extension = file.name.split('.')[-1]
-    s3_filename = f"job_descriptions/{job_id}.{file_extension}"
-    
+# Calls the JobReady API when JOBREADY_API_URL is set, else generates in this process.
+client = get_client()
+
+APP_SYSTEM_PROMPT = "You are an expert recruiter and content generator generating job interview questions."
+
+def upload_to_s3(data, filename, job_id):
+    """Uploads the file to S3 unless identical content is already stored; returns the UploadResult."""
+    file_extension = filename.split('.')[-1]
     try:
-        s3.upload_fileobj(file, bucket_name, s3_filename)
-        file_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_filename}"
-        return file_url
+        return s3_store.upload(job_description_key(job_id, file_extension), data, content_type="application/pdf")
     except NoCredentialsError:
         st.error("AWS credentials not found. Please configure them correctly.")
         return None
 
-def extract_text_from_pdf(pdf_file):
-    """Extracts text from an uploaded PDF file."""
-    reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text.strip()
-
-def generate_questions(job_description, job_id):
-    """Generates 5 interview questions using GPT-4 based on the job description and job ID."""
-    prompt = f"""
-    You are a hiring manager creating interview questions for a job candidate.
-    Based on the following job description and job ID, generate 5 relevant and thoughtful interview questions.
-    
-    ### Job Description:
-    {job_description}
-    
-    ### Job ID:
-    {job_id}
-    
-    The questions should assess technical skills, job-specific knowledge, and behavioral traits.
-    
-    Respond ONLY with a numbered list of 5 questions.
-    """
-    
-    response = openai.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an expert recruiter and content generator generating job interview questions."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    
-    questions = response.choices[0].message.content.strip()
-    return questions.split("\n")
-
 # Streamlit UI
 st.title("JobReady HR portal ")
 
@@ -81,15 +48,24 @@ job_id = st.text_input("Enter Job ID from the SenseHQ portal:", "")
 uploaded_file = st.file_uploader("Upload the job description PDF file", type=["pdf"])
 
 if uploaded_file and job_id:
+    # Read once; the bytes feed both the upload and text extraction.
+    file_data = read_upload(uploaded_file)
     if st.button("Upload file to JobReady system"):
-        file_url = upload_to_s3(uploaded_file, job_id)
-        if file_url:
-            st.success(f"File successfully uploaded! [View File]({file_url})")
+        upload = upload_to_s3(file_data, uploaded_file.name, job_id)
+        if upload and upload.skipped:
+            st.info(f"This file is already in the JobReady system. [View File]({upload.url})")
+        elif upload:
+            st.success(f"File successfully uploaded! [View File]({upload.url})")
 
     if st.button("Generate Interview Questions"):
         with st.spinner("Generating questions..."):
-            job_description = extract_text_from_pdf(uploaded_file)
-            questions = generate_questions(job_description, job_id)
+            try:
+                questions = client.interview_questions(
+                    job_id, pdf_bytes=file_data, num_questions=5, system_prompt=APP_SYSTEM_PROMPT
+                )
+            except LLMBusyError:
+                st.warning("⏳ The question generator is busy right now. Please try again in a moment.")
+                st.stop()
             st.subheader("Generated Interview Questions:")
             for question in questions:
                 st.write(question)
@@ -0,0 +1,178 @@
+"""
+Bulk interview-question generation for every job description in the bucket.
+
+Lists the job_descriptions/ prefix, then pipelines each job through three
+pools: downloads (threads), PDF text extraction (processes) and question
+generation (threads, under a request-rate limit, retrying transient API
+errors). A job moves to the next pool as soon as its current stage finishes,
+and at most --max-in-flight jobs are in the pipeline at once, so memory stays
+bounded however large the backlog. Each result is written next to its JD as
+job_descriptions/<job_id>.questions.json. Reruns skip jobs that already have a
+result, so an interrupted batch can simply be started again.
+
+Usage:
+    python batch_generate_questions.py
+    python batch_generate_questions.py --concurrency 8 --requests-per-minute 200
+    python batch_generate_questions.py --local-root ./s3_local   # local S3 stand-in
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import posixpath
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+from utils.interview import DEFAULT_SYSTEM_PROMPT, RETRYABLE_ERRORS, generate_questions
+from utils.pdf_extract import extract_pdf_text
+from utils.retry import retry_with_backoff
+from utils.s3_store import JOB_BUCKET, JOB_DESCRIPTIONS_PREFIX, LocalObjectStore, S3Store
+
+RESULT_SUFFIX = ".questions.json"
+
+
+def result_key(jd_key: str) -> str:
+    return posixpath.splitext(jd_key)[0] + RESULT_SUFFIX
+
+
+def job_id_for(jd_key: str) -> str:
+    return posixpath.splitext(posixpath.basename(jd_key))[0]
+
+
+def _extract(data: bytes) -> str:
+    # Top-level so the process pool can pickle it; already in a worker, so no nested pool.
+    return extract_pdf_text(data, parallel=False)
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, job_id: str, error: Exception = None):
+        with self._lock:
+            if error is None:
+                self.done += 1
+            else:
+                self.failed += 1
+            finished = self.done + self.failed
+            status = "ok" if error is None else f"FAILED: {error}"
+            print(f"[{finished}/{self.total}] {job_id} {status} ({self.jobs_per_minute():.1f} jobs/min)", flush=True)
+
+    def jobs_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.start
+        return self.done / elapsed * 60 if elapsed > 0 else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate interview questions for every job description.")
+    parser.add_argument("--bucket", default=JOB_BUCKET)
+    parser.add_argument("--prefix", default=JOB_DESCRIPTIONS_PREFIX)
+    parser.add_argument("--local-root", help="Use a local directory as the bucket store instead of S3")
+    parser.add_argument("--num-questions", type=int, default=10)
+    parser.add_argument("--model", default="gpt-4")
+    parser.add_argument("--download-workers", type=int, default=8, help="Concurrent PDF downloads")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 2, help="PDF extraction processes")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent generation requests")
+    parser.add_argument("--requests-per-minute", type=float, default=60, help="Generation request rate limit")
+    parser.add_argument("--retries", type=int, default=5, help="Attempts per generation request")
+    parser.add_argument("--max-in-flight", type=int, help="Jobs in the pipeline at once (default: 2x all workers)")
+    parser.add_argument("--limit", type=int, help="Process at most this many pending jobs")
+    parser.add_argument("--force", action="store_true", help="Regenerate jobs that already have results")
+    args = parser.parse_args(argv)
+
+    store = LocalObjectStore(args.local_root, args.bucket) if args.local_root else S3Store(args.bucket)
+    keys = list(store.list_keys(args.prefix))
+    jd_keys = [k for k in keys if k.lower().endswith(".pdf")]
+    finished = set(k for k in keys if k.endswith(RESULT_SUFFIX))
+    pending = [k for k in jd_keys if args.force or result_key(k) not in finished]
+    print(f"{len(jd_keys)} job descriptions, {len(jd_keys) - len(pending)} already done, {len(pending)} to generate")
+    if args.limit:
+        pending = pending[: args.limit]
+    if not pending:
+        return 0
+
+    limiter = InMemoryRateLimiter(
+        requests_per_second=args.requests_per_minute / 60, check_every_n_seconds=0.05, max_bucket_size=1
+    )
+    progress = Progress(len(pending))
+
+    def generate(jd_key: str, source_sha256: str, text: str):
+        job_id = job_id_for(jd_key)
+
+        def call():
+            limiter.acquire()
+            return generate_questions(text, job_id, args.num_questions, DEFAULT_SYSTEM_PROMPT, args.model)
+
+        questions = retry_with_backoff(call, attempts=args.retries, retry_on=RETRYABLE_ERRORS)
+        result = {
+            "job_id": job_id,
+            "source_key": jd_key,
+            "source_sha256": source_sha256,
+            "model": args.model,
+            "questions": questions,
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        store.put_bytes(result_key(jd_key), json.dumps(result, indent=2).encode("utf-8"), "application/json")
+
+    # Downloads and generation wait on the network (threads); extraction is CPU-bound (processes).
+    # One loop over every stage's futures hands each job on the moment its stage finishes.
+    max_in_flight = args.max_in_flight or 2 * (args.download_workers + args.extract_workers + args.concurrency)
+    jobs = iter(pending)
+    running = {}  # future -> (stage, jd_key, source_sha256)
+    # forkserver: the download threads are already running when extraction workers start.
+    with ThreadPoolExecutor(max_workers=args.download_workers) as download_pool, \
+            ProcessPoolExecutor(max_workers=args.extract_workers,
+                                mp_context=multiprocessing.get_context("forkserver")) as extract_pool, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as generate_pool:
+
+        def admit_next():
+            key = next(jobs, None)
+            if key is not None:
+                running[download_pool.submit(store.get_bytes, key)] = ("download", key, None)
+
+        for _ in range(max_in_flight):
+            admit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key, digest = running.pop(future)
+                try:
+                    if stage == "download":
+                        data = future.result()
+                        # Only the digest outlives this step; the bytes go to the extractor and are dropped.
+                        digest = hashlib.sha256(data).hexdigest()
+                        running[extract_pool.submit(_extract, data)] = ("extract", key, digest)
+                        del data
+                        continue
+                    if stage == "extract":
+                        text = future.result()
+                        if not text:
+                            raise ValueError("no extractable text in PDF")
+                        running[generate_pool.submit(generate, key, digest, text)] = ("generate", key, digest)
+                        continue
+                    future.result()
+                    progress.record(job_id_for(key))
+                except Exception as e:
+                    progress.record(job_id_for(key), e)
+                # The job has left the pipeline; let the next one in.
+                admit_next()
+
+    print(
+        f"\nGenerated {progress.done}, failed {progress.failed} in "
+        f"{time.monotonic() - progress.start:.1f}s ({progress.jobs_per_minute():.1f} jobs/min)"
+    )
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Recall / latency / memory comparison of ANN index types over vectorstores/*.
+
+Loads the embeddings of every program folder (embeddings.npy when the folder
+was built by build_vectorstores.py, otherwise reconstructed from the flat
+index), optionally grows the corpus to --scale vectors with jittered copies to
+approximate the full catalog plus competitor pages, and builds each index
+configuration from utils.ann. Queries are corpus vectors with Gaussian noise
+added, standing in for paraphrased questions, so no embedding API calls are
+made. For each configuration it reports recall@k against exact flat search,
+single-query p50/p95 latency, build time and serialized index size.
+
+Usage (from the repo root):
+    python -m benchmarks.ann_benchmark
+    python -m benchmarks.ann_benchmark --scale 50000 --k 10 --queries 500
+    python -m benchmarks.ann_benchmark --configs configs.json --output ann.json
+
+--configs is a JSON list of {"name": ..., "type": ..., "params": {...}}.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from utils.ann import build_index, index_memory_bytes
+
+DEFAULT_CONFIGS = [
+    {"name": "flat", "type": "flat", "params": {}},
+    {"name": "ivf-nprobe4", "type": "ivf", "params": {"nlist": 256, "nprobe": 4}},
+    {"name": "ivf-nprobe16", "type": "ivf", "params": {"nlist": 256, "nprobe": 16}},
+    {"name": "ivfpq-m64", "type": "ivfpq", "params": {"nlist": 256, "m": 64, "nbits": 8, "nprobe": 16}},
+    {"name": "pq-m96", "type": "pq", "params": {"m": 96, "nbits": 8}},
+    {"name": "sq8", "type": "sq", "params": {"qtype": "QT_8bit"}},
+    {"name": "sq-fp16", "type": "sq", "params": {"qtype": "QT_fp16"}},
+    {"name": "hnsw-M16-ef32", "type": "hnsw", "params": {"M": 16, "ef_construction": 80, "ef_search": 32}},
+    {"name": "hnsw-M32-ef128", "type": "hnsw", "params": {"M": 32, "ef_construction": 120, "ef_search": 128}},
+]
+
+
+def load_vectors(root: str) -> np.ndarray:
+    matrices = []
+    for folder in sorted(glob.glob(os.path.join(root, "*"))):
+        vectors_path = os.path.join(folder, "embeddings.npy")
+        index_path = os.path.join(folder, "index.faiss")
+        if os.path.exists(vectors_path):
+            matrices.append(np.load(vectors_path))
+        elif os.path.exists(index_path):
+            index = faiss.read_index(index_path)
+            matrices.append(index.reconstruct_n(0, index.ntotal))
+    if not matrices:
+        raise SystemExit(f"No vectorstores found under {root}")
+    return np.ascontiguousarray(np.vstack(matrices), dtype="float32")
+
+
+def jitter(vectors: np.ndarray, count: int, noise: float, rng) -> np.ndarray:
+    """`count` rows drawn from `vectors` with noise proportional to the mean row norm."""
+    rows = vectors[rng.integers(0, len(vectors), size=count)]
+    scale = noise * float(np.linalg.norm(vectors, axis=1).mean()) / np.sqrt(vectors.shape[1])
+    return (rows + rng.normal(0, scale, size=rows.shape)).astype("float32")
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def evaluate(config: dict, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    start = time.perf_counter()
+    index, params = build_index(corpus, config["type"], config.get("params"))
+    build_seconds = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for row, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids[0].tolist()) & set(truth[row].tolist()))
+    return {
+        "name": config["name"],
+        "type": config["type"],
+        "params": params,
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "build_s": round(build_seconds, 2),
+        "index_mb": round(index_memory_bytes(index) / 1024 / 1024, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare ANN index types on the program vectorstores.")
+    parser.add_argument("--vectorstores", default="vectorstores", help="Folder of program vectorstores")
+    parser.add_argument("--scale", type=int, default=0, help="Grow the corpus to this many vectors (0 = as shipped)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.3, help="Query/corpus jitter relative to vector norm")
+    parser.add_argument("--configs", help="JSON file with the configurations to compare")
+    parser.add_argument("--only", nargs="*", help="Run only these configuration names")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (1 = like one app query)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(args.seed)
+    corpus = load_vectors(args.vectorstores)
+    shipped = len(corpus)
+    if args.scale > shipped:
+        corpus = np.vstack([corpus, jitter(corpus, args.scale - shipped, args.noise, rng)])
+    queries = jitter(corpus, args.queries, args.noise, rng)
+    k = min(args.k, len(corpus))
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, k)
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+    if args.only:
+        configs = [c for c in configs if c["name"] in args.only]
+
+    print(f"{len(corpus)} vectors ({shipped} shipped) x {corpus.shape[1]} dims, {len(queries)} queries, k={k}\n")
+    results = []
+    for config in configs:
+        result = evaluate(config, corpus, queries, truth, k)
+        results.append(result)
+        print(
+            f"{result['name']:<18} recall@{k} {result[f'recall@{k}']:6.3f}  "
+            f"p50 {result['p50_ms']:8.3f} ms  p95 {result['p95_ms']:8.3f} ms  "
+            f"build {result['build_s']:6.2f} s  index {result['index_mb']:8.2f} MB",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"vectors": len(corpus), "queries": len(queries), "k": k, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Offline end-to-end benchmarks for the compare / ask flows.
+
+Runs load_vectorstore_from_gcp, load_url_content, get_combined_response, the
+follow-up answer pipeline and Logger.write_to_gcs against local stand-ins
+(benchmarks/standins.py) and reports p50/p95 latency, throughput and peak
+Python memory per scenario. Results are checked against
+benchmarks/baselines.json; any scenario slower or bigger than its baseline
+by more than --tolerance fails the run.
+
+Usage (from the repo root):
+    python -m benchmarks.run
+    python -m benchmarks.run --iterations 50 --llm-latency 0.5
+    python -m benchmarks.run --update-baselines
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+WORKDIR = tempfile.mkdtemp(prefix="jobready-bench-")
+# Must be set before the app modules create their DiskCaches.
+os.environ["JOBREADY_CACHE_DIR"] = os.path.join(WORKDIR, "cache")
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+
+import gcsfs  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+import custom_logger  # noqa: E402
+import load_vectorstore_from_gcp as lvg  # noqa: E402
+from benchmarks.standins import FakeChatModel, LocalGCSFileSystem, PageServer, seed_gcs, write_saved_pages  # noqa: E402
+from utils import fetcher, hybrid, llm_chain, llm_clients, loaders  # noqa: E402
+from utils.answer_pipeline import AnswerPipeline  # noqa: E402
+from utils.memory import TokenBudgetMemory, build_static_context  # noqa: E402
+from utils.program_index import ProgramIndex  # noqa: E402
+from utils.retrieval import BudgetedRetriever  # noqa: E402
+from utils.vectorstore_mirror import get_mirror  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+BUCKET = "bench-bucket"
+PREFIX = "bench_vectorstores"
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(fn, iterations: int, setup=None, concurrency: int = 1) -> dict:
+    """Latency from a sequential pass; throughput from a concurrent pass when there is no per-call setup."""
+    fn()  # warm imports and lazy singletons outside the measurement
+    durations = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if setup is None and concurrency > 1:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: fn(), range(iterations)))
+        throughput = iterations / (time.perf_counter() - start)
+    else:
+        throughput = iterations / sum(durations)
+
+    return {
+        "p50_ms": round(_percentile(durations, 0.5) * 1000, 2),
+        "p95_ms": round(_percentile(durations, 0.95) * 1000, 2),
+        "throughput_ops_s": round(throughput, 2),
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+def build_scenarios(args, page_urls: dict) -> dict:
+    folders = sorted(page_urls)
+    program_folder = folders[0]
+    tp_url, comp_url = page_urls[folders[0]], page_urls[folders[1]]
+
+    def load_store(folder=program_folder):
+        return lvg.load_vectorstore_from_gcp(bucket_name=BUCKET, path=f"{PREFIX}/{folder}", creds_dict={})
+
+    def reset_vectorstores():
+        lvg.vectorstore_cache.clear()
+        lvg._generations.clear()
+        lvg._layouts.clear()
+        shutil.rmtree(get_mirror(f"{BUCKET}/{PREFIX}/{program_folder}").root, ignore_errors=True)
+
+    def reset_pages():
+        for url in (tp_url, comp_url):
+            fetcher._page_cache.delete(url)
+        loaders._parsed_text.clear()
+
+    url_texts = loaders.load_url_content([tp_url, comp_url])
+
+    def brief(use_cache):
+        return lambda: llm_chain.get_combined_response(
+            "", url_texts, timespro_url=tp_url, competitor_url=comp_url, use_cache=use_cache
+        )
+
+    # ProgramIndex shards are keyed by program URL; map our page URLs back to folders.
+    index = ProgramIndex(lambda url: load_store(folders[list(page_urls.values()).index(url)]), [tp_url])
+
+    def static_context():
+        pages = loaders.load_url_content([tp_url, comp_url])
+        return build_static_context(
+            {"TIMESPRO URL CONTENT": pages[tp_url], "COMPETITOR URL CONTENT": pages[comp_url]}, 1200
+        )
+
+    def ask(prior_turns=1, question="And the fees?", mode="auto", hybrid=False):
+        memory = TokenBudgetMemory(
+            memory_key="chat_history", input_key="question", output_key="answer", return_messages=True
+        )
+        for _ in range(prior_turns):
+            memory.save_context({"question": "What is the duration?"}, {"answer": FakeChatModel().response})
+        pipeline = AnswerPipeline(
+            answer_llm=FakeChatModel(first_token_latency=args.llm_latency, token_latency=args.token_latency),
+            condense_llm=FakeChatModel(
+                first_token_latency=args.llm_latency, token_latency=0, response="What are the fees?"
+            ),
+            retriever=BudgetedRetriever(
+                vectorstore=index.hybrid([tp_url]) if hybrid else index.scoped([tp_url]), fetch_k=40, token_budget=3000
+            ),
+            memory=memory,
+            system_template="{context}\n\n{static_context}",
+            mode=mode,
+        )
+        return pipeline.run(question, static_context)
+
+    logger = custom_logger.Logger(gcp_bucket=BUCKET, gcp_creds={}, base_path="bench_logs")
+    qa_pairs = []
+
+    def write_log():
+        qa_pairs.append(("What are the fees?", "INR 3,50,000 plus taxes."))
+        logger.log_chatbot_qa({"session_id": "bench", "qa_pairs": qa_pairs})
+        logger.write_to_gcs()
+        logger.writer.flush(10)
+
+    return {
+        "vectorstore_load_cold": dict(fn=load_store, setup=reset_vectorstores),
+        "vectorstore_load_warm": dict(fn=load_store),
+        "url_content_cold": dict(fn=lambda: loaders.load_url_content([tp_url, comp_url]), setup=reset_pages),
+        "url_content_warm": dict(fn=lambda: loaders.load_url_content([tp_url, comp_url])),
+        "brief_uncached": dict(fn=brief(False)),
+        "brief_cached": dict(fn=brief(True)),
+        "followup_answer": dict(fn=ask),
+        "followup_answer_turn10": dict(fn=lambda: ask(prior_turns=9)),
+        "followup_self_contained": dict(fn=lambda: ask(question="What are the programme fees?")),
+        "followup_single_call": dict(fn=lambda: ask(mode="single")),
+        # Hybrid retrieval: a fee lookup the keyword fast path answers, and an open question that is fused.
+        "followup_hybrid_fast": dict(fn=lambda: ask(question="What are the programme fees?", hybrid=True)),
+        "followup_hybrid_fused": dict(
+            fn=lambda: ask(question="How does the programme help senior leaders grow?", hybrid=True)
+        ),
+        "log_write": dict(fn=write_log),
+    }
+
+
+# Differences smaller than these are timer / allocator noise, whatever the percentage.
+MIN_DELTA = {"p95_ms": 5.0, "peak_mem_kb": 256.0}
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> list:
+    failures = []
+    for name, result in results.items():
+        base = baselines.get(name)
+        if not base:
+            continue
+        for metric, min_delta in MIN_DELTA.items():
+            if metric not in base:
+                continue
+            limit = max(base[metric] * (1 + tolerance), base[metric] + min_delta)
+            if result[metric] > limit:
+                failures.append(f"{name}: {metric} {result[metric]} > baseline {base[metric]} (limit {limit:.1f})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the compare/ask flows.")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Fake LLM delay per token (s)")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Local page server delay (s)")
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression over baseline")
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    LocalGCSFileSystem.root = os.path.join(WORKDIR, "gcs")
+    seed_gcs(LocalGCSFileSystem.root, BUCKET, PREFIX)
+    pages_dir = os.path.join(WORKDIR, "pages")
+    page_names = write_saved_pages(pages_dir)
+
+    def fake_chat_openai(**kwargs):
+        return FakeChatModel(first_token_latency=args.llm_latency, token_latency=args.token_latency)
+
+    patches = [
+        mock.patch.object(gcsfs, "GCSFileSystem", LocalGCSFileSystem),
+        mock.patch.object(lvg, "OpenAIEmbeddings", lambda: DeterministicFakeEmbedding(size=1536)),
+        mock.patch.object(llm_clients, "ChatOpenAI", fake_chat_openai),
+    ]
+    for p in patches:
+        p.start()
+
+    results = {}
+    try:
+        with PageServer(pages_dir, latency=args.page_latency) as server:
+            page_urls = {name[:-len(".html")]: f"{server.base_url}/{name}" for name in page_names}
+            scenarios = build_scenarios(args, page_urls)
+            for name, scenario in scenarios.items():
+                if args.only and name not in args.only:
+                    continue
+                before = hybrid.stats()
+                results[name] = measure(scenario["fn"], args.iterations, scenario.get("setup"), args.concurrency)
+                r = results[name]
+                after = hybrid.stats()
+                searches = after["searches"] - before["searches"]
+                fast_path = f"  fast path {(after['fast_path'] - before['fast_path']) / searches:.0%}" if searches else ""
+                print(f"{name:24s} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+                      f"{r['throughput_ops_s']:8.2f} ops/s  peak {r['peak_mem_kb']:9.1f} KB{fast_path}")
+    finally:
+        for p in patches:
+            p.stop()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baselines:
+        baselines = {}
+        if os.path.exists(BASELINES_PATH):
+            with open(BASELINES_PATH) as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaselines written to {BASELINES_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINES_PATH):
+        print("\nNo baselines yet; run with --update-baselines to record them.")
+        return 0
+    with open(BASELINES_PATH) as f:
+        failures = compare(results, json.load(f), args.tolerance)
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll scenarios within baseline tolerance.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Local stand-ins for the services the app talks to, so benchmarks run offline.
+
+- FakeChatModel: chat model with configurable first-token and per-token latency.
+- LocalGCSFileSystem: the subset of gcsfs.GCSFileSystem the app uses, over a local directory.
+- PageServer: local HTTP server with saved program pages (ETag / Last-Modified aware).
+"""
+import glob
+import hashlib
+import html
+import os
+import shutil
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from utils.mmap_docstore import iter_documents
+
+FAKE_ANSWER = (
+    "**Sales-Enablement Brief** The TimesPro programme offers deeper CXO readiness, "
+    "campus immersion and a stronger alumni network than the competitor. "
+) * 8
+
+
+class FakeChatModel(BaseChatModel):
+    """Returns FAKE_ANSWER after `first_token_latency`, streaming one word every `token_latency`."""
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.002
+    response: str = FAKE_ANSWER
+    model_name: str = "fake-gpt-4o"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _words(self) -> List[str]:
+        return [w + " " for w in self.response.split(" ")]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.first_token_latency + self.token_latency * len(self._words()))
+        usage = {"prompt_tokens": sum(len(str(m.content)) // 4 for m in messages),
+                 "completion_tokens": len(self.response) // 4}
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.response))],
+            llm_output={"token_usage": usage},
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for word in self._words():
+            time.sleep(self.token_latency)
+            if run_manager is not None:
+                run_manager.on_llm_new_token(word)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+class LocalGCSFileSystem:
+    """gcsfs.GCSFileSystem stand-in rooted at a local directory; generations are mtimes in ns."""
+
+    root = "/tmp/bench_gcs"
+
+    def __init__(self, token: Any = None, **kwargs):
+        os.makedirs(self.root, exist_ok=True)
+
+    def _local(self, path: str) -> str:
+        return os.path.join(self.root, path.removeprefix("gs://"))
+
+    def info(self, path: str) -> dict:
+        local = self._local(path)
+        if not os.path.exists(local):
+            raise FileNotFoundError(path)
+        stat = os.stat(local)
+        return {"name": path, "size": stat.st_size, "generation": str(stat.st_mtime_ns), "type": "file"}
+
+    def ls(self, path: str, detail: bool = True):
+        local = self._local(path)
+        names = sorted(os.listdir(local)) if os.path.isdir(local) else []
+        entries = [self.info(f"{path.rstrip('/')}/{n}") for n in names if os.path.isfile(os.path.join(local, n))]
+        return entries if detail else [e["name"] for e in entries]
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self._local(path))
+
+    def open(self, path: str, mode: str = "rb", **kwargs):
+        local = self._local(path)
+        if "w" in mode or "a" in mode:
+            os.makedirs(os.path.dirname(local), exist_ok=True)
+        return open(local, mode)
+
+    def pipe(self, path: str, data: bytes):
+        with self.open(path, "wb") as f:
+            f.write(data)
+
+    def cat(self, path: str) -> bytes:
+        with self.open(path, "rb") as f:
+            return f.read()
+
+    def put_file(self, local_path: str, path: str):
+        os.makedirs(os.path.dirname(self._local(path)), exist_ok=True)
+        shutil.copyfile(local_path, self._local(path))
+
+    def merge(self, path: str, paths: List[str]):
+        data = b"".join(self.cat(p) for p in paths)
+        self.pipe(path, data)
+
+    def rm(self, path: str):
+        os.remove(self._local(path))
+
+    def invalidate_cache(self, path: Optional[str] = None):
+        pass
+
+
+def seed_gcs(root: str, bucket: str, prefix: str, vectorstores_dir: str = "vectorstores"):
+    """Copy the shipped vectorstores into the local bucket."""
+    for folder in glob.glob(os.path.join(vectorstores_dir, "*")):
+        target = os.path.join(root, bucket, prefix, os.path.basename(folder))
+        shutil.copytree(folder, target, dirs_exist_ok=True)
+
+
+def write_saved_pages(pages_dir: str, vectorstores_dir: str = "vectorstores") -> List[str]:
+    """
+    Recreate a program page per shipped vectorstore from its docstore text,
+    wrapped in the nav/footer/cookie boilerplate real pages carry.
+    Returns the page file names.
+    """
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    os.makedirs(pages_dir, exist_ok=True)
+    names = []
+    for folder in sorted(glob.glob(os.path.join(vectorstores_dir, "*"))):
+        store = FAISS.load_local(folder, DeterministicFakeEmbedding(size=1536), allow_dangerous_deserialization=True)
+        paragraphs = "".join(f"<p>{html.escape(d.page_content)}</p>" for d in iter_documents(store.docstore))
+        page = (
+            "<html><head><title>Program</title><script>var tracking = 1;</script></head><body>"
+            "<header><nav><a href='/'>Home</a><a href='/programs'>Programs</a></nav></header>"
+            "<div class='cookie-consent'>We use cookies to improve your experience.</div>"
+            f"<main>{paragraphs}<p>Apply Now</p></main>"
+            "<footer>© TimesPro. All rights reserved.</footer></body></html>"
+        )
+        name = os.path.basename(folder) + ".html"
+        with open(os.path.join(pages_dir, name), "w") as f:
+            f.write(page)
+        names.append(name)
+    return names
+
+
+class PageServer:
+    """Serves files from `pages_dir` on localhost with ETag / Last-Modified revalidation."""
+
+    def __init__(self, pages_dir: str, latency: float = 0.05):
+        self.pages_dir = pages_dir
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.latency)
+                path = os.path.join(server.pages_dir, os.path.basename(self.path.split("?")[0]))
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    body = f.read()
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", formatdate(os.path.getmtime(path), usegmt=True))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
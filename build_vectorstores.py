@@ -0,0 +1,219 @@
+"""
+Offline, incremental build of the per-program FAISS vectorstores.
+
+Scrapes each program URL, splits the page into chunks and embeds only the
+chunks whose content hash is not already present in the previous build. The
+raw vectors are kept next to the index (embeddings.npy + manifest.json) so the
+next run can reuse them; for folders built before this script existed the
+vectors are recovered from the flat index instead.
+
+--index-type picks an approximate index (utils.ann) instead of the flat one;
+switching index types rebuilds from the stored vectors without re-embedding.
+
+Usage:
+    python build_vectorstores.py --out vectorstores
+    python build_vectorstores.py --urls-file catalog.txt --concurrency 8
+    python build_vectorstores.py --index-type hnsw --index-param M=32 --index-param ef_search=64
+    python build_vectorstores.py --upload gs://test_bucket_brian/vectorstores --gcp-credentials sa.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.embeddings import OpenAIEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from utils.ann import INDEX_TYPES, build_index, index_meta, parse_index_params, write_index_meta
+from utils.fs_utils import atomic_replace_dir, make_staging_dir
+from utils.loaders import load_url_content
+from utils.mmap_docstore import write_mmap_docstore
+from utils.programs import TIMESPRO_URLS, vectorstore_folder
+from utils.retry import retry_with_backoff
+from utils.vectorstore_mirror import UPLOAD_MANIFEST_FILE, object_generation
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "embeddings.npy"
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_previous_vectors(folder: str, embeddings, model: str) -> dict:
+    """Map chunk hash -> vector from the last build of `folder`, if any."""
+    manifest_path = os.path.join(folder, MANIFEST_FILE)
+    vectors_path = os.path.join(folder, VECTORS_FILE)
+    if os.path.exists(manifest_path) and os.path.exists(vectors_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("embedding_model") != model:
+            return {}
+        vectors = np.load(vectors_path)
+        return dict(zip(manifest["chunk_hashes"], vectors))
+
+    # Legacy folder: recover vectors from the flat index and hash the stored text.
+    if not os.path.exists(os.path.join(folder, "index.faiss")):
+        return {}
+    store = FAISS.load_local(folder, embeddings, allow_dangerous_deserialization=True)
+    previous = {}
+    for position, doc_id in store.index_to_docstore_id.items():
+        doc = store.docstore.search(doc_id)
+        if hasattr(doc, "page_content"):
+            previous[chunk_hash(doc.page_content)] = store.index.reconstruct(int(position))
+    return previous
+
+
+class EmbeddingRunner:
+    """Embeds batches of chunks with bounded concurrency and retry/backoff."""
+
+    def __init__(self, embeddings, batch_size: int, concurrency: int, attempts: int):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.attempts = attempts
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+        self.calls = 0
+        self.chunks = 0
+
+    def embed(self, texts: list) -> list:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = [
+            self.executor.submit(retry_with_backoff, self.embeddings.embed_documents, batch, attempts=self.attempts)
+            for batch in batches
+        ]
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        self.calls += len(batches)
+        self.chunks += len(texts)
+        return vectors
+
+
+def build_program(
+    url: str, out_dir: str, splitter, runner: EmbeddingRunner, model: str, force: bool, index_spec: dict
+) -> dict:
+    folder = os.path.join(out_dir, vectorstore_folder(url))
+    text = load_url_content([url])[url]
+    if text.startswith("Error fetching URL content"):
+        return {"url": url, "status": "fetch_failed", "error": text}
+
+    chunks = list(dict.fromkeys(splitter.split_text(text)))
+    hashes = [chunk_hash(c) for c in chunks]
+    if not force and os.path.exists(os.path.join(folder, MANIFEST_FILE)):
+        with open(os.path.join(folder, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if (
+            manifest.get("chunk_hashes") == hashes
+            and manifest.get("embedding_model") == model
+            and manifest.get("index", {"type": "flat", "params": {}}) == index_spec
+        ):
+            return {"url": url, "status": "unchanged", "chunks": len(chunks), "embedded": 0}
+
+    previous = {} if force else load_previous_vectors(folder, runner.embeddings, model)
+
+    missing = [c for c, h in zip(chunks, hashes) if h not in previous]
+    fresh = dict(zip((chunk_hash(c) for c in missing), runner.embed(missing))) if missing else {}
+    vectors = [previous[h] if h in previous else fresh[h] for h in hashes]
+
+    store = FAISS.from_embeddings(
+        text_embeddings=list(zip(chunks, [list(map(float, v)) for v in vectors])),
+        embedding=runner.embeddings,
+        metadatas=[{"source": url, "chunk_hash": h} for h in hashes],
+    )
+    vector_matrix = np.asarray(vectors, dtype="float32")
+    store.index, params = build_index(vector_matrix, index_spec["type"], index_spec["params"])
+    staging = make_staging_dir(folder)
+    store.save_local(staging)
+    write_index_meta(staging, index_meta(store.index, index_spec["type"], params))
+    write_mmap_docstore(staging, dict(store.docstore._dict), store.index_to_docstore_id)
+    np.save(os.path.join(staging, VECTORS_FILE), vector_matrix)
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump({
+            "url": url,
+            "embedding_model": model,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "chunk_hashes": hashes,
+            "index": index_spec,
+        }, f)
+    atomic_replace_dir(staging, folder)
+    return {"url": url, "status": "built", "chunks": len(chunks), "embedded": len(missing), "folder": folder}
+
+
+def upload_folder(local_folder: str, gcs_prefix: str, creds_path: str):
+    import gcsfs
+
+    fs = gcsfs.GCSFileSystem(token=creds_path)
+    remote = f"{gcs_prefix.removeprefix('gs://').rstrip('/')}/{os.path.basename(local_folder)}"
+    generations, sizes = {}, {}
+    for name in sorted(os.listdir(local_folder)):
+        fs.put_file(os.path.join(local_folder, name), f"{remote}/{name}")
+        info = fs.info(f"{remote}/{name}")
+        generations[name], sizes[name] = object_generation(info), int(info.get("size") or 0)
+    # The objects can't be replaced together, so readers go by this manifest, written last, instead of
+    # listing them: mid-upload they keep the previous set, and a file that no longer matches its listed
+    # generation fails the download rather than pairing a new docstore with an old index.
+    fs.pipe(f"{remote}/{UPLOAD_MANIFEST_FILE}", json.dumps({"generations": generations, "sizes": sizes}).encode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally build TimesPro program vectorstores.")
+    parser.add_argument("--out", default="vectorstores", help="Output directory (default: vectorstores)")
+    parser.add_argument("--urls-file", help="File with one program URL per line (default: built-in catalog)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent embedding requests")
+    parser.add_argument("--program-workers", type=int, default=4, help="Programs scraped/built in parallel")
+    parser.add_argument("--retries", type=int, default=5, help="Attempts per embedding batch")
+    parser.add_argument("--model", default="text-embedding-ada-002", help="OpenAI embedding model")
+    parser.add_argument("--force", action="store_true", help="Re-embed every chunk")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="FAISS index type (see utils/ann.py)")
+    parser.add_argument(
+        "--index-param", action="append", default=[], metavar="NAME=VALUE",
+        help="Index parameter, repeatable (e.g. nlist=256, nprobe=16, M=32, qtype=QT_fp16)",
+    )
+    parser.add_argument("--upload", help="gs://bucket/prefix to upload rebuilt folders to")
+    parser.add_argument("--gcp-credentials", help="Service account JSON used with --upload")
+    args = parser.parse_args(argv)
+
+    if args.urls_file:
+        with open(args.urls_file) as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        urls = TIMESPRO_URLS
+
+    index_spec = {"type": args.index_type, "params": parse_index_params(args.index_param)}
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    runner = EmbeddingRunner(OpenAIEmbeddings(model=args.model), args.batch_size, args.concurrency, args.retries)
+
+    start = time.time()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.program_workers) as pool:
+        futures = {
+            pool.submit(build_program, url, args.out, splitter, runner, args.model, args.force, index_spec): url
+            for url in urls
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"url": futures[future], "status": "failed", "error": repr(e)}
+            results.append(result)
+            print(f"[{result['status']}] {result['url']} "
+                  f"chunks={result.get('chunks', '-')} embedded={result.get('embedded', '-')}")
+            if args.upload and result["status"] == "built":
+                upload_folder(result["folder"], args.upload, args.gcp_credentials)
+
+    failed = [r for r in results if r["status"] in ("failed", "fetch_failed")]
+    print(f"\n{len(results)} programs in {time.time() - start:.1f}s; "
+          f"{runner.chunks} chunks embedded in {runner.calls} requests; {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
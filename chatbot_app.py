@@ -1,16 +1,23 @@
 import streamlit as st
-from langchain_community.chat_models import ChatOpenAI  # ✅ use updated import
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
-from utils.loaders import load_url_content
-from utils.llm_chain import get_combined_response
-from load_vectorstore_from_gcp import load_vectorstore_from_gcp
+from utils.api_client import JOBREADY_API_URL, get_client
+from utils.streaming import StreamedResponse
 from custom_logger import Logger
+from utils.tracing import profile_request, start_metrics_server
+from utils.programs import TIMESPRO_URLS, slug
+from utils.llm_clients import LLMBusyError
+from utils.sessions import SessionConflict, SessionNotFound
+from utils.presence import get_presence_tracker
 import uuid
 import time
 from datetime import datetime
 import platform
 
+BUSY_MESSAGE = "⏳ The assistant is busy with other requests right now. Please try again in a moment."
+
+# Opt-in local metrics endpoint (TRACE_METRICS_PORT) and per-request cProfile (?profile=1).
+start_metrics_server()
+profile_this_run = st.query_params.get("profile") == "1"
+
 # === Session setup ===
 if "start_time" not in st.session_state:
     st.session_state.start_time = time.time()
@@ -18,24 +25,13 @@ if "qa_pairs" not in st.session_state:
     st.session_state.qa_pairs = []
 if "comparison" not in st.session_state:
     st.session_state.comparison = None
-if 'active_users' not in st.session_state:
-    st.session_state.active_users = {}
 if 'user_id' not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())
 
 # === Track users ===
-def update_active_users():
-    now = time.time()
-    ttl = 60
-    active_users = {
-        uid: ts for uid, ts in st.session_state.active_users.items()
-        if now - ts < ttl
-    }
-    active_users[st.session_state.user_id] = now
-    st.session_state.active_users = active_users
-    return len(active_users)
-
-active_user_count = update_active_users()
+# Shared by every session in the process (PRESENCE_BACKEND=sqlite shares it across workers).
+presence = get_presence_tracker()
+active_user_count = presence.heartbeat(st.session_state.user_id)
 
 st.markdown(
     f"""
@@ -45,17 +41,7 @@ st.markdown(
     """, unsafe_allow_html=True
 )
 
-# === Preview helper ===
-def _preview_vectorstore(retriever, n_docs=5, char_limit=5000):
-    try:
-        docs = list(retriever.vectorstore.docstore._dict.values())[:n_docs]
-        joined = "\n\n--- DOC SPLIT ---\n\n".join(d.page_content for d in docs)
-        return joined[:char_limit]
-    except Exception:
-        return "⚠️ Could not preview vectorstore content."
-
 # === Secrets & Logger ===
-openai_key = st.secrets["OPENAI_API_KEY"]
 gcp_credentials_dict = dict(st.secrets["GCP_SERVICE_ACCOUNT"])
 
 gcp_config = {
@@ -64,62 +50,89 @@ gcp_config = {
     "credentials": gcp_credentials_dict,
 }
 
-logger = Logger(
-    gcp_bucket=gcp_config["bucket_name"],
-    gcp_creds=gcp_config["credentials"],
-    base_path="logs"
-)
+# Compare / ask run in the API service when JOBREADY_API_URL is set, else in this process.
+client = get_client()
+if not JOBREADY_API_URL:
+    from utils import services
+    services.configure(gcp_credentials=gcp_config["credentials"])
+    services.prefetch()
+
+# Kept per session so the session id and the already-logged Q&A count survive reruns.
+if "logger" not in st.session_state:
+    st.session_state.logger = Logger(
+        gcp_bucket=gcp_config["bucket_name"],
+        gcp_creds=gcp_config["credentials"],
+        base_path="logs"
+    )
+logger = st.session_state.logger
 
 # === UI Setup ===
 st.set_page_config(page_title="AI-Agent for Program Comparison", layout="centered")
 st.title("📚 AI-Agent for Program Comparison")
 
-timespro_urls = [
-    "-- Select a program --",
-    "https://timespro.com/executive-education/iim-calcutta-senior-management-programme",
-    "https://timespro.com/executive-education/iim-kashipur-senior-management-programme",
-    "https://timespro.com/executive-education/iim-raipur-senior-management-programme",
-    "https://timespro.com/executive-education/iim-indore-senior-management-programme",
-    "https://timespro.com/executive-education/iim-kozhikode-strategic-management-programme-for-cxos",
-    "https://timespro.com/executive-education/iim-calcutta-lead-an-advanced-management-programme",
-]
-
-def slug(url):
-    return url.split("/executive-education/")[1] if "/executive-education/" in url else url
+timespro_urls = ["-- Select a program --"] + TIMESPRO_URLS
 
 display_options = ["-- Select a program --"] + [slug(u) for u in timespro_urls[1:]]
 sel_display = st.selectbox("Select TimesPro Program", display_options, index=0)
 url_1 = None if sel_display == "-- Select a program --" else timespro_urls[display_options.index(sel_display)]
 url_2 = st.text_input("Input Competitor Program URL")
 
-def sanitize_url(url: str) -> str:
-    return url.strip("/").split("/")[-1].replace("-", "_")
-
-# === Load vectorstore ===
-retriever = None
+# === Server-side chat session ===
+def sync_session(program_url, competitor_url, extra_programs):
+    """Create the API session, or point it at a new program selection; keeps its chat memory."""
+    key = (program_url, competitor_url, tuple(extra_programs))
+    session_id = st.session_state.get("api_session_id")
+    if session_id and st.session_state.get("api_session_key") == key:
+        return session_id
+    try:
+        if session_id:
+            client.update_session(
+                session_id, program_url=program_url, competitor_url=competitor_url, extra_programs=extra_programs
+            )
+    except SessionNotFound:
+        session_id = None  # expired on the server
+    if not session_id:
+        session_id = client.create_session(
+            program_url, competitor_url, extra_programs, brief=st.session_state.get("comparison_output", "")
+        )["id"]
+    st.session_state.api_session_id = session_id
+    st.session_state.api_session_key = key
+    return session_id
+
+session_id = None
 if url_1:
-    folder = f"timespro_com_executive_education_{sanitize_url(url_1)}"
+    extra_programs = st.multiselect(
+        "Also answer from these programs",
+        [u for u in TIMESPRO_URLS if u != url_1],
+        format_func=slug,
+        help="Lets follow-up questions compare across TimesPro programs.",
+    )
     with st.spinner("Loading TimesPro vectorstore …"):
         try:
-            vect_path = f"{gcp_config['prefix']}/{folder}"
-            vectorstore = load_vectorstore_from_gcp(
-                bucket_name=gcp_config["bucket_name"],
-                path=vect_path,
-                creds_dict=gcp_config["credentials"],
-            )
-            retriever = vectorstore.as_retriever(search_kwargs={"k": 50, "fetch_k": 100})
+            session_id = sync_session(url_1, url_2, extra_programs)
             st.success("Vectorstore loaded ✔️")
         except Exception as e:
             st.error(f"Vectorstore load failed: {e}")
 
-# === Memory Setup ===
-if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(
-        memory_key="chat_history", input_key="question", output_key="answer",
-        return_messages=True, k=7
-    )
+with st.sidebar.expander("⚙️ Cache stats"):
+    try:
+        service_stats = client.stats()
+    except Exception as e:
+        service_stats = {"error": str(e)}
+    st.write("Vectorstores", service_stats.get("vectorstores"))
+    st.write("Query embeddings", service_stats.get("query_embeddings"))
+    st.write("Hybrid retrieval", service_stats.get("hybrid_retrieval"))
+    st.write("Stage latency", service_stats.get("stage_latency"))
+    st.write("LLM requests in flight", service_stats.get("llm_in_flight"))
+    st.write("Coalesced briefs", service_stats.get("coalesced_briefs"))
+    if service_stats.get("queue"):
+        st.write("API queue", service_stats["queue"])
+    if service_stats.get("prewarm"):
+        st.write(f"Pre-warmed briefs (cycle {service_stats['prewarm']['started_at']})", service_stats["prewarm"]["briefs"])
+    if service_stats.get("error"):
+        st.write("Stats unavailable", service_stats["error"])
+
 st.session_state.setdefault("comparison_output", "")
-st.session_state.setdefault("comparison_injected", False)
 
 # === Action buttons ===
 col_cmp, col_prn, col_clr = st.columns([2, 2, 1])
@@ -127,34 +140,55 @@ with col_cmp:
     cmp_clicked = st.button("Compare (Generate Brief)", disabled=sel_display == "-- Select a program --")
 with col_prn:
     prn_clicked = st.button("Print Extracted Data")
+    fresh_brief = st.checkbox("Skip brief cache", help="Regenerate the brief even if an identical comparison was cached.")
 with col_clr:
     if st.button("Clear Cache 🪩"):
+        if st.session_state.get("api_session_id"):
+            try:
+                client.delete_session(st.session_state.api_session_id)
+            except SessionNotFound:
+                pass  # already expired on the server
         st.session_state.clear(); st.rerun()
 
 # === Print Extracted Info ===
 if prn_clicked:
+    extracted = client.preview(url_1, url_2 or "") if url_1 else {}
     st.subheader("📄 TimesPro Data Preview")
-    st.write(_preview_vectorstore(retriever) if retriever else "No vectorstore loaded.")
+    st.write(extracted.get("program") or "No vectorstore loaded.")
     st.subheader("📄 Competitor Data Preview")
-    comp_txt = load_url_content([url_2]).get(url_2, "No competitor data.") if url_2 else "No competitor URL."
-    st.write(comp_txt[:5000])
-
-# === Comparison logic ===
-if cmp_clicked:
-    if not url_2:
-        st.warning("Please enter a competitor program URL.")
+    if url_2:
+        st.caption(f"~{extracted.get('competitor_tokens', 0)} tokens after boilerplate removal")
+        st.write(extracted.get("competitor", ""))
     else:
-        with st.spinner("Generating sales‑enablement brief …"):
-            pdf_text = ""
-            url_texts = load_url_content([url_1, url_2])
-            st.session_state.comparison_output = get_combined_response(
-                pdf_text, url_texts, timespro_url=url_1, competitor_url=url_2, model_choice="gpt-4o"
-            )
-            logger.log_metadata(url_1, url_2)
-            logger.log_comparison_output(st.session_state.comparison_output)
-            st.session_state.comparison_injected = False
+        st.write("No competitor URL.")
 
-if st.session_state.comparison_output:
+# === Comparison logic ===
+brief_streamed = False
+if cmp_clicked and not url_2:
+    st.warning("Please enter a competitor program URL.")
+elif cmp_clicked:
+    with profile_request("compare", enabled=profile_this_run):
+        brief_result = {}
+        brief_stream = StreamedResponse(client.stream_brief(
+            url_1, url_2, brief_result, model="gpt-4o", use_cache=not fresh_brief, session_id=session_id,
+        ))
+        st.success("### 📝 Sales‑Enablement Brief")
+        try:
+            with st.spinner("Generating sales‑enablement brief …"):
+                st.write_stream(brief_stream)
+        except LLMBusyError:
+            st.warning(BUSY_MESSAGE)
+            st.stop()
+        brief_streamed = True
+        st.caption(
+            f"⏱️ First token {brief_stream.time_to_first_token:.2f}s · total {brief_stream.total_latency:.2f}s"
+        )
+        st.session_state.comparison_output = brief_stream.text
+        logger.log_metadata(url_1, url_2)
+        logger.log_comparison_output(st.session_state.comparison_output)
+        logger.log_timing("brief", brief_stream.time_to_first_token, brief_stream.total_latency)
+
+if st.session_state.comparison_output and not brief_streamed:
     st.success("### 📝 Sales‑Enablement Brief")
     st.write(st.session_state.comparison_output)
 
@@ -162,69 +196,47 @@ if st.session_state.comparison_output:
 st.subheader("💬 Ask a follow‑up question")
 user_q = st.text_input("Enter your question")
 
-if user_q:
-    if not retriever:
-        st.warning("Vectorstore unavailable. Select a TimesPro program first.")
-    else:
-        with st.spinner("Answering …"):
-            tp_ctx = load_url_content([url_1]).get(url_1, "")
-            comp_ctx = load_url_content([url_2]).get(url_2, "")
-            comparison_ctx = st.session_state.comparison_output
-
-            system_prompt = f"""
-You are a smart, sales-savvy AI assistant helping learners and internal sales teams understand and compare educational programs.
-You're informed by three sources:
-1. Vectorstore-based TimesPro documents (for factual answers).
-2. Web content from TimesPro and competitor URLs (for additional insights).
-3. A previously generated sales brief (optional).
-
-Use all relevant info to provide insightful, strategic, and helpful answers. Intelligently fill in with general knowledge even when the details aren't available. Keep the tone clear, concise, and helpful.
-Avoid mentioning platform names like Coursera, Emeritus, etc.
-
---- TIMESPRO VECTORSTORE ---
-(Used internally in chain)
-
---- TIMESPRO URL CONTENT ---
-{tp_ctx}
-
---- COMPETITOR URL CONTENT ---
-{comp_ctx}
-
---- SALES BRIEF (if any) ---
-{comparison_ctx}
-"""
-
-            llm = ChatOpenAI(model_name="gpt-4o", openai_api_key=openai_key, temperature=0.4)
-            qa_chain = ConversationalRetrievalChain.from_llm(
-                llm=llm,
-                retriever=retriever,
-                memory=st.session_state.memory,
-                return_source_documents=True
-            )
-
-            if not st.session_state.comparison_injected:
-                st.session_state.memory.chat_memory.add_user_message("SYSTEM CONTEXT")
-                st.session_state.memory.chat_memory.add_ai_message(system_prompt)
-                st.session_state.comparison_injected = True
-
-            answer = qa_chain.invoke({"question": user_q})
-            st.write(f"💬 **Answer:** {answer['answer']}")
-            st.session_state.qa_pairs.append((user_q, answer['answer']))
-
-            # === Metadata logging ===
-            metadata = {
-                "session_id": st.session_state.user_id,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "device": platform.platform(),
-                "session_runtime_seconds": round(time.time() - st.session_state.get("start_time", time.time())),
-                "selected_program": url_1,
-                "competitor_program": url_2,
-                "comparison_output": st.session_state.comparison_output,
-                "active_user_count": active_user_count,
-                "qa_pairs": st.session_state.qa_pairs,
-            }
-
-            logger.log_chatbot_qa(metadata)
-            gcs_log_path = logger.write_to_gcs()
-            st.session_state.log_saved = True
-            st.info(f"📝 Log saved to GCS: `{gcs_log_path}`")
+if user_q and not session_id:
+    st.warning("Vectorstore unavailable. Select a TimesPro program first.")
+elif user_q:
+    with profile_request("ask", enabled=profile_this_run):
+        st.write("💬 **Answer:**")
+        ask_result = {}
+        answer_stream = StreamedResponse(client.stream_ask(session_id, user_q, ask_result))
+        try:
+            with st.spinner("Answering …"):
+                st.write_stream(answer_stream)
+        except LLMBusyError:
+            st.warning(BUSY_MESSAGE)
+            st.stop()
+        except SessionConflict:
+            st.warning("Another question in this chat was answered at the same time. Please ask again.")
+            st.stop()
+        answer = ask_result["output"]
+        st.caption(
+            f"⏱️ First token {answer_stream.time_to_first_token:.2f}s · total {answer_stream.total_latency:.2f}s"
+            + ("" if answer["condensed"] else " · single LLM call")
+        )
+        turn_tokens = answer["turn_tokens"]
+        st.caption("🧮 Prompt tokens: " + " · ".join(f"{k} {v}" for k, v in turn_tokens.items()))
+        st.session_state.qa_pairs.append((user_q, answer['answer']))
+
+        # === Metadata logging ===
+        metadata = {
+            "session_id": st.session_state.user_id,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "device": platform.platform(),
+            "session_runtime_seconds": round(time.time() - st.session_state.get("start_time", time.time())),
+            "selected_program": url_1,
+            "competitor_program": url_2,
+            "active_user_count": active_user_count,
+            "answer_time_to_first_token_seconds": round(answer_stream.time_to_first_token, 3),
+            "answer_total_latency_seconds": round(answer_stream.total_latency, 3),
+            "turn_tokens": turn_tokens,
+            "qa_pairs": st.session_state.qa_pairs,
+        }
+
+        logger.log_chatbot_qa(metadata)
+        gcs_log_path = logger.write_to_gcs()
+        st.session_state.log_saved = True
+        st.info(f"📝 Logging to `{gcs_log_path}`")
@@ -0,0 +1,48 @@
+"""
+Convert pickled LangChain docstores (index.pkl) to the memory-mapped format.
+
+Writes docstore.bin / docstore.offsets.npy / docstore.ids.json next to each
+index.pkl. load_vectorstore_from_gcp picks the new files up automatically once
+they are uploaded next to index.faiss.
+
+Usage:
+    python convert_docstores.py                       # every folder in vectorstores/
+    python convert_docstores.py vectorstores/timespro_com_executive_education_iim_raipur_senior_management_programme
+    python convert_docstores.py --upload gs://test_bucket_brian/vectorstores --gcp-credentials sa.json
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from build_vectorstores import upload_folder
+from utils.mmap_docstore import BLOB_FILE, convert_pickle_folder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert index.pkl docstores to the mmap format.")
+    parser.add_argument("folders", nargs="*", help="Vectorstore folders (default: vectorstores/*)")
+    parser.add_argument("--upload", help="gs://bucket/prefix to upload converted folders to")
+    parser.add_argument("--gcp-credentials", help="Service account JSON used with --upload")
+    args = parser.parse_args(argv)
+
+    folders = args.folders or sorted(glob.glob("vectorstores/*/"))
+    for folder in folders:
+        folder = folder.rstrip("/")
+        if not os.path.exists(os.path.join(folder, "index.pkl")):
+            print(f"[skip] {folder}: no index.pkl")
+            continue
+        start = time.perf_counter()
+        convert_pickle_folder(folder)
+        pkl_size = os.path.getsize(os.path.join(folder, "index.pkl"))
+        blob_size = os.path.getsize(os.path.join(folder, BLOB_FILE))
+        print(f"[converted] {folder}: index.pkl {pkl_size} B -> docstore.bin {blob_size} B "
+              f"in {time.perf_counter() - start:.2f}s")
+        if args.upload:
+            upload_folder(folder, args.upload, args.gcp_credentials)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,161 @@
-import uuid
+import atexit
 import datetime
+import json
+import os
 import platform
-import streamlit as st
-from typing import List, Tuple
+import queue
+import threading
+import time
+import uuid
+from typing import Optional
+
 import gcsfs
 
+from utils.tracing import span
+
+# Batches are written when any of these limits is reached.
+LOG_FLUSH_INTERVAL_SECONDS = float(os.environ.get("LOG_FLUSH_INTERVAL_SECONDS", 5))
+LOG_MAX_BATCH_EVENTS = int(os.environ.get("LOG_MAX_BATCH_EVENTS", 200))
+LOG_MAX_BATCH_BYTES = int(os.environ.get("LOG_MAX_BATCH_BYTES", 256 * 1024))
+
+
+class LocalLogBackend:
+    """Appends log batches to files under a local directory (for tests and development)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def append(self, path: str, data: bytes):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "ab") as f:
+            f.write(data)
+
+    def url(self, path: str) -> str:
+        return f"file://{os.path.abspath(os.path.join(self.root, path))}"
+
+
+class GCSLogBackend:
+    """
+    Appends log batches to GCS objects with one reused gcsfs client.
+
+    GCS objects are immutable, so a batch is uploaded as a small part object
+    and composed onto the end of the log object; earlier lines are never
+    re-uploaded.
+    """
+
+    def __init__(self, bucket: str, creds: dict):
+        self.bucket = bucket
+        self.fs = gcsfs.GCSFileSystem(token=creds)
+        self._existing = set()
+
+    def append(self, path: str, data: bytes):
+        target = f"{self.bucket}/{path}"
+        if target not in self._existing and not self.fs.exists(target):
+            self.fs.pipe(target, data)
+        else:
+            part = f"{target}.part-{uuid.uuid4().hex[:8]}"
+            self.fs.pipe(part, data)
+            self.fs.merge(target, [target, part])
+            self.fs.rm(part)
+        self._existing.add(target)
+
+    def url(self, path: str) -> str:
+        return f"gs://{self.bucket}/{path}"
+
+
+class EventLogWriter:
+    """
+    Background JSONL writer shared by every Logger in the process.
+
+    `emit` only enqueues; a daemon thread groups events per log file and
+    appends them in batches bounded by event count, bytes and time.
+    """
+
+    def __init__(
+        self,
+        backend,
+        flush_interval: float = LOG_FLUSH_INTERVAL_SECONDS,
+        max_batch_events: int = LOG_MAX_BATCH_EVENTS,
+        max_batch_bytes: int = LOG_MAX_BATCH_BYTES,
+    ):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch_events = max_batch_events
+        self.max_batch_bytes = max_batch_bytes
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="event-log-writer")
+        self._thread.start()
+        atexit.register(self.flush, 10)
+
+    def emit(self, path: str, event: dict):
+        line = json.dumps(event, default=str, ensure_ascii=False) + "\n"
+        self._queue.put((path, line.encode("utf-8")))
+
+    def request_flush(self):
+        """Ask the writer to flush soon without waiting for it."""
+        self._queue.put(("__flush__", None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far; returns False on timeout."""
+        done = threading.Event()
+        self._queue.put(("__flush__", done))
+        return done.wait(timeout)
+
+    def _write(self, pending: dict):
+        for path, chunks in pending.items():
+            try:
+                data = b"".join(chunks)
+                with span("log.upload", bytes=len(data), events=len(chunks)):
+                    self.backend.append(path, data)
+            except Exception:
+                # Logging must never take the app down; drop the batch and count it.
+                self.errors += 1
+        pending.clear()
+
+    def _run(self):
+        pending, count, size = {}, 0, 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                path, payload = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                path, payload = None, None
+
+            if path == "__flush__" or path is None:
+                self._write(pending)
+                count, size = 0, 0
+                deadline = time.monotonic() + self.flush_interval
+                if isinstance(payload, threading.Event):
+                    payload.set()
+                continue
+
+            pending.setdefault(path, []).append(payload)
+            count, size = count + 1, size + len(payload)
+            if count >= self.max_batch_events or size >= self.max_batch_bytes:
+                self._write(pending)
+                count, size = 0, 0
+                deadline = time.monotonic() + self.flush_interval
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_event_writer(gcp_bucket: str, gcp_creds: dict, local_dir: Optional[str] = None) -> EventLogWriter:
+    """One writer (and storage client) per destination for the whole process."""
+    local_dir = local_dir or os.environ.get("LOG_LOCAL_DIR")
+    key = ("local", local_dir) if local_dir else ("gcs", gcp_bucket)
+    with _writers_lock:
+        if key not in _writers:
+            backend = LocalLogBackend(local_dir) if local_dir else GCSLogBackend(gcp_bucket, gcp_creds)
+            _writers[key] = EventLogWriter(backend)
+        return _writers[key]
+
+
 class Logger:
-    def __init__(self, gcp_bucket: str, gcp_creds: dict, base_path: str = "logs"):
+    def __init__(self, gcp_bucket: str, gcp_creds: dict, base_path: str = "logs", local_dir: Optional[str] = None):
         self.session_id = str(uuid.uuid4())[:8]
         self.device_type = platform.system()
         self.run_datetime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -14,45 +163,54 @@ class Logger:
         self.bucket = gcp_bucket
         self.creds = gcp_creds
         self.base_path = base_path
-        self.log_lines: List[str] = []
+        self.log_path = f"{self.base_path}/{self.today}/{self.session_id}.jsonl"
+        self.writer = get_event_writer(gcp_bucket, gcp_creds, local_dir)
+        self._qa_logged = 0
+
+    def _emit(self, event: str, **fields):
+        self.writer.emit(self.log_path, {
+            "event": event,
+            "session_id": self.session_id,
+            "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+            **fields,
+        })
 
     def log_metadata(self, timespro_url: str, competitor_url: str):
-        self.log_lines.append(f"Session ID: {self.session_id}")
-        self.log_lines.append(f"Device Type: {self.device_type}")
-        self.log_lines.append(f"Run Datetime: {self.run_datetime}")
-        self.log_lines.append(f"Selected TimesPro Program: {timespro_url}")
-        self.log_lines.append(f"Entered Competitor URL: {competitor_url}")
-        self.log_lines.append("")
+        self._emit(
+            "metadata",
+            device_type=self.device_type,
+            run_datetime=self.run_datetime,
+            timespro_url=timespro_url,
+            competitor_url=competitor_url,
+        )
 
     def log_comparison_output(self, comparison_output: str):
-        self.log_lines.append("=== COMPARISON OUTPUT ===")
-        self.log_lines.append(comparison_output.strip() or "[Empty]")
-        self.log_lines.append("")
+        self._emit("comparison_output", text=comparison_output.strip() or "[Empty]")
+
+    def log_timing(self, label: str, time_to_first_token: float, total_latency: float):
+        self._emit(
+            "timing",
+            label=label,
+            time_to_first_token_seconds=round(time_to_first_token, 3),
+            total_latency_seconds=round(total_latency, 3),
+        )
 
     def log_chatbot_qa(self, metadata: dict):
-        self.log_lines.append("=== SESSION METADATA ===")
-        for key, value in metadata.items():
-            if key != "qa_pairs":
-                self.log_lines.append(f"{key.replace('_', ' ').title()}: {value}")
-        self.log_lines.append("")
-    
-        self.log_lines.append("=== CHATBOT Q&A ===")
+        """Log session metadata and only the Q&A pairs not logged yet."""
         qa_pairs = metadata.get("qa_pairs", [])
-        for i, qa in enumerate(qa_pairs, 1):
+        new_pairs = []
+        for i, qa in enumerate(qa_pairs[self._qa_logged:], self._qa_logged + 1):
             if isinstance(qa, (list, tuple)) and len(qa) == 2:
                 question, answer = qa
             else:
                 question, answer = "Invalid format", str(qa)
-            self.log_lines.append(f"Q{i}: {question}")
-            self.log_lines.append(f"A{i}: {answer}")
-            self.log_lines.append("")
-
-    def write_to_gcs(self):
-        log_text = "\n".join(self.log_lines).strip()
-        log_path = f"{self.base_path}/{self.today}/{self.session_id}.txt"
+            new_pairs.append({"n": i, "question": question, "answer": answer})
+        self._qa_logged = len(qa_pairs)
 
-        fs = gcsfs.GCSFileSystem(token=self.creds)
-        with fs.open(f"{self.bucket}/{log_path}", "w") as f:
-            f.write(log_text)
+        session = {k: v for k, v in metadata.items() if k != "qa_pairs"}
+        self._emit("chatbot_qa", metadata=session, qa=new_pairs)
 
-        return f"gs://{self.bucket}/{log_path}"
+    def write_to_gcs(self):
+        """Ask the background writer to flush; returns the log's URL without waiting."""
+        self.writer.request_flush()
+        return self.writer.backend.url(self.log_path)
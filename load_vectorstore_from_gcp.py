@@ -1,12 +1,257 @@
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OpenAIEmbeddings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import gcsfs
+import hashlib
+import json
 import os
+import threading
+import time
+
+from utils.ann import INDEX_META_FILE, apply_index_meta
+from utils.embeddings import CachedEmbeddings
+from utils.mmap_docstore import BLOB_FILE, MMAP_DOCSTORE_FILES, load_faiss_mmap
+from utils.programs import TIMESPRO_URLS, vectorstore_folder
+from utils.tracing import span
+from utils.vectorstore_mirror import UPLOAD_MANIFEST_FILE, GenerationChanged, get_mirror, object_generation
+
+# Byte budget for loaded vectorstores kept in this process (default 512 MB).
+VECTORSTORE_CACHE_MAX_BYTES = int(os.environ.get("VECTORSTORE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# How long a generation lookup is trusted before GCS is asked again.
+GENERATION_CHECK_SECONDS = float(os.environ.get("VECTORSTORE_GENERATION_CHECK_SECONDS", 30))
+
+
+class VectorstoreCache:
+    """
+    Process-wide LRU cache of loaded FAISS vectorstores.
+
+    Entries are keyed by (bucket, path, generations) so a new upload to the
+    bucket produces a new key and the stale entry ages out of the LRU.
+    """
+
+    def __init__(self, max_bytes: int = VECTORSTORE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (vectorstore, size_bytes)
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, vectorstore, size_bytes: int):
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (vectorstore, size_bytes)
+            self.current_bytes += size_bytes
+            # Always keep the newest entry, even if it alone exceeds the budget.
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def peek(self, key):
+        """Lookup without touching the hit/miss counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def load_lock(self, bucket_path: str) -> threading.Lock:
+        """Per-path lock so concurrent sessions don't load the same index twice."""
+        with self._lock:
+            return self._load_locks.setdefault(bucket_path, threading.Lock())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+vectorstore_cache = VectorstoreCache()
+
+MMAP_LAYOUT = ("index.faiss",) + MMAP_DOCSTORE_FILES
+PICKLE_LAYOUT = ("index.faiss", "index.pkl")
+
+_fs_clients = {}
+_generations = {}  # (bucket_path, filenames) -> (checked_at, generations, sizes)
+_layouts = {}  # bucket_path -> (checked_at, layout, generations, sizes)
+_embeddings = None
+_shared_lock = threading.Lock()
+
+
+def _get_fs(creds_dict: dict) -> gcsfs.GCSFileSystem:
+    """Reuse one GCSFileSystem per service account instead of one per call."""
+    creds_key = hashlib.sha256(json.dumps(creds_dict, sort_keys=True, default=str).encode()).hexdigest()
+    with _shared_lock:
+        if creds_key not in _fs_clients:
+            _fs_clients[creds_key] = gcsfs.GCSFileSystem(token=creds_dict)
+        return _fs_clients[creds_key]
+
+
+def get_query_embeddings() -> CachedEmbeddings:
+    """Shared OpenAIEmbeddings wrapped in the query-embedding cache."""
+    global _embeddings
+    with _shared_lock:
+        if _embeddings is None:
+            _embeddings = CachedEmbeddings(OpenAIEmbeddings())
+        return _embeddings
+
+
+def _object_generations(fs, bucket_path: str, filenames) -> tuple:
+    """Return ((filename, generation), ...) and {filename: size} for the objects."""
+    now = time.time()
+    # Sessions check generations concurrently; the GCS calls below run outside the lock.
+    with vectorstore_cache._lock:
+        cached = _generations.get((bucket_path, filenames))
+    if cached and now - cached[0] < GENERATION_CHECK_SECONDS:
+        return cached[1], cached[2]
+
+    generations, sizes = [], {}
+    for name in filenames:
+        info = fs.info(f"{bucket_path}/{name}")
+        generations.append((name, object_generation(info)))
+        sizes[name] = int(info.get("size") or 0)
+    generations = tuple(generations)
+    with vectorstore_cache._lock:
+        _generations[(bucket_path, filenames)] = (now, generations, sizes)
+    return generations, sizes
+
+
+def _forget_generations(bucket_path: str):
+    """Drop the cached listing of `bucket_path` so the next lookup asks GCS again."""
+    with vectorstore_cache._lock:
+        _layouts.pop(bucket_path, None)
+        for key in [key for key in _generations if key[0] == bucket_path]:
+            del _generations[key]
+
+
+def _upload_manifest(fs, bucket_path: str):
+    """The manifest upload_folder writes after the files, or None for folders uploaded without one."""
+    try:
+        with fs.open(f"{bucket_path}/{UPLOAD_MANIFEST_FILE}", "rb") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _remote_layout(fs, bucket_path: str) -> tuple:
+    """
+    Prefer the mmap docstore when it has been uploaded, else the pickled one.
+
+    Folders with an upload manifest take the generations from it, so a
+    reader never mixes files from two uploads; older folders are listed
+    object by object.
+    """
+    with vectorstore_cache._lock:
+        cached = _layouts.get(bucket_path)
+    if cached and time.time() - cached[0] < GENERATION_CHECK_SECONDS:
+        return cached[1:]
+    manifest = _upload_manifest(fs, bucket_path)
+    if manifest is not None:
+        uploaded = manifest["generations"]
+        layout = MMAP_LAYOUT if all(name in uploaded for name in MMAP_LAYOUT) else PICKLE_LAYOUT
+        if INDEX_META_FILE in uploaded:
+            layout += (INDEX_META_FILE,)
+        missing = [name for name in layout if name not in uploaded]
+        if missing:
+            raise FileNotFoundError(f"{bucket_path}: {', '.join(missing)} not in {UPLOAD_MANIFEST_FILE}")
+        generations = tuple((name, uploaded[name]) for name in layout)
+        sizes = {name: int(manifest.get("sizes", {}).get(name) or 0) for name in layout}
+    else:
+        try:
+            layout = MMAP_LAYOUT
+            generations, sizes = _object_generations(fs, bucket_path, MMAP_LAYOUT)
+        except FileNotFoundError:
+            layout = PICKLE_LAYOUT
+            generations, sizes = _object_generations(fs, bucket_path, PICKLE_LAYOUT)
+        # Non-flat indexes ship their search parameters alongside; it versions with the rest.
+        if fs.exists(f"{bucket_path}/{INDEX_META_FILE}"):
+            layout += (INDEX_META_FILE,)
+            generations, sizes = _object_generations(fs, bucket_path, layout)
+    with vectorstore_cache._lock:
+        _layouts[bucket_path] = (time.time(), layout, generations, sizes)
+    return layout, generations, sizes
+
+
+def sync_vectorstore(bucket_name: str, path: str, creds_dict: dict) -> tuple:
+    """
+    Bring the local mirror of one vectorstore folder up to date with GCS.
+
+    Returns (layout, local_folder, generations, sizes), describing the files
+    actually in `local_folder`: when the mirror already holds a newer version
+    than GCS listed (a stale listing), that version is returned. Only files
+    whose GCS generation changed are downloaded (utils.vectorstore_mirror).
+    If an object is replaced mid-download, the generations are listed again
+    and the sync retried once.
+    """
+    fs = _get_fs(creds_dict)
+    bucket_path = f"{bucket_name}/{path}"
+    for attempt in range(2):
+        with span("vectorstore.generation_check", path=path):
+            layout, generations, sizes = _remote_layout(fs, bucket_path)
+        try:
+            with span("vectorstore.download", path=path, bytes=sum(sizes.values())):
+                local_folder, synced = get_mirror(bucket_path).sync(fs, generations, sizes)
+            if synced != generations:
+                layout, generations = tuple(name for name, _ in synced), synced
+                sizes = {name: os.path.getsize(os.path.join(local_folder, name)) for name in layout}
+            return layout, local_folder, generations, sizes
+        except GenerationChanged:
+            if attempt:
+                raise
+            _forget_generations(bucket_path)
+
+
+def prefetch_vectorstores(bucket_name: str, prefix: str, creds_dict: dict, program_urls=TIMESPRO_URLS,
+                          concurrency: int = 4) -> dict:
+    """Sync the local mirror of every program in parallel, without loading them; returns {url: error}."""
+    def sync(url):
+        try:
+            sync_vectorstore(bucket_name, f"{prefix}/{vectorstore_folder(url)}", creds_dict)
+        except Exception as e:
+            return url, repr(e)
+        return url, None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="vectorstore-prefetch") as pool:
+        return {url: error for url, error in pool.map(sync, program_urls) if error}
+
 
 def load_vectorstore_from_gcp(bucket_name: str, path: str, creds_dict: dict):
     """
     Load a FAISS vectorstore from a GCP bucket using a credentials dictionary.
 
+    The loaded store is kept in a process-wide cache shared by all sessions and
+    reruns. Files come from the program's local mirror, where only objects
+    whose GCS generation changed are downloaded again (utils.vectorstore_mirror).
+    Folders converted with convert_docstores.py are loaded through the
+    memory-mapped docstore instead of unpickling index.pkl, and approximate
+    indexes get their search parameters from index_meta.json (utils.ann).
+
     Args:
         bucket_name (str): GCP bucket name.
         path (str): Path to vectorstore files (without trailing slash).
@@ -16,25 +261,44 @@ def load_vectorstore_from_gcp(bucket_name: str, path: str, creds_dict: dict):
         FAISS: Loaded vectorstore object.
     """
     # Use gcsfs with passed credentials
-    fs = gcsfs.GCSFileSystem(token=creds_dict)
-
-    index_path = f"{bucket_name}/{path}/index.faiss"
-    store_path = f"{bucket_name}/{path}/index.pkl"
+    fs = _get_fs(creds_dict)
+    bucket_path = f"{bucket_name}/{path}"
 
-    # Save GCS files to temp folder
-    local_folder = "/tmp/vectorstore"
-    os.makedirs(local_folder, exist_ok=True)
+    with span("vectorstore.generation_check", path=path):
+        layout, generations, sizes = _remote_layout(fs, bucket_path)
+    cache_key = (bucket_name, path, generations)
+    vectorstore = vectorstore_cache.get(cache_key)
+    if vectorstore is not None:
+        return vectorstore
 
-    with fs.open(index_path, "rb") as f_in, open(f"{local_folder}/index.faiss", "wb") as f_out:
-        f_out.write(f_in.read())
+    with vectorstore_cache.load_lock(bucket_path):
+        # Another session may have finished loading while we waited.
+        vectorstore = vectorstore_cache.peek(cache_key)
+        if vectorstore is not None:
+            return vectorstore
 
-    with fs.open(store_path, "rb") as f_in, open(f"{local_folder}/index.pkl", "wb") as f_out:
-        f_out.write(f_in.read())
+        # Each program has its own local mirror, so parallel loads of different programs don't clash.
+        layout, local_folder, generations, sizes = sync_vectorstore(bucket_name, path, creds_dict)
+        # Keyed by what is on disk, which may be newer than the listing above.
+        cache_key = (bucket_name, path, generations)
+        vectorstore = vectorstore_cache.peek(cache_key)
+        if vectorstore is not None:
+            return vectorstore
 
-    # Load vectorstore from local files using LangChain’s FAISS loader
-    vectorstore = FAISS.load_local(
-        folder_path=local_folder,
-        embeddings=OpenAIEmbeddings(),
-        allow_dangerous_deserialization=True  # 👈 KEY FIX HERE
-    )
+        is_mmap = layout[:len(MMAP_LAYOUT)] == MMAP_LAYOUT
+        with span("vectorstore.load", path=path, layout="mmap" if is_mmap else "pickle"):
+            if is_mmap:
+                vectorstore = load_faiss_mmap(local_folder, get_query_embeddings())
+                # The text blob lives in the shared page cache, not on our heap.
+                size_bytes = sum(size for name, size in sizes.items() if name != BLOB_FILE)
+            else:
+                # Load vectorstore from local files using LangChain’s FAISS loader
+                vectorstore = FAISS.load_local(
+                    folder_path=local_folder,
+                    embeddings=get_query_embeddings(),
+                    allow_dangerous_deserialization=True  # 👈 KEY FIX HERE
+                )
+                size_bytes = sum(sizes.values())
+            apply_index_meta(vectorstore, local_folder)
+        vectorstore_cache.put(cache_key, vectorstore, size_bytes)
     return vectorstore
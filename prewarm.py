@@ -0,0 +1,194 @@
+"""
+Background warmer for the known program catalog.
+
+Each cycle revalidates every TimesPro program page and the top competitor
+pages (conditional GET, so changed pages are picked up), downloads the
+changed program vectorstore files, and generates the sales brief for every
+program x competitor pair whose brief isn't already cached for the current
+page content. Everything lands in the same on-disk caches the app reads, so
+the common comparisons are served instantly. Freshness stats are written to
+--stats-path after every cycle.
+
+Competitors come from --competitors (a text file with one URL per line, or a
+JSON object mapping program URL -> list of competitor URLs) and/or are ranked
+by how often reps compared against them in local JSONL logs (--logs-dir).
+
+Usage:
+    python prewarm.py --competitors competitors.txt --top-n 5
+    python prewarm.py --logs-dir logs --every 3600 --active-hours 7-21 --concurrency 2
+    python prewarm.py --competitors competitors.json --gcp-credentials sa.json
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from load_vectorstore_from_gcp import prefetch_vectorstores
+from utils.fetcher import fetch_html, page_age
+from utils.llm_chain import brief_cache_age, get_combined_response
+from utils.loaders import load_url_content
+from utils.prewarm_stats import DEFAULT_STATS_PATH, write_stats
+from utils.programs import TIMESPRO_URLS
+
+
+def load_competitors(path: str) -> dict:
+    """program URL -> competitor URLs; a plain list applies to every program."""
+    with open(path) as f:
+        raw = f.read()
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        data = [line.strip() for line in raw.splitlines() if line.strip() and not line.startswith("#")]
+    if isinstance(data, list):
+        return {program: list(data) for program in TIMESPRO_URLS}
+    return {program: list(data.get(program, [])) for program in TIMESPRO_URLS}
+
+
+def competitors_from_logs(logs_dir: str) -> dict:
+    """program URL -> competitor URLs ordered by how often they were compared."""
+    counts = {program: Counter() for program in TIMESPRO_URLS}
+    for path in glob.glob(os.path.join(logs_dir, "**", "*.jsonl"), recursive=True):
+        with open(path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("event") == "metadata" and event.get("competitor_url"):
+                    counts.setdefault(event.get("timespro_url"), Counter())[event["competitor_url"]] += 1
+    return {program: [url for url, _ in counter.most_common()] for program, counter in counts.items() if program}
+
+
+def plan_pairs(competitors: dict, top_n: int) -> list:
+    pairs = []
+    for program in TIMESPRO_URLS:
+        for competitor in list(dict.fromkeys(competitors.get(program, [])))[:top_n]:
+            pairs.append((program, competitor))
+    return pairs
+
+
+def warm_pages(urls: list) -> dict:
+    """Revalidate every page now (ignoring the TTL); returns url -> error for failures."""
+    errors = {}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = {url: pool.submit(fetch_html, url, 0) for url in urls}
+    for url, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            errors[url] = repr(e)
+    return errors
+
+
+def warm_vectorstores(bucket: str, prefix: str, creds: dict) -> dict:
+    # Only the on-disk mirror is refreshed; the app processes load from it.
+    return prefetch_vectorstores(bucket, prefix, creds)
+
+
+def warm_brief(program: str, competitor: str, model: str) -> dict:
+    url_texts = load_url_content([program, competitor])
+    stats = {
+        "program": program,
+        "competitor": competitor,
+        "program_page_age_seconds": page_age(program),
+        "competitor_page_age_seconds": page_age(competitor),
+    }
+    if any(text.startswith("Error fetching URL content") for text in url_texts.values()):
+        return {**stats, "status": "page_error"}
+
+    age = brief_cache_age(url_texts, program, competitor, model)
+    if age is not None:
+        return {**stats, "status": "fresh", "brief_age_seconds": round(age)}
+    try:
+        get_combined_response("", url_texts, timespro_url=program, competitor_url=competitor, model_choice=model)
+        return {**stats, "status": "generated", "brief_age_seconds": 0}
+    except Exception as e:
+        return {**stats, "status": "error", "error": repr(e)}
+
+
+def run_cycle(args, pairs: list, creds) -> dict:
+    started = time.time()
+    urls = list(dict.fromkeys(TIMESPRO_URLS + [competitor for _, competitor in pairs]))
+    page_errors = warm_pages(urls)
+    vectorstore_errors = warm_vectorstores(args.bucket, args.prefix, creds) if creds is not None else None
+
+    # The concurrency cap bounds simultaneous brief generations (LLM calls) from the warmer.
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        briefs = list(pool.map(lambda pair: warm_brief(pair[0], pair[1], args.model), pairs))
+
+    status_counts = Counter(b["status"] for b in briefs)
+    ages = [b["brief_age_seconds"] for b in briefs if b.get("brief_age_seconds") is not None]
+    return {
+        "started_at": datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "duration_seconds": round(time.time() - started, 1),
+        "pages": {"warmed": len(urls) - len(page_errors), "errors": page_errors},
+        "vectorstores": "skipped (no --gcp-credentials)" if vectorstore_errors is None else {
+            "warmed": len(TIMESPRO_URLS) - len(vectorstore_errors), "errors": vectorstore_errors,
+        },
+        "briefs": {
+            "pairs": len(pairs),
+            "by_status": dict(status_counts),
+            "oldest_age_seconds": max(ages) if ages else None,
+            "details": briefs,
+        },
+    }
+
+
+def in_active_hours(spec: str) -> bool:
+    if not spec:
+        return True
+    start, end = (int(h) for h in spec.split("-"))
+    hour = datetime.datetime.now().hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm pages, vectorstores and briefs for the program catalog.")
+    parser.add_argument("--competitors", help="Text file (one URL per line) or JSON {program_url: [urls]}")
+    parser.add_argument("--logs-dir", help="Rank competitors by how often they appear in local JSONL logs")
+    parser.add_argument("--top-n", type=int, default=5, help="Competitors warmed per program")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--concurrency", type=int, default=2, help="Briefs generated at once")
+    parser.add_argument("--every", type=float, default=0, help="Seconds between cycles (0 = run once)")
+    parser.add_argument("--active-hours", help="Only run cycles between these local hours, e.g. 7-21")
+    parser.add_argument("--stats-path", default=DEFAULT_STATS_PATH)
+    parser.add_argument("--bucket", default="test_bucket_brian", help="GCS bucket holding the vectorstores")
+    parser.add_argument("--prefix", default="vectorstores")
+    parser.add_argument("--gcp-credentials", help="Service account JSON; vectorstores are skipped without it")
+    args = parser.parse_args(argv)
+
+    competitors = {}
+    if args.logs_dir:
+        competitors = competitors_from_logs(args.logs_dir)
+    if args.competitors:
+        # Explicit competitors go first; log-ranked ones fill the remaining top-N slots.
+        for program, urls in load_competitors(args.competitors).items():
+            competitors[program] = urls + competitors.get(program, [])
+    pairs = plan_pairs(competitors, args.top_n)
+    creds = None
+    if args.gcp_credentials:
+        with open(args.gcp_credentials) as f:
+            creds = json.load(f)
+
+    while True:
+        if in_active_hours(args.active_hours):
+            stats = run_cycle(args, pairs, creds)
+            write_stats(args.stats_path, stats)
+            print(
+                f"[{stats['started_at']}] {len(pairs)} pairs in {stats['duration_seconds']}s: "
+                f"{stats['briefs']['by_status']}; pages {stats['pages']['warmed']} ok, "
+                f"{len(stats['pages']['errors'])} failed",
+                flush=True,
+            )
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+from utils.html_extract import extract_main_text
+
+PROGRAM_PAGE = """
+<html>
+<head><title>IIM Calcutta Senior Management Programme | TimesPro</title><script>var x = 1;</script></head>
+<body>
+  <header class="site-header"><nav class="navbar"><a href="/">Home</a><a href="/courses">Courses</a></nav></header>
+  <div id="cookie-banner" class="cookie-consent">We use cookies to improve your experience. Accept</div>
+  <div class="breadcrumb"><a href="/">Home</a> / Executive Education</div>
+  <section class="program-banner hero">
+    <h1>Senior Management Programme</h1>
+    <ul class="program-highlights">
+      <li>Duration: 12 months</li>
+      <li>Programme fee: ₹ 8,50,000 + GST</li>
+      <li>Start date: 15 March 2025</li>
+    </ul>
+    <a class="btn">Apply Now</a>
+  </section>
+  <main>
+    <h2>About the programme</h2>
+    <p>The Senior Management Programme from IIM Calcutta prepares experienced professionals to lead
+    organisations through strategy, finance, marketing and operations. Participants learn through live
+    online sessions, campus immersions and a capstone project with senior faculty of the institute.</p>
+    <p>Contact hours: 120</p>
+    <div class="menu-of-courses">
+      <h3>Curriculum</h3>
+      <ul>
+        <li>Module 1: Strategic Management</li>
+        <li>Module 2: Financial Accounting and Analysis</li>
+        <li>Module 3: Marketing Management</li>
+        <li>Module 4: Leading People and Organisations</li>
+      </ul>
+    </div>
+    <div class="fee-structure">
+      <h3>Batch 1</h3>
+      <p>Instalment: ₹ 2,12,500</p>
+      <h3>Batch 2</h3>
+      <p>Instalment: ₹ 2,12,500</p>
+    </div>
+    <div class="share-buttons">Share</div>
+    <div class="modal"><p>Download the brochure</p></div>
+    <p>Download Brochure</p>
+    <p>Learn more</p>
+  </main>
+  <aside class="sidebar"><h4>Related programmes</h4><p>Other IIM courses</p></aside>
+  <footer class="site-footer">Copyright TimesPro. All rights reserved.</footer>
+</body>
+</html>
+"""
+
+
+def _lines():
+    return extract_main_text(PROGRAM_PAGE).text.splitlines()
+
+
+def test_program_facts_survive():
+    lines = _lines()
+    assert "Senior Management Programme" in lines
+    assert "Duration: 12 months" in lines
+    assert "Programme fee: ₹ 8,50,000 + GST" in lines
+    assert "Start date: 15 March 2025" in lines
+    assert "Contact hours: 120" in lines
+
+
+def test_curriculum_in_menu_named_block_survives():
+    lines = _lines()
+    for module in ("Strategic Management", "Financial Accounting and Analysis", "Marketing Management"):
+        assert any(module in line for line in lines)
+
+
+def test_repeated_fee_lines_are_kept():
+    assert _lines().count("Instalment: ₹ 2,12,500") == 2
+
+
+def test_boilerplate_and_button_labels_are_dropped():
+    text = extract_main_text(PROGRAM_PAGE).text
+    for noise in ("cookies", "Executive Education", "Apply Now", "Download Brochure", "Learn more",
+                  "Related programmes", "Copyright", "var x"):
+        assert noise not in text
+    assert "Share" not in _lines()
+
+
+def test_adjacent_duplicates_collapse():
+    html = "<body><p>Live online sessions</p><p>Live online sessions</p><p>Weekend classes</p></body>"
+    assert extract_main_text(html).text.splitlines() == ["Live online sessions", "Weekend classes"]
@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from utils.sessions import SessionConflict, SessionNotFound, SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite3"))
+
+
+def test_concurrent_turn_save_conflicts_instead_of_dropping_a_turn(store):
+    session = store.create("https://example.com/program")
+    first, second = store.get(session["id"]), store.get(session["id"])
+    store.save_turns(session["id"], [["q1", "a1"]], first["rev"])
+    with pytest.raises(SessionConflict):
+        store.save_turns(session["id"], [["q2", "a2"]], second["rev"])
+    assert store.get(session["id"])["memory"]["turns"] == [["q1", "a1"]]
+
+
+def test_turn_save_keeps_a_summary_folded_in_meanwhile(store):
+    session = store.create("https://example.com/program")
+    store.set_summary(session["id"], "Asked about fees.")
+    store.save_turns(session["id"], [["q", "a"]], session["rev"])
+    assert store.get(session["id"])["memory"] == {"summary": "Asked about fees.", "turns": [["q", "a"]]}
+
+
+def test_turn_save_on_deleted_session_is_not_found(store):
+    session = store.create("https://example.com/program")
+    store.delete(session["id"])
+    with pytest.raises(SessionNotFound):
+        store.save_turns(session["id"], [["q", "a"]], session["rev"])
+
+
+def test_files_without_rev_are_migrated(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE sessions (id TEXT PRIMARY KEY, program_url TEXT NOT NULL, competitor_url TEXT NOT NULL,"
+        " extra_programs TEXT NOT NULL, brief TEXT NOT NULL, memory TEXT NOT NULL,"
+        " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.close()
+    session = SessionStore(path).create("https://example.com/program")
+    assert session["rev"] == 0
@@ -0,0 +1,160 @@
+"""
+Approximate nearest-neighbour index types for the program vectorstores.
+
+`build_index` turns a matrix of embeddings into one of the FAISS index types
+below; `build_vectorstores.py --index-type` uses it in place of the default
+flat index and records the choice in `index_meta.json` next to `index.faiss`.
+The loader reads that file back (`apply_index_meta`) to set the search-time
+parameters, which aren't reliably carried by the index file itself and can be
+overridden per process with ANN_NPROBE / ANN_EF_SEARCH.
+
+    flat    exact L2 search (the default, what LangChain builds)
+    ivf     inverted lists over k-means cells: nlist, nprobe
+    ivfpq   IVF with product-quantized residuals: nlist, m, nbits, nprobe
+    pq      product quantization, exhaustive: m, nbits
+    sq      scalar quantization, exhaustive: qtype (QT_8bit, QT_4bit, QT_fp16)
+    hnsw    HNSW graph over full vectors: M, ef_construction, ef_search
+"""
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_META_FILE = "index_meta.json"
+
+DEFAULT_PARAMS = {
+    "flat": {},
+    "ivf": {"nlist": 64, "nprobe": 8},
+    "ivfpq": {"nlist": 64, "m": 32, "nbits": 8, "nprobe": 8},
+    "pq": {"m": 32, "nbits": 8},
+    "sq": {"qtype": "QT_8bit"},
+    "hnsw": {"M": 32, "ef_construction": 80, "ef_search": 64},
+}
+INDEX_TYPES = tuple(DEFAULT_PARAMS)
+
+# Parameters that only affect search, keyed to their faiss ParameterSpace names.
+SEARCH_PARAMS = {"nprobe": "nprobe", "ef_search": "efSearch"}
+_SEARCH_PARAM_ENV = {"nprobe": "ANN_NPROBE", "ef_search": "ANN_EF_SEARCH"}
+
+
+def parse_index_params(pairs: List[str]) -> dict:
+    """['nlist=128', 'qtype=QT_fp16'] -> {'nlist': 128, 'qtype': 'QT_fp16'}."""
+    params = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if not value:
+            raise ValueError(f"Index parameter {pair!r} should look like name=value")
+        for cast in (int, float):
+            try:
+                value = cast(value)
+                break
+            except ValueError:
+                continue
+        params[name.strip()] = value
+    return params
+
+
+def resolve_params(index_type: str, params: Optional[dict], count: int, dimension: int) -> dict:
+    """
+    Defaults merged with `params`, clamped to what `count` training vectors support.
+
+    k-means wants ~39 points per cell and a PQ codebook needs at least 2**nbits
+    points, so small programs quietly get fewer cells / smaller codebooks
+    rather than failing the build.
+    """
+    if index_type not in DEFAULT_PARAMS:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+    unknown = set(params or {}) - set(DEFAULT_PARAMS[index_type])
+    if unknown:
+        raise ValueError(f"Unsupported parameters for {index_type}: {', '.join(sorted(unknown))}")
+    resolved = {**DEFAULT_PARAMS[index_type], **(params or {})}
+
+    if "nlist" in resolved:
+        resolved["nlist"] = max(1, min(resolved["nlist"], count // 39))
+        resolved["nprobe"] = max(1, min(resolved["nprobe"], resolved["nlist"]))
+    if "nbits" in resolved:
+        resolved["nbits"] = max(1, min(resolved["nbits"], int(math.log2(max(count, 2)))))
+    if "m" in resolved and dimension % resolved["m"]:
+        raise ValueError(f"m={resolved['m']} must divide the embedding dimension {dimension}")
+    return resolved
+
+
+def build_index(vectors: np.ndarray, index_type: str = "flat", params: Optional[dict] = None) -> Tuple[faiss.Index, dict]:
+    """Train (if needed) and fill an index of `index_type`; returns it with the parameters actually used."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    count, dimension = vectors.shape
+    p = resolve_params(index_type, params, count, dimension)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, p["nlist"])
+    elif index_type == "ivfpq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, p["nlist"], p["m"], p["nbits"])
+    elif index_type == "pq":
+        index = faiss.IndexPQ(dimension, p["m"], p["nbits"])
+    elif index_type == "sq":
+        index = faiss.IndexScalarQuantizer(dimension, getattr(faiss.ScalarQuantizer, p["qtype"]))
+    else:
+        index = faiss.IndexHNSWFlat(dimension, p["M"])
+        index.hnsw.efConstruction = p["ef_construction"]
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, p)
+    return index, p
+
+
+def apply_search_params(index: faiss.Index, params: dict):
+    space = faiss.ParameterSpace()
+    for name, faiss_name in SEARCH_PARAMS.items():
+        if name in params:
+            space.set_index_parameter(index, faiss_name, params[name])
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Size of the serialized index, a close proxy for its resident size."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def index_meta(index: faiss.Index, index_type: str, params: dict) -> dict:
+    return {
+        "index_type": index_type,
+        "params": params,
+        "metric": "l2",
+        "dimension": index.d,
+        "ntotal": index.ntotal,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def write_index_meta(folder: str, meta: dict):
+    with open(os.path.join(folder, INDEX_META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_index_meta(folder: str) -> Optional[Dict]:
+    """The folder's index_meta.json, or None for flat folders built without one."""
+    try:
+        with open(os.path.join(folder, INDEX_META_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def apply_index_meta(vectorstore, folder: str) -> Optional[Dict]:
+    """Set the loaded store's search parameters from index_meta.json and the ANN_* overrides."""
+    meta = read_index_meta(folder)
+    if meta is None:
+        return None
+    params = dict(meta.get("params") or {})
+    for name, env in _SEARCH_PARAM_ENV.items():
+        if name in params and os.environ.get(env):
+            params[name] = int(os.environ[env])
+    apply_search_params(vectorstore.index, params)
+    return meta
@@ -0,0 +1,140 @@
+"""
+Follow-up answer pipeline for the chatbot.
+
+ConversationalRetrievalChain runs every step in series: the page fetches, the
+condense-question LLM call, retrieval and finally the answer call.
+`AnswerPipeline` runs the independent steps concurrently with asyncio: the
+static context (program pages, sales brief) is prepared while the question is
+condensed and the TimesPro documents are retrieved, and only the answer call
+waits for both.
+
+The condense call is skipped when it can't change the retrieval query. Modes
+(ANSWER_PIPELINE_MODE):
+
+    auto      condense only when there is history and the question reads as a
+              follow-up ("and the fees?", "how does it compare?"); the default
+    single    never condense: one LLM call per question. Retrieval uses the
+              question together with the previous one and the answer model
+              resolves references from the history it is shown.
+    condense  always condense when there is history, like the old chain
+"""
+import asyncio
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage, HumanMessage, get_buffer_string
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from utils.retrieval import tokenize
+from utils.tracing import span
+
+ANSWER_PIPELINE_MODE = os.environ.get("ANSWER_PIPELINE_MODE", "auto")
+ANSWER_PIPELINE_MODES = ("auto", "single", "condense")
+
+_WORD = re.compile(r"[a-z']+")
+# Words that point back at earlier turns; a question using them needs the history to be understood.
+FOLLOWUP_REFERENTS = frozenset(
+    "it its it's this that these those they them their theirs he she his her same above previous "
+    "earlier former latter other others both either more else".split()
+)
+FOLLOWUP_OPENERS = frozenset("and also so but then or plus".split())
+
+
+def is_self_contained(question: str) -> bool:
+    """True when a question can be understood, and retrieved for, without the conversation."""
+    words = _WORD.findall(question.lower())
+    if not words or words[0] in FOLLOWUP_OPENERS or " ".join(words[:2]) in ("what about", "how about"):
+        return False
+    if any(word in FOLLOWUP_REFERENTS for word in words):
+        return False
+    return bool(tokenize(question))
+
+
+class AnswerPipeline:
+    """
+    Answers follow-up questions from retrieved docs, static context and history.
+
+    `memory` is a chat memory with return_messages=True (TokenBudgetMemory);
+    `retriever` is any LangChain retriever. `system_template` must contain
+    {context} (retrieved docs) and {static_context}.
+    """
+
+    def __init__(
+        self,
+        answer_llm,
+        condense_llm,
+        retriever,
+        memory,
+        system_template: str,
+        mode: str = ANSWER_PIPELINE_MODE,
+    ):
+        if mode not in ANSWER_PIPELINE_MODES:
+            raise ValueError(f"Unknown answer pipeline mode {mode!r}; expected one of {', '.join(ANSWER_PIPELINE_MODES)}")
+        self.answer_llm = answer_llm
+        self.condense_llm = condense_llm
+        self.retriever = retriever
+        self.memory = memory
+        self.mode = mode
+        self.prompt = ChatPromptTemplate.from_messages(
+            [("system", system_template), MessagesPlaceholder("chat_history"), ("human", "{question}")]
+        )
+
+    def should_condense(self, question: str, history: List[BaseMessage]) -> bool:
+        if not history or self.mode == "single":
+            return False
+        return self.mode == "condense" or not is_self_contained(question)
+
+    async def _condense(self, question: str, history: List[BaseMessage]) -> str:
+        prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=get_buffer_string(history), question=question)
+        with span("answer.condense"):
+            result = await self.condense_llm.ainvoke(prompt)
+        return str(getattr(result, "content", result)).strip() or question
+
+    async def _retrieve(self, question: str, history: List[BaseMessage], condense: bool) -> Tuple[str, List[Document]]:
+        if condense:
+            query = await self._condense(question, history)
+        else:
+            previous = [m.content for m in history if isinstance(m, HumanMessage)]
+            # Single-call follow-ups borrow the previous question's terms for retrieval.
+            query = f"{previous[-1]} {question}" if previous and not is_self_contained(question) else question
+        docs = await self.retriever.ainvoke(query)
+        return query, docs
+
+    async def arun(self, question: str, static_context: Callable[[], Tuple[str, int]], callbacks: Optional[list] = None) -> Dict:
+        """
+        Answer `question`, saving the turn to memory.
+
+        `static_context` returns (text, tokens); it runs on a worker thread
+        alongside condense + retrieval, so page fetches overlap the LLM call.
+        """
+        history = self.memory.load_memory_variables({})[self.memory.memory_key]
+        condense = self.should_condense(question, history)
+        with span("answer.prepare", condense=condense):
+            (static_text, static_tokens), (query, docs) = await asyncio.gather(
+                asyncio.to_thread(static_context), self._retrieve(question, history, condense)
+            )
+
+        messages = self.prompt.format_messages(
+            context="\n\n".join(doc.page_content for doc in docs),
+            static_context=static_text,
+            chat_history=history,
+            question=question,
+        )
+        result = await self.answer_llm.ainvoke(messages, config={"callbacks": callbacks or []})
+        answer = str(getattr(result, "content", result))
+        self.memory.save_context({"question": question}, {"answer": answer})
+        return {
+            "question": question,
+            "retrieval_query": query,
+            "condensed": condense,
+            "answer": answer,
+            "source_documents": docs,
+            "static_tokens": static_tokens,
+        }
+
+    def run(self, question: str, static_context: Callable[[], Tuple[str, int]], callbacks: Optional[list] = None) -> Dict:
+        """Blocking `arun`, for callers on a plain worker thread."""
+        return asyncio.run(self.arun(question, static_context, callbacks))
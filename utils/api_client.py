@@ -0,0 +1,203 @@
+"""
+Client used by the Streamlit apps to reach the compare / ask / interview API.
+
+`get_client()` returns an HTTP client for the API service (api_server.py)
+when JOBREADY_API_URL is set, and an in-process client that calls
+utils.services directly otherwise, so the apps are thin clients either way.
+
+Both raise the same errors: LLMBusyError when the service is saturated
+(HTTP 429/503), SessionNotFound for unknown sessions, SessionConflict when
+a concurrent question on the session saved first (409), ValueError for bad
+input. Streaming calls return token iterators and put the final payload in
+`result["output"]` once exhausted, like `stream_from_thread`.
+"""
+import base64
+import json
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from utils.llm_clients import LLMBusyError
+from utils.sessions import SessionConflict, SessionNotFound
+
+JOBREADY_API_URL = os.environ.get("JOBREADY_API_URL", "")
+API_CLIENT_TIMEOUT_SECONDS = float(os.environ.get("API_CLIENT_TIMEOUT_SECONDS", 300))
+
+
+class APIError(RuntimeError):
+    """Any other failure reported by the API service."""
+
+
+def _raise_for(status: int, message: str, session_id: Optional[str] = None):
+    if status in (429, 503):
+        raise LLMBusyError(message)
+    if status == 404 and session_id is not None:
+        raise SessionNotFound(session_id)
+    if status == 409:
+        raise SessionConflict(message)
+    if status == 400:
+        raise ValueError(message)
+    raise APIError(f"{status}: {message}")
+
+
+class HTTPClient:
+    """Talks to api_server.py over HTTP, reusing one connection pool."""
+
+    def __init__(self, base_url: str, timeout: float = API_CLIENT_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None, session_id: Optional[str] = None,
+                 stream: bool = False) -> requests.Response:
+        response = self.http.request(
+            method, f"{self.base_url}{path}", json=payload, timeout=self.timeout, stream=stream
+        )
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            _raise_for(response.status_code, message, session_id)
+        return response
+
+    def _call(self, method: str, path: str, payload: Optional[dict] = None, session_id: Optional[str] = None):
+        return self._request(method, path, payload, session_id).json()
+
+    def _stream(self, path: str, payload: dict, result: dict, session_id: Optional[str] = None) -> Iterator[str]:
+        with self._request("POST", path, {**payload, "stream": True}, session_id, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "token" in message:
+                    yield message["token"]
+                elif "result" in message:
+                    result["output"] = message["result"]
+                elif "error" in message:
+                    _raise_for(message.get("status", 500), message["error"], session_id)
+
+    def brief(self, timespro_url: str, competitor_url: str, model: str = "gpt-4o", use_cache: bool = True,
+              session_id: Optional[str] = None) -> str:
+        payload = dict(timespro_url=timespro_url, competitor_url=competitor_url, model=model,
+                       use_cache=use_cache, session_id=session_id)
+        return self._call("POST", "/v1/brief", payload, session_id)["brief"]
+
+    def stream_brief(self, timespro_url: str, competitor_url: str, result: dict, model: str = "gpt-4o",
+                     use_cache: bool = True, session_id: Optional[str] = None) -> Iterator[str]:
+        payload = dict(timespro_url=timespro_url, competitor_url=competitor_url, model=model,
+                       use_cache=use_cache, session_id=session_id)
+        return self._stream("/v1/brief", payload, result, session_id)
+
+    def preview(self, program_url: str, competitor_url: str = "") -> Dict:
+        return self._call("POST", "/v1/preview", {"program_url": program_url, "competitor_url": competitor_url})
+
+    def create_session(self, program_url: str, competitor_url: str = "", extra_programs: Iterable[str] = (),
+                       brief: str = "") -> Dict:
+        payload = dict(program_url=program_url, competitor_url=competitor_url,
+                       extra_programs=list(extra_programs), brief=brief)
+        return self._call("POST", "/v1/sessions", payload)
+
+    def get_session(self, session_id: str) -> Dict:
+        return self._call("GET", f"/v1/sessions/{session_id}", session_id=session_id)
+
+    def update_session(self, session_id: str, **fields) -> Dict:
+        if "extra_programs" in fields:
+            fields["extra_programs"] = list(fields["extra_programs"])
+        return self._call("PATCH", f"/v1/sessions/{session_id}", fields, session_id)
+
+    def delete_session(self, session_id: str):
+        self._call("DELETE", f"/v1/sessions/{session_id}", session_id=session_id)
+
+    def ask(self, session_id: str, question: str) -> Dict:
+        return self._call("POST", f"/v1/sessions/{session_id}/ask", {"question": question}, session_id)
+
+    def stream_ask(self, session_id: str, question: str, result: dict) -> Iterator[str]:
+        return self._stream(f"/v1/sessions/{session_id}/ask", {"question": question}, result, session_id)
+
+    def interview_questions(self, job_id: str, job_description: str = "", pdf_bytes: Optional[bytes] = None,
+                            num_questions: int = 10, system_prompt: Optional[str] = None,
+                            model: str = "gpt-4") -> List[str]:
+        payload = dict(job_id=job_id, job_description=job_description, num_questions=num_questions,
+                       system_prompt=system_prompt, model=model)
+        if pdf_bytes:
+            payload["pdf_base64"] = base64.b64encode(pdf_bytes).decode("ascii")
+        return self._call("POST", "/v1/interview-questions", payload)["questions"]
+
+    def stats(self) -> Dict:
+        return self._call("GET", "/v1/stats")
+
+
+class LocalClient:
+    """Same interface as HTTPClient, calling utils.services in this process."""
+
+    def __init__(self):
+        # Imported here so HTTP deployments of the apps never load vectorstores, FAISS or gcsfs.
+        from utils import services
+
+        self.services = services
+
+    def brief(self, timespro_url: str, competitor_url: str, model: str = "gpt-4o", use_cache: bool = True,
+              session_id: Optional[str] = None) -> str:
+        text = self.services.generate_brief(timespro_url, competitor_url, model, use_cache)
+        if session_id:
+            self.services.update_session(session_id, brief=text)
+        return text
+
+    def stream_brief(self, timespro_url: str, competitor_url: str, result: dict, model: str = "gpt-4o",
+                     use_cache: bool = True, session_id: Optional[str] = None) -> Iterator[str]:
+        def tokens():
+            # Started on first iteration, like HTTPClient, so the page fetch counts towards time to first token.
+            response = self.services.stream_brief(timespro_url, competitor_url, model, use_cache, session_id)
+            yield from response
+            result["output"] = {"brief": response.text}
+        return tokens()
+
+    def preview(self, program_url: str, competitor_url: str = "") -> Dict:
+        return self.services.preview(program_url, competitor_url)
+
+    def create_session(self, program_url: str, competitor_url: str = "", extra_programs: Iterable[str] = (),
+                       brief: str = "") -> Dict:
+        return self.services.create_session(program_url, competitor_url, extra_programs, brief)
+
+    def get_session(self, session_id: str) -> Dict:
+        return self.services.get_session(session_id)
+
+    def update_session(self, session_id: str, **fields) -> Dict:
+        return self.services.update_session(session_id, **fields)
+
+    def delete_session(self, session_id: str):
+        self.services.delete_session(session_id)
+
+    def ask(self, session_id: str, question: str) -> Dict:
+        return self.services.ask(session_id, question)
+
+    def stream_ask(self, session_id: str, question: str, result: dict) -> Iterator[str]:
+        return iter(self.services.stream_ask(session_id, question, result))
+
+    def interview_questions(self, job_id: str, job_description: str = "", pdf_bytes: Optional[bytes] = None,
+                            num_questions: int = 10, system_prompt: Optional[str] = None,
+                            model: str = "gpt-4") -> List[str]:
+        from utils.interview import DEFAULT_SYSTEM_PROMPT
+
+        return self.services.interview_questions(
+            job_id, job_description, pdf_bytes, num_questions, system_prompt or DEFAULT_SYSTEM_PROMPT, model
+        )
+
+    def stats(self) -> Dict:
+        return self.services.stats()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """HTTPClient for JOBREADY_API_URL if set, else the in-process LocalClient; one per process."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient(JOBREADY_API_URL) if JOBREADY_API_URL else LocalClient()
+        return _client
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_CACHE_DIR = os.environ.get("JOBREADY_CACHE_DIR", "/tmp/jobready_cache")
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache backed by a SQLite file.
+
+    SQLite handles locking, so the same file can be shared by every Streamlit
+    session and by several worker processes on one host. Entries older than
+    `max_age_seconds` are treated as missing, and the least recently used
+    entries are evicted once `max_entries` or `max_bytes` is exceeded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age_seconds: Optional[float] = None,
+    ):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"{name}.sqlite3")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, max_age_seconds: Optional[float] = None) -> Optional[bytes]:
+        max_age = max_age_seconds if max_age_seconds is not None else self.max_age_seconds
+        row = self._conn().execute(
+            "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if max_age is not None and time.time() - created_at > max_age:
+            return None
+        with self._conn() as conn:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return bytes(value)
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since `key` was stored, or None if it isn't cached."""
+        row = self._conn().execute("SELECT created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        return time.time() - row[0] if row else None
+
+    def set(self, key: str, value: bytes):
+        now = time.time()
+        with self._write_lock, self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict(conn)
+
+    def touch(self, key: str):
+        """Reset the age of an entry, e.g. after a successful revalidation."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("UPDATE cache SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection):
+        if self.max_age_seconds is not None:
+            conn.execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM cache WHERE key = ?", (row[0],))
+            count, total = count - 1, total - row[1]
+
+    def stats(self) -> dict:
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        return {"entries": count, "bytes": total, "path": self.path}
@@ -0,0 +1,104 @@
+import hashlib
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from utils.disk_cache import DiskCache
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace and case so trivially reworded questions share a key."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with a bounded in-memory LRU in front of a persistent
+    DiskCache, keyed by model name and text.
+
+    Queries are normalized before lookup; documents are keyed on their exact
+    text so indexed content is never altered.
+    """
+
+    def __init__(self, underlying: Embeddings, max_memory_entries: int = 4096, disk_cache: DiskCache = None):
+        self.underlying = underlying
+        self.model_name = getattr(underlying, "model", None) or type(underlying).__name__
+        self.max_memory_entries = max_memory_entries
+        self.disk_cache = disk_cache if disk_cache is not None else DiskCache(
+            "embeddings", max_entries=200_000, max_bytes=512 * 1024 * 1024
+        )
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x1f{kind}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+        stored = self.disk_cache.get(key)
+        if stored is None:
+            return None
+        vector = array("f", stored).tolist()
+        self._remember(key, vector)
+        with self._lock:
+            self.disk_hits += 1
+        return vector
+
+    def _remember(self, key: str, vector: List[float]):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key: str, vector: List[float]):
+        self._remember(key, vector)
+        self.disk_cache.set(key, array("f", vector).tobytes())
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", normalize_query(text))
+        vector = self._lookup(key)
+        if vector is not None:
+            return vector
+        with self._lock:
+            self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", t) for t in texts]
+        vectors = [self._lookup(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            fresh = self.underlying.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self._store(keys[i], vector)
+        return vectors
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.disk_cache import DiskCache
+from utils.tracing import span
+
+# Pages younger than this are served from disk without touching the network;
+# older ones are revalidated with ETag / Last-Modified.
+URL_CACHE_TTL_SECONDS = float(os.environ.get("URL_CACHE_TTL_SECONDS", 15 * 60))
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 8))
+FETCH_TIMEOUT_SECONDS = 15
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}   # helps avoid some 403s
+
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="url-fetch")
+_page_cache = DiskCache("url_pages", max_entries=2_000, max_bytes=128 * 1024 * 1024)
+
+
+def get_session() -> requests.Session:
+    """One pooled keep-alive session shared by every fetch in the process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=FETCH_MAX_WORKERS,
+                pool_maxsize=FETCH_MAX_WORKERS,
+                max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def fetch_html(url: str, ttl_seconds: float = URL_CACHE_TTL_SECONDS) -> str:
+    """
+    Return the HTML for `url`, using the on-disk cache when possible.
+
+    Fresh entries are returned directly. Stale entries are revalidated with a
+    conditional GET, and a 304 response just refreshes the entry's age.
+    """
+    cached = _page_cache.get(url)
+    entry = json.loads(cached) if cached else None
+    age = _page_cache.age(url) if entry is not None else None
+    if age is not None and age < ttl_seconds:
+        return entry["body"]
+
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    with span("url.fetch", url=url, revalidate=bool(headers)) as fields:
+        resp = get_session().get(url, headers=headers, timeout=FETCH_TIMEOUT_SECONDS)
+        fields["status"] = resp.status_code
+    if resp.status_code == 304 and entry is not None:
+        _page_cache.touch(url)
+        return entry["body"]
+
+    body = resp.text
+    if resp.ok:
+        _page_cache.set(url, json.dumps({
+            "body": body,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }).encode("utf-8"))
+    return body
+
+
+def page_age(url: str):
+    """Seconds since `url` was last fetched or revalidated, or None if it isn't cached."""
+    return _page_cache.age(url)
+
+
+def fetch_many(urls: list) -> dict:
+    """Fetch URLs in parallel; values are HTML strings or the raised exception."""
+    futures = {url: _executor.submit(fetch_html, url) for url in dict.fromkeys(urls)}
+    results = {}
+    for url, future in futures.items():
+        try:
+            results[url] = future.result()
+        except Exception as e:
+            results[url] = e
+    return results
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+
+
+def make_staging_dir(target_dir: str) -> str:
+    """Create an empty directory next to `target_dir` (same filesystem, so renames are atomic)."""
+    parent = os.path.dirname(os.path.abspath(target_dir))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f".{os.path.basename(target_dir)}.", dir=parent)
+
+
+def atomic_replace_dir(staging_dir: str, target_dir: str):
+    """
+    Publish `staging_dir` as `target_dir`.
+
+    The old directory is renamed aside before the new one is renamed into
+    place, so readers see either the complete old or the complete new files,
+    never a mix of both. The window in between is a single rename.
+    """
+    target_dir = os.path.abspath(target_dir)
+    backup_dir = None
+    if os.path.exists(target_dir):
+        backup_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(target_dir)}.old.", dir=os.path.dirname(target_dir))
+        os.rmdir(backup_dir)
+        os.rename(target_dir, backup_dir)
+    try:
+        os.rename(staging_dir, target_dir)
+    except OSError:
+        if backup_dir is not None:
+            os.rename(backup_dir, target_dir)
+        raise
+    if backup_dir is not None:
+        shutil.rmtree(backup_dir, ignore_errors=True)
@@ -0,0 +1,125 @@
+import re
+from dataclasses import dataclass
+
+from bs4 import BeautifulSoup
+
+from utils.tokens import count_tokens
+
+try:
+    import lxml  # noqa: F401  C parser, several times faster than html.parser
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "nav", "footer", "aside", "form", "button", "select", "link", "meta",
+]
+# Matched against whole class / id tokens only, so "program-banner" or "menu-of-courses" survive.
+BOILERPLATE_TOKEN = re.compile(
+    r"cookies?|cookie[-_](?:banner|consent|notice|bar)|consent|gdpr|newsletter|popup|modal|subscribe|"
+    r"breadcrumbs?|social|social[-_](?:share|links|icons)|share[-_](?:buttons|links)|"
+    r"navbar|nav|site[-_]nav|main[-_]menu|menu|footer|site[-_]footer|sidebar|whatsapp|chat[-_]widget",
+    re.IGNORECASE,
+)
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo"}
+# Fees, durations, dates: an element holding any of these is never stripped as boilerplate.
+FACT_TEXT = re.compile(r"\d|[₹$€£]|\b(?:INR|Rs|USD)\b")
+# Whole-line button labels; a line that merely starts with "Contact" or "Download" is content.
+CTA_LINE = re.compile(
+    r"(?:apply|apply now|enrol now|enroll now|register|register now|download brochure|call now|call us|"
+    r"chat with us|talk to us|talk to an expert|share|subscribe|know more|read more|view more|learn more|"
+    r"request a callback|request callback|book a demo|get in touch|contact us)\s*[>»→.!]*",
+    re.IGNORECASE,
+)
+MIN_MAIN_CHARS = 500
+
+
+@dataclass
+class ExtractedText:
+    text: str
+    token_count: int
+
+
+def _is_boilerplate(tag) -> bool:
+    tokens = list(tag.get("class") or []) + (tag.get("id") or "").split()
+    if not any(BOILERPLATE_TOKEN.fullmatch(token) for token in tokens) and tag.get("role") not in BOILERPLATE_ROLES:
+        return False
+    return not FACT_TEXT.search(tag.get_text(" ", strip=True))
+
+
+def _strip_boilerplate(soup: BeautifulSoup):
+    for tag in soup(BOILERPLATE_TAGS):
+        # Sidebars often carry the fee / duration card.
+        if tag.name == "aside" and FACT_TEXT.search(tag.get_text(" ", strip=True)):
+            continue
+        tag.decompose()
+    # Page-level headers hold the site menu; headers inside content keep their headings.
+    for header in soup.find_all("header"):
+        if header.parent is not None and header.parent.name in ("body", "[document]", "html"):
+            if not FACT_TEXT.search(header.get_text(" ", strip=True)):
+                header.decompose()
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.attrs is None:
+            continue
+        if tag.name not in ("body", "html", "main", "article") and _is_boilerplate(tag):
+            tag.decompose()
+
+
+def _clean_lines(lines) -> list:
+    """Drop consecutive repeats and bare button labels."""
+    kept = []
+    for line in lines:
+        line = re.sub(r"\s+", " ", line).strip()
+        if not line or CTA_LINE.fullmatch(line):
+            continue
+        # Only adjacent repeats: the same fee line under two batches is content.
+        if kept and kept[-1].casefold() == line.casefold():
+            continue
+        kept.append(line)
+    return kept
+
+
+def _with_outside_facts(soup: BeautifulSoup, root) -> list:
+    """
+    Lines of `root` (the page's main element), plus the headings and fact
+    lines (fees, durations, dates) outside it, in document order. Program
+    pages often put the title and fee card in a hero section above <main>.
+    """
+    body = soup.body or soup
+    headings = {
+        re.sub(r"\s+", " ", h.get_text(" ", strip=True)).casefold()
+        for h in body.find_all(["h1", "h2", "h3"]) if root not in h.parents and h is not root
+    }
+    main_lines = root.get_text(separator="\n").splitlines()
+    marker = "\x00main\x00"
+    root.replace_with(marker)
+    before, _, after = body.get_text(separator="\n").partition(marker)
+
+    def keep(line):
+        return FACT_TEXT.search(line) or re.sub(r"\s+", " ", line).strip().casefold() in headings
+    return [line for line in before.splitlines() if keep(line)] + main_lines + [
+        line for line in after.splitlines() if keep(line)
+    ]
+
+
+def extract_main_text(html: str, model: str = "gpt-4o") -> ExtractedText:
+    """
+    Visible main content of a page, without navigation, footers, banners,
+    scripts or repeated blocks, plus its token count.
+    """
+    soup = BeautifulSoup(html, PARSER)
+    _strip_boilerplate(soup)
+
+    root = None
+    for candidate in (soup.find("main"), soup.find("article"), soup.find(attrs={"role": "main"})):
+        if candidate is not None and len(candidate.get_text(strip=True)) >= MIN_MAIN_CHARS:
+            root = candidate
+            break
+
+    if root is None:
+        lines = (soup.body or soup).get_text(separator="\n").splitlines()
+    else:
+        lines = _with_outside_facts(soup, root)
+    text = "\n".join(_clean_lines(lines))
+    return ExtractedText(text=text, token_count=count_tokens(text, model))
@@ -0,0 +1,205 @@
+"""
+Hybrid BM25 + vector retrieval over the program shards.
+
+`BM25Index` is an inverted keyword index over one vectorstore's docstore,
+built once per loaded shard (`bm25_for`). It keeps only docstore ids and
+postings; hit texts are read back through the docstore, so memory-mapped
+shards stay off the heap. `HybridScope` searches the selected
+programs both lexically and through FAISS and fuses the two rankings with
+reciprocal rank fusion. Short factual lookups ("fees", "duration",
+"eligibility", ...) whose best keyword hit covers every query term are
+answered from the keyword index alone, skipping the query embedding and the
+dense search entirely.
+
+RETRIEVAL_MODE picks the default: "hybrid" (fused, with the fast path),
+"vector" (dense only) or "lexical" (keyword only). `stats()` reports how many
+keyword searches the fast path answered, and those searches are also traced
+as "retrieval.fast_path".
+"""
+import math
+import os
+import threading
+import time
+import weakref
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from utils.mmap_docstore import iter_document_items
+from utils.programs import slug
+from utils.retrieval import tokenize
+from utils.tracing import span, tracer
+
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+RRF_K = 60
+
+_stats_lock = threading.Lock()
+hybrid_stats = {"searches": 0, "fast_path": 0}
+
+# Query words that mark an exact-lookup question, where keyword matching is reliable.
+FACT_TERMS = frozenset(
+    "fee fees cost costs price pricing emi instalment installment duration months weeks long "
+    "eligibility eligible criteria experience campus immersion visit visits start date dates "
+    "batch schedule certificate certification alumni status mode online weekend weekends".split()
+)
+
+
+class BM25Index:
+    """Okapi BM25 over the documents of a docstore (InMemoryDocstore or MmapDocstore)."""
+
+    def __init__(self, docstore, k1: float = 1.5, b: float = 0.75):
+        self.docstore = docstore
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        # Documents are streamed once to build the postings; none are kept.
+        for i, (doc_id, doc) in enumerate(iter_document_items(docstore)):
+            counts = Counter(tokenize(doc.page_content))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+            self.ids.append(doc_id)
+            self.doc_lengths.append(sum(counts.values()))
+        n = len(self.ids)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, query: str, k: int = 10, filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Top `k` documents by BM25 score (higher is better); only documents sharing a term are scored."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / (self.avg_length or 1))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        hits = []
+        for i, score in ranked:
+            doc = self.docstore.search(self.ids[i])
+            if not isinstance(doc, Document):
+                continue
+            if filter and any(doc.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            hits.append((doc, score))
+            if len(hits) >= k:
+                break
+        return hits
+
+
+_indexes = weakref.WeakKeyDictionary()  # loaded vectorstore -> BM25Index
+_build_locks = weakref.WeakKeyDictionary()  # loaded vectorstore -> Lock
+_indexes_lock = threading.Lock()
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            hybrid_stats[name] += value
+
+
+def stats() -> dict:
+    """Keyword-path searches and how many of them the fast path answered on its own."""
+    with _stats_lock:
+        searches, fast = hybrid_stats["searches"], hybrid_stats["fast_path"]
+    return {"searches": searches, "fast_path": fast, "fast_path_rate": round(fast / searches, 4) if searches else 0.0}
+
+
+def bm25_for(vectorstore) -> BM25Index:
+    """The keyword index for a loaded vectorstore, built on first use and dropped with the store."""
+    with _indexes_lock:
+        index = _indexes.get(vectorstore)
+        if index is not None:
+            return index
+        build_lock = _build_locks.setdefault(vectorstore, threading.Lock())
+    # Per-store lock, so building one shard doesn't hold up searches on the others.
+    with build_lock:
+        with _indexes_lock:
+            index = _indexes.get(vectorstore)
+        if index is None:
+            with span("retrieval.bm25_build") as fields:
+                index = BM25Index(vectorstore.docstore)
+                fields["docs"] = len(index.ids)
+            with _indexes_lock:
+                _indexes[vectorstore] = index
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], weights: List[float], k: int = RRF_K) -> List[Tuple[Document, float]]:
+    """Fuse ranked lists; documents are matched by program and text. Scores are higher-is-better."""
+    fused, docs = defaultdict(float), {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking):
+            key = (doc.metadata.get("program"), doc.page_content)
+            fused[key] += weight / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return sorted(((docs[key], score) for key, score in fused.items()), key=lambda item: -item[1])
+
+
+class HybridScope:
+    """
+    A ProgramIndex restricted to some programs, searched lexically and densely.
+
+    Drop-in for ProgramScope as a retriever's vectorstore. Returned scores are
+    fused RRF scores (or BM25 scores on the lexical paths), higher is better,
+    and results are already in rank order.
+    """
+
+    def __init__(
+        self,
+        index,
+        programs: List[str],
+        filter: Optional[Dict] = None,
+        mode: str = RETRIEVAL_MODE,
+        lexical_weight: float = 1.0,
+        vector_weight: float = 1.0,
+        fast_path: bool = True,
+        fast_path_max_terms: int = 6,
+    ):
+        self.index = index
+        self.programs = programs
+        self.filter = filter
+        self.mode = mode
+        self.lexical_weight = lexical_weight
+        self.vector_weight = vector_weight
+        self.fast_path = fast_path
+        self.fast_path_max_terms = fast_path_max_terms
+
+    def lexical_search_with_score(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        hits = []
+        for url in self.programs:
+            program = slug(url)
+            for doc, score in bm25_for(self.index.load_shard(url)).search(query, k=k, filter=self.filter):
+                hits.append((Document(page_content=doc.page_content, metadata={**doc.metadata, "program": program}), score))
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+    def _confident(self, query: str, hits: List[Tuple[Document, float]]) -> bool:
+        """A short fact lookup whose best keyword hit contains every query term."""
+        terms = set(tokenize(query))
+        if not hits or not terms or len(terms) > self.fast_path_max_terms or not terms & FACT_TERMS:
+            return False
+        return terms <= set(tokenize(hits[0][0].page_content))
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        if self.mode == "vector":
+            return self.index.similarity_search_with_score(query, k=k, programs=self.programs, filter=self.filter, **kwargs)
+
+        start = time.perf_counter()
+        with span("retrieval.lexical", programs=len(self.programs)) as fields:
+            lexical = self.lexical_search_with_score(query, k)
+            fast = self.mode == "lexical" or (self.fast_path and self._confident(query, lexical))
+            fields["fast_path"] = fast
+        _count(searches=1, fast_path=int(fast))
+        if fast:
+            tracer.record("retrieval.fast_path", time.perf_counter() - start, programs=len(self.programs))
+            return lexical
+
+        dense = self.index.similarity_search_with_score(query, k=k, programs=self.programs, filter=self.filter, **kwargs)
+        fused = reciprocal_rank_fusion(
+            [[doc for doc, _ in dense], [doc for doc, _ in lexical]], [self.vector_weight, self.lexical_weight]
+        )
+        return fused[:k]
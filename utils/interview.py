@@ -0,0 +1,55 @@
+"""
+Interview-question generation shared by the Streamlit apps and the batch CLI.
+"""
+import openai
+
+DEFAULT_SYSTEM_PROMPT = "You are an expert recruiter generating job interview questions."
+
+QUESTION_PROMPT_TEMPLATE = """
+    You are a hiring manager creating interview questions for a job candidate.
+    Based on the following job description and job ID, generate {num_questions} relevant and thoughtful interview questions.
+    
+    ### Job Description:
+    {job_description}
+    
+    ### Job ID:
+    {job_id}
+    
+    The questions should assess technical skills, job-specific knowledge, and behavioral traits.
+    
+    Respond ONLY with a numbered list of {num_questions} questions.
+    """
+
+# Errors worth retrying; anything else (bad request, auth) fails the job straight away.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def parse_questions(content: str) -> list:
+    """Split the model's numbered list into one entry per non-empty line."""
+    return [line.strip() for line in content.strip().split("\n") if line.strip()]
+
+
+def generate_questions(
+    job_description: str,
+    job_id: str,
+    num_questions: int = 10,
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+    model: str = "gpt-4",
+) -> list:
+    """Generates `num_questions` interview questions based on the job description and job ID."""
+    prompt = QUESTION_PROMPT_TEMPLATE.format(
+        num_questions=num_questions, job_description=job_description, job_id=job_id
+    )
+    response = openai.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+    )
+    return parse_questions(response.choices[0].message.content)
@@ -1,16 +1,15 @@
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOpenAI
-import streamlit as st
+import hashlib
+import os
+from functools import lru_cache
 
-def get_combined_response(
-    pdf_text: str,
-    url_texts: dict,
-    timespro_url: str,
-    competitor_url: str,
-    model_choice: str = "gpt-4o"
-) -> str:
-    prompt_template = """
+from utils.disk_cache import DiskCache
+from utils.llm_clients import SingleFlight, get_chat_model, limited_stream, llm_slot
+from utils.streaming import StreamedResponse
+from utils.tracing import LLMTraceHandler
+
+BRIEF_PROMPT_TEMPLATE = """
 You are a strategic program analyst helping the sales team pitch a TimesPro program to learners.
 
 Using only the information provided in the below documents, create a sales‑enablement brief comparing the TimesPro program with the competitor’s program.
@@ -73,22 +72,125 @@ NEVER mention delivery platforms (like Emeritus, upGrad, or Coursera), even if t
 {comp_text}
 """
 
-    tp_text = url_texts.get(timespro_url, "")
-    comp_text = url_texts.get(competitor_url, "")
+# Briefs are deterministic (temperature 0), so identical inputs can be served
+# from disk. Entries expire after BRIEF_CACHE_MAX_AGE_SECONDS (default 7 days).
+_brief_cache = DiskCache(
+    "sales_briefs",
+    max_entries=int(os.environ.get("BRIEF_CACHE_MAX_ENTRIES", 5_000)),
+    max_bytes=int(os.environ.get("BRIEF_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    max_age_seconds=float(os.environ.get("BRIEF_CACHE_MAX_AGE_SECONDS", 7 * 24 * 3600)),
+)
 
-    full_prompt = PromptTemplate(
-        input_variables=["timespro_url", "competitor_url", "tp_text", "comp_text"],
-        template=prompt_template
-    )
 
-    chain = LLMChain(
-        llm=ChatOpenAI(model_name=model_choice, openai_api_key=st.secrets["OPENAI_API_KEY"], temperature=0),
-        prompt=full_prompt,
+# Identical briefs requested at the same moment (same pair, same pages) share one gpt-4o call.
+brief_flights = SingleFlight()
+
+
+@lru_cache(maxsize=None)
+def _brief_chain(model_choice: str) -> LLMChain:
+    """One brief chain per model for the process, on the shared client."""
+    return LLMChain(
+        llm=get_chat_model(model_choice, temperature=0).with_config(
+            callbacks=[LLMTraceHandler("llm.brief", model_choice)]
+        ),
+        prompt=PromptTemplate.from_template(BRIEF_PROMPT_TEMPLATE),
     )
 
-    return chain.run({
-        "timespro_url": timespro_url,
-        "competitor_url": competitor_url,
-        "tp_text": tp_text,
-        "comp_text": comp_text
-    })
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def brief_cache_key(model_choice: str, timespro_url: str, competitor_url: str, tp_text: str, comp_text: str) -> str:
+    """Content-addressed key: model, prompt template, the URLs shown in the prompt and both page texts."""
+    parts = [model_choice, _sha256(BRIEF_PROMPT_TEMPLATE), timespro_url, competitor_url, _sha256(tp_text), _sha256(comp_text)]
+    return _sha256("\x1f".join(parts))
+
+
+def _brief_texts(url_texts: dict, timespro_url: str, competitor_url: str):
+    return url_texts.get(timespro_url, ""), url_texts.get(competitor_url, "")
+
+
+def brief_cache_age(url_texts: dict, timespro_url: str, competitor_url: str, model_choice: str = "gpt-4o"):
+    """Seconds since the brief for these exact page texts was stored, or None if it isn't cached."""
+    tp_text, comp_text = _brief_texts(url_texts, timespro_url, competitor_url)
+    age = _brief_cache.age(brief_cache_key(model_choice, timespro_url, competitor_url, tp_text, comp_text))
+    if age is None or age > _brief_cache.max_age_seconds:
+        return None
+    return age
+
+
+def _store_brief(cache_key: str, brief: str, tp_text: str, comp_text: str):
+    # Never pin a brief that was written from a failed page fetch.
+    if not any(t.startswith("Error fetching URL content") for t in (tp_text, comp_text)):
+        _brief_cache.set(cache_key, brief.encode("utf-8"))
+
+
+def get_combined_response(
+    pdf_text: str,
+    url_texts: dict,
+    timespro_url: str,
+    competitor_url: str,
+    model_choice: str = "gpt-4o",
+    use_cache: bool = True,
+) -> str:
+    tp_text, comp_text = _brief_texts(url_texts, timespro_url, competitor_url)
+
+    cache_key = brief_cache_key(model_choice, timespro_url, competitor_url, tp_text, comp_text)
+    if use_cache:
+        cached = _brief_cache.get(cache_key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+    def generate():
+        with llm_slot():
+            return _brief_chain(model_choice).run({
+                "timespro_url": timespro_url,
+                "competitor_url": competitor_url,
+                "tp_text": tp_text,
+                "comp_text": comp_text
+            })
+
+    brief = brief_flights.do(cache_key, generate)
+    # Still store the fresh result when bypassing, so the next caller benefits.
+    _store_brief(cache_key, brief, tp_text, comp_text)
+    return brief
+
+
+def stream_combined_response(
+    pdf_text: str,
+    url_texts: dict,
+    timespro_url: str,
+    competitor_url: str,
+    model_choice: str = "gpt-4o",
+    use_cache: bool = True,
+) -> StreamedResponse:
+    """
+    Streaming variant of `get_combined_response`.
+
+    Returns a `StreamedResponse` that yields tokens as gpt-4o produces them; a
+    cached brief is yielded in one piece. The full text is cached once the
+    stream is exhausted.
+    """
+    tp_text, comp_text = _brief_texts(url_texts, timespro_url, competitor_url)
+
+    cache_key = brief_cache_key(model_choice, timespro_url, competitor_url, tp_text, comp_text)
+    if use_cache:
+        cached = _brief_cache.get(cache_key)
+        if cached is not None:
+            return StreamedResponse(iter([cached.decode("utf-8")]))
+
+    prompt_text = PromptTemplate.from_template(BRIEF_PROMPT_TEMPLATE).format(
+        timespro_url=timespro_url,
+        competitor_url=competitor_url,
+        tp_text=tp_text,
+        comp_text=comp_text,
+    )
+    llm = get_chat_model(model_choice, temperature=0, streaming=True)
+    config = {"callbacks": [LLMTraceHandler("llm.brief", model_choice)]}
+    tokens = brief_flights.stream(
+        cache_key, lambda: limited_stream(lambda: (chunk.content for chunk in llm.stream(prompt_text, config=config)))
+    )
+    return StreamedResponse(
+        tokens, on_complete=lambda response: _store_brief(cache_key, response.text, tp_text, comp_text)
+    )
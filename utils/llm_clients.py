@@ -0,0 +1,184 @@
+"""
+Process-wide LLM clients, request coalescing and concurrency limits.
+
+`get_chat_model` hands out one ChatOpenAI per (model, temperature, streaming)
+so every session reuses the same HTTP connection pool. Per-request callbacks
+are bound with `.with_config(callbacks=[...])` or passed at invoke time, never
+baked into the shared client.
+
+`SingleFlight` lets identical concurrent requests share one upstream call
+(including streamed ones), and `llm_slot` caps how many calls run at once
+(LLM_MAX_IN_FLIGHT admission slots from utils.presence, shared across workers
+with PRESENCE_BACKEND=sqlite) on top of the client-side request rate limit
+(LLM_REQUESTS_PER_SECOND).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+from langchain_community.chat_models import ChatOpenAI
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+from utils.presence import LLM_MAX_IN_FLIGHT, get_presence_tracker
+
+LLM_REQUESTS_PER_SECOND = float(os.environ.get("LLM_REQUESTS_PER_SECOND", 5))
+# How long a call waits for a free slot before giving up with LLMBusyError.
+LLM_SLOT_TIMEOUT_SECONDS = float(os.environ.get("LLM_SLOT_TIMEOUT_SECONDS", 10))
+LLM_SLOT_POLL_SECONDS = 0.1
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when no LLM slot frees up within LLM_SLOT_TIMEOUT_SECONDS."""
+
+
+def openai_api_key() -> str:
+    """OPENAI_API_KEY from Streamlit secrets, falling back to the environment outside Streamlit."""
+    try:
+        import streamlit as st
+
+        return st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        return os.environ.get("OPENAI_API_KEY", "")
+
+
+# One limiter for the whole process: it's the account's rate limit we respect, not a per-model one.
+_rate_limiter = InMemoryRateLimiter(
+    requests_per_second=LLM_REQUESTS_PER_SECOND, check_every_n_seconds=0.05, max_bucket_size=max(LLM_MAX_IN_FLIGHT, 1)
+)
+_models: Dict[Tuple[str, float, bool], ChatOpenAI] = {}
+_models_lock = threading.Lock()
+
+
+def get_chat_model(model_name: str = "gpt-4o", temperature: float = 0, streaming: bool = False) -> ChatOpenAI:
+    """Shared chat model for this configuration, created on first use."""
+    key = (model_name, temperature, streaming)
+    with _models_lock:
+        if key not in _models:
+            _models[key] = ChatOpenAI(
+                model_name=model_name,
+                openai_api_key=openai_api_key(),
+                temperature=temperature,
+                streaming=streaming,
+                rate_limiter=_rate_limiter,
+            )
+        return _models[key]
+
+
+@contextmanager
+def llm_slot(timeout: float = LLM_SLOT_TIMEOUT_SECONDS):
+    """
+    Hold one of LLM_MAX_IN_FLIGHT admission slots for the duration of an LLM call.
+
+    This is the app's only LLM concurrency limit. Slots come from the presence
+    tracker, so with PRESENCE_BACKEND=sqlite the cap holds across workers.
+    Waits up to `timeout` for a slot, then raises LLMBusyError. Don't nest:
+    each level would take its own slot.
+    """
+    tracker = get_presence_tracker()
+    deadline = time.monotonic() + timeout
+    while True:
+        with tracker.admit("llm", LLM_MAX_IN_FLIGHT) as admitted:
+            if admitted:
+                yield
+                return
+        if time.monotonic() >= deadline:
+            raise LLMBusyError(f"All {LLM_MAX_IN_FLIGHT} LLM slots busy after {timeout:g}s")
+        time.sleep(LLM_SLOT_POLL_SECONDS)
+
+
+def limited_stream(make_tokens: Callable[[], Iterable[str]], timeout: float = LLM_SLOT_TIMEOUT_SECONDS) -> Iterator[str]:
+    """Iterate a token stream while holding an LLM slot; the slot is taken on first `next()`."""
+    with llm_slot(timeout):
+        yield from make_tokens()
+
+
+class _Flight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls by key.
+
+    The first caller for a key (the leader) starts the upstream call on a
+    worker thread; callers arriving before it finishes attach to the same
+    flight instead of starting their own. Streams are buffered, so a late
+    follower replays the tokens produced so far and then continues live.
+    Nothing is remembered after the flight lands; caching is the caller's job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self.coalesced = 0
+
+    def _join(self, key: Tuple[str, str], start: Callable[[_Flight], None]) -> _Flight:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight
+            flight = self._flights[key] = _Flight()
+
+        def run():
+            try:
+                start(flight)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                with flight.cond:
+                    flight.done = True
+                    flight.cond.notify_all()
+
+        # The worker owns the upstream call, so it finishes even if the leader's session goes away.
+        threading.Thread(target=run, daemon=True, name=f"single-flight-{key[1][:8]}").start()
+        return flight
+
+    def do(self, key: str, fn: Callable[[], object]):
+        """Return `fn()`, sharing the result with identical concurrent calls."""
+        def start(flight):
+            flight.result = fn()
+
+        flight = self._join(("do", key), start)
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key: str, make_tokens: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """Yield the tokens of `make_tokens()`, sharing one upstream stream with identical concurrent calls."""
+        def start(flight):
+            for token in make_tokens():
+                with flight.cond:
+                    flight.chunks.append(token)
+                    flight.cond.notify_all()
+
+        # Kept apart from `do` flights: a stream's followers need tokens, not a result.
+        flight = self._join(("stream", key), start)
+        position = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: position < len(flight.chunks) or flight.done)
+                pending = flight.chunks[position:]
+                finished = flight.done
+            for token in pending:
+                yield token
+            position += len(pending)
+            if finished and position >= len(flight.chunks):
+                break
+        if flight.error is not None:
+            raise flight.error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._flights), "coalesced": self.coalesced}
@@ -1,27 +1,55 @@
-import requests
-from bs4 import BeautifulSoup
-import PyPDF2
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils.fetcher import fetch_many
+from utils.html_extract import ExtractedText, extract_main_text
+from utils.pdf_extract import extract_pdf_text
+from utils.tracing import span
+
+_PARSED_TEXT_MAX_ENTRIES = 256
+_parsed_text = OrderedDict()  # sha256(html) -> ExtractedText
+_parsed_lock = threading.Lock()
+
 
 def load_pdf(pdf_path):
-    text = ""
-    with open(pdf_path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+    return extract_pdf_text(pdf_path)
 
-def load_url_content(urls: list) -> dict:
-    url_contexts = {}
-    headers = {"User-Agent": "Mozilla/5.0"}   # helps avoid some 403s
+
+def _extract(html: str) -> ExtractedText:
+    """Extract main content once per distinct page body."""
+    digest = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    with _parsed_lock:
+        if digest in _parsed_text:
+            _parsed_text.move_to_end(digest)
+            return _parsed_text[digest]
+
+    with span("url.extract", html_bytes=len(html)) as fields:
+        extracted = extract_main_text(html)
+        fields["tokens"] = extracted.token_count
+
+    with _parsed_lock:
+        _parsed_text[digest] = extracted
+        while len(_parsed_text) > _PARSED_TEXT_MAX_ENTRIES:
+            _parsed_text.popitem(last=False)
+    return extracted
+
+
+def load_url_extracts(urls: list) -> dict:
+    """Like load_url_content, but values are ExtractedText with a token count."""
+    url_extracts = {}
+    with span("url.fetch_many", urls=len(urls)):
+        pages = fetch_many(urls)
     for url in urls:
         try:
-            resp = requests.get(url, headers=headers, timeout=15)
-            soup = BeautifulSoup(resp.text, "html.parser")
-            # NO TRUNCATION  – grab full visible text
-            url_contexts[url] = soup.get_text(separator=" ", strip=True)
+            page = pages[url]
+            if isinstance(page, Exception):
+                raise page
+            url_extracts[url] = _extract(page)
         except Exception as e:
-            url_contexts[url] = f"Error fetching URL content: {e}"
-    return url_contexts
+            url_extracts[url] = ExtractedText(text=f"Error fetching URL content: {e}", token_count=0)
+    return url_extracts
 
+
+def load_url_content(urls: list) -> dict:
+    return {url: extracted.text for url, extracted in load_url_extracts(urls).items()}
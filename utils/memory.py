@@ -0,0 +1,164 @@
+"""
+Token-bounded chat memory for the follow-up chatbot.
+
+Dialogue is kept under a hard token budget: once the recent turns exceed
+`max_token_limit`, the oldest turns are dropped from the buffer and, when a
+summary model is given, folded into a running summary on a background thread
+so the answer never waits for it. Folds take an LLM slot like any other call;
+when none frees up, the dropped turns wait for the next fold. Static context
+(program pages, the sales brief) doesn't belong in memory at all;
+`build_static_context` trims it to a fixed budget for the answer prompt
+instead.
+"""
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, get_buffer_string
+from pydantic import PrivateAttr
+
+from utils.llm_clients import LLMBusyError, llm_slot
+from utils.tokens import count_tokens, truncate_to_tokens
+
+
+class TokenBudgetMemory(BaseChatMemory):
+    """Recent turns within `max_token_limit` tokens, plus an optional running summary."""
+
+    memory_key: str = "chat_history"
+    max_token_limit: int = 1500
+    summary_token_limit: int = 300
+    summary_llm: Optional[BaseLanguageModel] = None
+    model: str = "gpt-4o"
+    summary: str = ""
+    # Tokens the memory contributed to the most recent prompt.
+    last_turn_tokens: Dict[str, int] = {}
+    # Called with the new summary after a background fold, e.g. to persist it.
+    on_summary: Optional[Callable[[str], None]] = None
+
+    _turns: List[Tuple[BaseMessage, BaseMessage, int]] = PrivateAttr(default_factory=list)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    # Dropped messages waiting for the summary; one fold thread at a time drains them.
+    _pending: List[BaseMessage] = PrivateAttr(default_factory=list)
+    _folding: bool = PrivateAttr(default=False)
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @property
+    def history_tokens(self) -> int:
+        return sum(tokens for _, _, tokens in self._turns)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            messages = [m for human, ai, _ in self._turns for m in (human, ai)]
+            summary = self.summary
+            self.last_turn_tokens = {
+                "history": self.history_tokens,
+                "summary": count_tokens(summary, self.model),
+                "turns": len(self._turns),
+            }
+        if summary:
+            messages = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] + messages
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: get_buffer_string(messages)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        question, answer = self._get_input_output(inputs, outputs)
+        human, ai = HumanMessage(content=question), AIMessage(content=answer)
+        # Token counts are cached per turn, so each save costs one count, not a recount of history.
+        tokens = count_tokens(question, self.model) + count_tokens(answer, self.model)
+        start_fold = False
+        with self._lock:
+            self._turns.append((human, ai, tokens))
+            dropped = []
+            # Always keep the latest turn, even if it alone is over budget.
+            while len(self._turns) > 1 and self.history_tokens > self.max_token_limit:
+                dropped.append(self._turns.pop(0))
+            if self.summary_llm is not None:
+                self._pending.extend(m for human, ai, _ in dropped for m in (human, ai))
+                # Also picks up turns whose fold was deferred while the LLM was busy.
+                if self._pending:
+                    start_fold, self._folding = not self._folding, True
+        if start_fold:
+            threading.Thread(target=self._fold_into_summary, daemon=True).start()
+
+    def _fold_into_summary(self):
+        # Folds run one at a time, each from the summary the previous one left, so none is overwritten.
+        while True:
+            with self._lock:
+                messages, self._pending = self._pending, []
+                current = self.summary
+                if not messages:
+                    self._folding = False
+                    return
+            try:
+                prompt = SUMMARY_PROMPT.format(summary=current, new_lines=get_buffer_string(messages))
+                with llm_slot():
+                    result = self.summary_llm.invoke(prompt)
+                text = getattr(result, "content", result)
+            except LLMBusyError:
+                # Under load the fold yields to replies; the next saved turn retries it.
+                with self._lock:
+                    self._pending[:0] = messages
+                    self._folding = False
+                return
+            except Exception:
+                # The turns are already out of the buffer; losing them beats failing a reply.
+                continue
+            with self._lock:
+                self.summary = truncate_to_tokens(str(text).strip(), self.summary_token_limit, self.model)
+                summary = self.summary
+            if self.on_summary is not None:
+                self.on_summary(summary)
+
+    def export_state(self) -> Dict[str, Any]:
+        """Plain-JSON snapshot of the summary and the turns in the buffer."""
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "turns": [[human.content, ai.content] for human, ai, _ in self._turns],
+            }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Load an `export_state` snapshot; nothing is re-summarized."""
+        turns = [
+            (HumanMessage(content=q), AIMessage(content=a), count_tokens(q, self.model) + count_tokens(a, self.model))
+            for q, a in (state or {}).get("turns", [])
+        ]
+        with self._lock:
+            self._turns = turns
+            self.summary = (state or {}).get("summary", "")
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._turns.clear()
+            self._pending.clear()
+            self.summary = ""
+            self.last_turn_tokens = {}
+
+
+@lru_cache(maxsize=64)
+def _trimmed(text: str, max_tokens: int, model: str) -> Tuple[str, int]:
+    trimmed = truncate_to_tokens(text, max_tokens, model)
+    return trimmed, count_tokens(trimmed, model)
+
+
+def build_static_context(sections: Dict[str, str], max_tokens_per_section: int, model: str = "gpt-4o") -> Tuple[str, int]:
+    """
+    Join titled context sections, each trimmed to `max_tokens_per_section`.
+
+    Returns (text, tokens). Trimming is memoized, so rebuilding the same
+    context on every turn is free.
+    """
+    parts, total = [], 0
+    for title, text in sections.items():
+        trimmed, tokens = _trimmed(text or "", max_tokens_per_section, model)
+        parts.append(f"--- {title} ---\n{trimmed or '(none)'}")
+        total += tokens
+    return "\n\n".join(parts), total
@@ -0,0 +1,139 @@
+"""
+Read-only, memory-mapped docstore format for program vectorstores.
+
+A folder holds the usual `index.faiss` plus:
+
+    docstore.bin          page texts and metadata JSON, concatenated UTF-8
+    docstore.offsets.npy  int64 array of (text_off, text_len, meta_off, meta_len) per row
+    docstore.ids.json     docstore ids in row order and the FAISS position -> id map
+
+Nothing is unpickled: the blob and offsets are mapped and a Document is only
+built when `search` asks for it, so several worker processes loading the same
+folder share pages through the OS page cache.
+"""
+import json
+import mmap
+import os
+import pickle
+from typing import Iterator, Tuple, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+BLOB_FILE = "docstore.bin"
+OFFSETS_FILE = "docstore.offsets.npy"
+IDS_FILE = "docstore.ids.json"
+MMAP_DOCSTORE_FILES = (BLOB_FILE, OFFSETS_FILE, IDS_FILE)
+
+
+def has_mmap_docstore(folder: str) -> bool:
+    return all(os.path.exists(os.path.join(folder, name)) for name in MMAP_DOCSTORE_FILES)
+
+
+class ReadOnlyDocstoreError(RuntimeError):
+    """Raised when a FAISS store loaded with an MmapDocstore is asked to add or delete documents."""
+
+
+class MmapDocstore(Docstore):
+    """Docstore that reads documents lazily from a memory-mapped blob."""
+
+    def __init__(self, folder: str):
+        with open(os.path.join(folder, IDS_FILE)) as f:
+            ids = json.load(f)
+        self.ids = ids["ids"]
+        self.index_to_docstore_id = {i: doc_id for i, doc_id in enumerate(ids["index_to_docstore_id"])}
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._offsets = np.load(os.path.join(folder, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(folder, BLOB_FILE), "rb") as f:
+            # mmap can't map an empty file
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _read(self, row: int) -> Document:
+        text_off, text_len, meta_off, meta_len = (int(v) for v in self._offsets[row])
+        text = self._blob[text_off:text_off + text_len].decode("utf-8")
+        metadata = json.loads(self._blob[meta_off:meta_off + meta_len].decode("utf-8"))
+        return Document(id=self.ids[row], page_content=text, metadata=metadata)
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self._read(row)
+
+    def iter_documents(self) -> Iterator[Document]:
+        for row in range(len(self.ids)):
+            yield self._read(row)
+
+    def add(self, texts: dict) -> None:
+        raise ReadOnlyDocstoreError("MmapDocstore is read-only; rebuild the folder instead.")
+
+    def delete(self, ids: list) -> None:
+        raise ReadOnlyDocstoreError("MmapDocstore is read-only; rebuild the folder instead.")
+
+
+def iter_documents(docstore) -> Iterator[Document]:
+    """Iterate the documents of an InMemoryDocstore or MmapDocstore."""
+    if hasattr(docstore, "iter_documents"):
+        return docstore.iter_documents()
+    return iter(docstore._dict.values())
+
+
+def iter_document_items(docstore) -> Iterator[Tuple[str, Document]]:
+    """Iterate (docstore id, document) pairs of an InMemoryDocstore or MmapDocstore."""
+    if isinstance(docstore, MmapDocstore):
+        return zip(docstore.ids, docstore.iter_documents())
+    return iter(docstore._dict.items())
+
+
+def write_mmap_docstore(folder: str, documents: dict, index_to_docstore_id: dict):
+    """Write `documents` ({id: Document}) in the mmap format into `folder`."""
+    ids = list(documents)
+    offsets = np.zeros((len(ids), 4), dtype=np.int64)
+    position = 0
+    with open(os.path.join(folder, BLOB_FILE), "wb") as blob:
+        for row, doc_id in enumerate(ids):
+            doc = documents[doc_id]
+            text = doc.page_content.encode("utf-8")
+            meta = json.dumps(doc.metadata or {}, default=str).encode("utf-8")
+            blob.write(text)
+            blob.write(meta)
+            offsets[row] = (position, len(text), position + len(text), len(meta))
+            position += len(text) + len(meta)
+    np.save(os.path.join(folder, OFFSETS_FILE), offsets)
+    with open(os.path.join(folder, IDS_FILE), "w") as f:
+        json.dump({
+            "ids": ids,
+            "index_to_docstore_id": [index_to_docstore_id[i] for i in range(len(index_to_docstore_id))],
+        }, f)
+
+
+def convert_pickle_folder(folder: str):
+    """Write the mmap docstore files next to an existing LangChain `index.pkl`."""
+    # Only run this on folders we built ourselves: it unpickles index.pkl.
+    with open(os.path.join(folder, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    write_mmap_docstore(folder, dict(docstore._dict), index_to_docstore_id)
+
+
+def load_faiss_mmap(folder: str, embeddings):
+    """Load a FAISS vectorstore whose docstore is in the mmap format."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    index_path = os.path.join(folder, "index.faiss")
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except (AttributeError, RuntimeError):
+        # Older faiss builds or index types without mmap support.
+        index = faiss.read_index(index_path)
+    docstore = MmapDocstore(folder)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=docstore.index_to_docstore_id,
+    )
@@ -0,0 +1,146 @@
+"""
+Shared PDF text extraction.
+
+`extract_pdf_text` returns the text of the whole document. Large PDFs are
+split into page ranges extracted in a process pool; the bytes go to the
+workers once, as a temporary file, and each worker parses the document once
+for all the ranges it handles. Results are memoized by the SHA-256 of the file
+bytes (in memory and in a DiskCache), so the same upload is never parsed
+twice.
+"""
+import atexit
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Union
+
+import PyPDF2
+
+from utils.disk_cache import DiskCache
+from utils.tracing import span
+
+# Documents with at least this many pages are parsed in parallel page ranges.
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 40))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", 16))
+PDF_MAX_WORKERS = int(os.environ.get("PDF_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+
+_MEMORY_MAX_ENTRIES = 64
+_memory = OrderedDict()  # sha256(bytes) -> text
+_memory_lock = threading.Lock()
+_disk = DiskCache("pdf_text", max_entries=5_000, max_bytes=256 * 1024 * 1024)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _read_bytes(source) -> bytes:
+    """Bytes of a path, bytes object or file-like (rewound afterwards so callers can re-read it)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    position = source.tell() if source.seekable() else None
+    data = source.read()
+    if position is not None:
+        source.seek(position)
+    return data
+
+
+def _extract_range(reader: PyPDF2.PdfReader, start: int, stop: int) -> List[str]:
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+_worker_document = None  # (path, sha256, PdfReader) last parsed by this pool worker
+
+
+def _extract_file_range(path: str, digest: str, start: int, stop: int) -> List[str]:
+    # Runs in a pool worker: only the path is pickled, and the reader is reused for the next range.
+    global _worker_document
+    if _worker_document is None or _worker_document[:2] != (path, digest):
+        _worker_document = (path, digest, PyPDF2.PdfReader(path))
+    return _extract_range(_worker_document[2], start, stop)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Never fork: the pool starts lazily inside a threaded server (Streamlit, uvicorn), and a
+            # forked child can inherit locks held by other threads (gcsfs, SQLite, logging) and hang.
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+            )
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next parallel extraction starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _page_texts(data: bytes, digest: str, parallel: bool) -> List[str]:
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    if not parallel or PDF_MAX_WORKERS < 2 or page_count < PDF_PARALLEL_MIN_PAGES:
+        return _extract_range(reader, 0, page_count)
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        pool = _get_pool()
+        try:
+            futures = [pool.submit(_extract_file_range, path, digest, start, stop) for start, stop in ranges]
+            return [text for future in futures for text in future.result()]
+        except BrokenProcessPool:
+            # A worker died (OOM, killed); finish this document in-thread rather than failing the upload.
+            _discard_pool(pool)
+            return _extract_range(reader, 0, page_count)
+    finally:
+        os.unlink(path)
+
+
+def extract_pdf_text(source: Union[str, bytes, io.IOBase], parallel: bool = True) -> str:
+    """
+    Text of every page joined by newlines, memoized by content hash.
+
+    `source` may be a path, the file's bytes or a file-like object such as a
+    Streamlit upload. Pass parallel=False when already running inside a worker
+    process.
+    """
+    data = _read_bytes(source)
+    digest = hashlib.sha256(data).hexdigest()
+    with _memory_lock:
+        if digest in _memory:
+            _memory.move_to_end(digest)
+            return _memory[digest]
+
+    cached = _disk.get(digest)
+    if cached is not None:
+        text = cached.decode("utf-8")
+    else:
+        with span("pdf.extract", pdf_bytes=len(data)) as fields:
+            pages = _page_texts(data, digest, parallel)
+            fields["pages"] = len(pages)
+        text = "\n".join(page for page in pages if page).strip()
+        _disk.set(digest, text.encode("utf-8"))
+
+    with _memory_lock:
+        _memory[digest] = text
+        while len(_memory) > _MEMORY_MAX_ENTRIES:
+            _memory.popitem(last=False)
+    return text
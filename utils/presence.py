@@ -0,0 +1,245 @@
+"""
+Process-wide presence tracking and admission control.
+
+Heartbeats are O(1): each user id is filed under the time bucket of its last
+heartbeat, and whole buckets are dropped once they fall out of the TTL window,
+so counting never scans every session. The default backend is in-memory and
+shared by every Streamlit session in the process; PRESENCE_BACKEND=sqlite
+stores presence in a SQLite file (PRESENCE_DB_PATH) so several workers on a
+host see the same counts.
+
+The same store tracks in-flight LLM requests, so `admit` can turn new work
+away when the app is already near its rate limits.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from utils.disk_cache import DEFAULT_CACHE_DIR
+
+PRESENCE_TTL_SECONDS = float(os.environ.get("PRESENCE_TTL_SECONDS", 60))
+PRESENCE_BUCKET_SECONDS = float(os.environ.get("PRESENCE_BUCKET_SECONDS", 10))
+PRESENCE_BACKEND = os.environ.get("PRESENCE_BACKEND", "memory")
+PRESENCE_DB_PATH = os.environ.get("PRESENCE_DB_PATH", os.path.join(DEFAULT_CACHE_DIR, "presence.sqlite3"))
+# In-flight LLM requests allowed across the app before new ones are turned away (0 disables).
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", 16))
+# Slots held longer than this are assumed to belong to a crashed request.
+ADMISSION_SLOT_TTL_SECONDS = float(os.environ.get("ADMISSION_SLOT_TTL_SECONDS", 300))
+
+
+class MemoryPresenceBackend:
+    """Presence for a single process; buckets are ordered oldest first."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # bucket -> set of user ids
+        self._last_bucket = {}  # user id -> bucket of its latest heartbeat
+        self._slots = {}  # kind -> {token: expires_at}
+
+    def heartbeat(self, user_id: str, bucket: int):
+        with self._lock:
+            previous = self._last_bucket.get(user_id)
+            if previous == bucket:
+                return
+            if previous is not None:
+                self._buckets.get(previous, set()).discard(user_id)
+            if bucket not in self._buckets:
+                self._buckets[bucket] = set()
+            self._buckets[bucket].add(user_id)
+            self._last_bucket[user_id] = bucket
+
+    def leave(self, user_id: str):
+        with self._lock:
+            previous = self._last_bucket.pop(user_id, None)
+            if previous is not None:
+                self._buckets.get(previous, set()).discard(user_id)
+
+    def count(self, oldest_bucket: int) -> int:
+        with self._lock:
+            while self._buckets:
+                bucket = next(iter(self._buckets))
+                if bucket >= oldest_bucket:
+                    break
+                for user_id in self._buckets.pop(bucket):
+                    self._last_bucket.pop(user_id, None)
+            return len(self._last_bucket)
+
+    def acquire(self, kind: str, token: str, limit: int, slot_ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            slots = self._slots.setdefault(kind, {})
+            for stale in [t for t, expires_at in slots.items() if expires_at < now]:
+                del slots[stale]
+            if len(slots) >= limit:
+                return False
+            slots[token] = now + slot_ttl
+            return True
+
+    def release(self, kind: str, token: str):
+        with self._lock:
+            self._slots.get(kind, {}).pop(token, None)
+
+    def in_flight(self, kind: str) -> int:
+        now = time.time()
+        with self._lock:
+            return sum(1 for expires_at in self._slots.get(kind, {}).values() if expires_at >= now)
+
+
+class SQLitePresenceBackend:
+    """
+    Presence shared through a SQLite file, for several workers on one host.
+
+    The bucket column is indexed, so expiry is a range delete rather than a
+    scan. A key/value service such as Redis can replace this class as long as
+    it offers the same five methods.
+    """
+
+    def __init__(self, path: str = PRESENCE_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS presence (user_id TEXT PRIMARY KEY, bucket INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS presence_bucket ON presence (bucket)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slots ("
+                " token TEXT PRIMARY KEY, kind TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS slots_kind ON slots (kind, expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def heartbeat(self, user_id: str, bucket: int):
+        self._conn().execute("INSERT OR REPLACE INTO presence (user_id, bucket) VALUES (?, ?)", (user_id, bucket))
+
+    def leave(self, user_id: str):
+        self._conn().execute("DELETE FROM presence WHERE user_id = ?", (user_id,))
+
+    def count(self, oldest_bucket: int) -> int:
+        conn = self._conn()
+        conn.execute("DELETE FROM presence WHERE bucket < ?", (oldest_bucket,))
+        return conn.execute("SELECT COUNT(*) FROM presence").fetchone()[0]
+
+    def acquire(self, kind: str, token: str, limit: int, slot_ttl: float) -> bool:
+        now = time.time()
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so count-then-insert is atomic across workers.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM slots WHERE kind = ? AND expires_at < ?", (kind, now))
+            held = conn.execute("SELECT COUNT(*) FROM slots WHERE kind = ?", (kind,)).fetchone()[0]
+            if held >= limit:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT INTO slots (token, kind, expires_at) VALUES (?, ?, ?)", (token, kind, now + slot_ttl)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, kind: str, token: str):
+        self._conn().execute("DELETE FROM slots WHERE token = ?", (token,))
+
+    def in_flight(self, kind: str) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM slots WHERE kind = ? AND expires_at >= ?", (kind, time.time())
+        ).fetchone()[0]
+
+
+class PresenceTracker:
+    """Counts users seen within `ttl_seconds`, to the resolution of `bucket_seconds`."""
+
+    def __init__(
+        self,
+        backend=None,
+        ttl_seconds: float = PRESENCE_TTL_SECONDS,
+        bucket_seconds: float = PRESENCE_BUCKET_SECONDS,
+    ):
+        self.backend = backend or MemoryPresenceBackend()
+        self.ttl_seconds = ttl_seconds
+        self.bucket_seconds = bucket_seconds
+        # Skip backend writes while a user's heartbeat would land in the same bucket.
+        self._written = {}
+        self._written_lock = threading.Lock()
+
+    def _bucket(self, now: Optional[float] = None) -> int:
+        return int((now if now is not None else time.time()) // self.bucket_seconds)
+
+    def heartbeat(self, user_id: str) -> int:
+        """Mark `user_id` as active and return the number of active users."""
+        bucket = self._bucket()
+        with self._written_lock:
+            stale = self._written.get(user_id) != bucket
+            self._written[user_id] = bucket
+        if stale:
+            try:
+                self.backend.heartbeat(user_id, bucket)
+            except Exception:
+                with self._written_lock:
+                    self._written.pop(user_id, None)
+                raise
+        return self.active_count()
+
+    def leave(self, user_id: str):
+        with self._written_lock:
+            self._written.pop(user_id, None)
+        self.backend.leave(user_id)
+
+    def active_count(self) -> int:
+        # A bucket counts while any part of it is inside the TTL window.
+        oldest = self._bucket(time.time() - self.ttl_seconds)
+        with self._written_lock:
+            if len(self._written) > 10_000:
+                self._written = {u: b for u, b in self._written.items() if b >= oldest}
+        return self.backend.count(oldest)
+
+    def in_flight(self, kind: str = "llm") -> int:
+        return self.backend.in_flight(kind)
+
+    @contextmanager
+    def admit(self, kind: str = "llm", limit: Optional[int] = None, slot_ttl: float = ADMISSION_SLOT_TTL_SECONDS):
+        """
+        Hold one of `limit` slots of `kind` for the duration of the block.
+
+        Yields False (and holds nothing) when every slot is taken, so callers
+        can show a "busy" message instead of queueing more LLM calls. A limit
+        of None or 0 admits everything.
+        """
+        if not limit:
+            yield True
+            return
+        token = uuid.uuid4().hex
+        admitted = self.backend.acquire(kind, token, limit, slot_ttl)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.backend.release(kind, token)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_presence_tracker() -> PresenceTracker:
+    """The process-wide tracker; PRESENCE_BACKEND=sqlite shares it across workers."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            backend = SQLitePresenceBackend() if PRESENCE_BACKEND == "sqlite" else MemoryPresenceBackend()
+            _tracker = PresenceTracker(backend)
+        return _tracker
@@ -0,0 +1,24 @@
+"""Freshness stats written by prewarm.py after each cycle and shown in the app's sidebar."""
+import json
+import os
+
+from utils.disk_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_STATS_PATH = os.path.join(DEFAULT_CACHE_DIR, "prewarm_stats.json")
+
+
+def write_stats(path: str, stats: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(stats, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def load_stats(path: str = DEFAULT_STATS_PATH):
+    """The last cycle's freshness stats, or None if the warmer hasn't run on this host."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from utils.hybrid import HybridScope, bm25_for
+from utils.programs import TIMESPRO_URLS, slug
+
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="shard-search")
+_warmed = set()
+_warm_lock = threading.Lock()
+
+
+class ProgramIndex:
+    """
+    One search interface over every program vectorstore, sharded by program.
+
+    `load_shard(url)` returns the FAISS store for a program; it is expected to
+    be backed by the process-wide vectorstore cache, so each shard is loaded
+    once per process no matter how many ProgramIndex objects point at it.
+    A query is embedded once and searched only in the selected shards
+    (pre-filtering by program); hits are tagged with `metadata["program"]`.
+    """
+
+    def __init__(self, load_shard: Callable[[str], object], program_urls: Sequence[str] = TIMESPRO_URLS):
+        self.load_shard = load_shard
+        self.program_urls = list(program_urls)
+
+    def warm_in_background(self, name: str = "default"):
+        """Load every shard and its keyword index on a daemon thread, once per process, so switching programs is free."""
+        with _warm_lock:
+            if name in _warmed:
+                return
+            _warmed.add(name)
+
+        def warm():
+            for url in self.program_urls:
+                try:
+                    bm25_for(self.load_shard(url))
+                except Exception:
+                    pass  # the foreground load will surface the error to the user
+
+        threading.Thread(target=warm, daemon=True, name="program-index-warm").start()
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        programs: Optional[List[str]] = None,
+        filter: Optional[Dict] = None,
+        fetch_k: int = 20,
+    ):
+        urls = programs or self.program_urls
+        shards = [(url, self.load_shard(url)) for url in urls]
+        if not shards:
+            return []
+        vector = shards[0][1].embedding_function.embed_query(query)
+
+        def search(item):
+            url, shard = item
+            hits = shard.similarity_search_with_score_by_vector(vector, k=k, filter=filter, fetch_k=fetch_k)
+            program = slug(url)
+            return [
+                (Document(page_content=doc.page_content, metadata={**doc.metadata, "program": program}), score)
+                for doc, score in hits
+            ]
+
+        results = _search_pool.map(search, shards) if len(shards) > 1 else [search(shards[0])]
+        # All shards share one embedding model and L2 metric, so distances are comparable.
+        merged = [hit for hits in results for hit in hits]
+        merged.sort(key=lambda hit: hit[1])
+        return merged[:k]
+
+    def scoped(self, programs: List[str], filter: Optional[Dict] = None) -> "ProgramScope":
+        return ProgramScope(self, programs, filter)
+
+    def hybrid(self, programs: List[str], filter: Optional[Dict] = None, **options):
+        """Like `scoped`, but fusing BM25 keyword search with FAISS (see utils.hybrid)."""
+        return HybridScope(self, programs, filter, **options)
+
+
+class ProgramScope:
+    """A ProgramIndex restricted to some programs, usable as a retriever's vectorstore."""
+
+    def __init__(self, index: ProgramIndex, programs: List[str], filter: Optional[Dict] = None):
+        self.index = index
+        self.programs = programs
+        self.filter = filter
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.index.similarity_search_with_score(
+            query, k=k, programs=self.programs, filter=self.filter, **kwargs
+        )
@@ -0,0 +1,22 @@
+# TimesPro programs that have a prebuilt vectorstore under vectorstores/.
+TIMESPRO_URLS = [
+    "https://timespro.com/executive-education/iim-calcutta-senior-management-programme",
+    "https://timespro.com/executive-education/iim-kashipur-senior-management-programme",
+    "https://timespro.com/executive-education/iim-raipur-senior-management-programme",
+    "https://timespro.com/executive-education/iim-indore-senior-management-programme",
+    "https://timespro.com/executive-education/iim-kozhikode-strategic-management-programme-for-cxos",
+    "https://timespro.com/executive-education/iim-calcutta-lead-an-advanced-management-programme",
+]
+
+
+def slug(url: str) -> str:
+    return url.split("/executive-education/")[1] if "/executive-education/" in url else url
+
+
+def sanitize_url(url: str) -> str:
+    return url.strip("/").split("/")[-1].replace("-", "_")
+
+
+def vectorstore_folder(url: str) -> str:
+    """Folder name of a program's vectorstore, e.g. timespro_com_executive_education_iim_..."""
+    return f"timespro_com_executive_education_{sanitize_url(url)}"
@@ -0,0 +1,106 @@
+import math
+import re
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.tokens import count_tokens
+from utils.tracing import span
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my of on or "
+    "our so than that the their them there this to was we what when where which who why will "
+    "with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def dedupe_near_duplicates(docs: List[Document], threshold: float = 0.8) -> List[Document]:
+    """Drop documents whose word-shingle Jaccard similarity to a higher-ranked one exceeds `threshold`."""
+    kept, kept_shingles = [], []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / (len(shingles | other) or 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def rerank(query: str, docs: List[Document], lexical_weight: float = 0.5) -> List[Document]:
+    """
+    Blend the vector-search rank with IDF-weighted query-term coverage.
+
+    Scores are rank based rather than distance based, so this works for any
+    candidate source regardless of its score scale.
+    """
+    if not docs:
+        return []
+    terms = set(tokenize(query))
+    doc_terms = [set(tokenize(d.page_content)) for d in docs]
+    idf = {t: math.log(1 + len(docs) / (1 + sum(t in dt for dt in doc_terms))) for t in terms}
+    total_idf = sum(idf.values()) or 1.0
+
+    scored = []
+    for rank, (doc, dt) in enumerate(zip(docs, doc_terms)):
+        rank_prior = 1 - rank / len(docs)
+        coverage = sum(idf[t] for t in terms if t in dt) / total_idf
+        scored.append(((1 - lexical_weight) * rank_prior + lexical_weight * coverage, rank, doc))
+    scored.sort(key=lambda s: (-s[0], s[1]))
+    return [doc for _, _, doc in scored]
+
+
+def pack_to_budget(docs: List[Document], token_budget: int, max_docs: int, model: str = "gpt-4o") -> List[Document]:
+    """Greedily take the best documents that still fit in `token_budget`."""
+    packed, used = [], 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content, model)
+        if used + tokens > token_budget:
+            continue
+        packed.append(doc)
+        used += tokens
+        if len(packed) >= max_docs or token_budget - used < 50:
+            break
+    return packed
+
+
+class BudgetedRetriever(BaseRetriever):
+    """
+    Retriever that fetches `fetch_k` candidates, removes near-duplicates,
+    reranks them with a cheap local scorer and packs the best ones into
+    `token_budget` prompt tokens.
+
+    `vectorstore` only needs `similarity_search_with_score(query, k=...)`.
+    """
+
+    vectorstore: Any
+    fetch_k: int = 40
+    token_budget: int = 3000
+    max_docs: int = 12
+    dedup_threshold: float = 0.8
+    lexical_weight: float = 0.5
+    model: str = "gpt-4o"
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        with span("retrieval", fetch_k=self.fetch_k) as fields:
+            candidates = [doc for doc, _ in self.vectorstore.similarity_search_with_score(query, k=self.fetch_k)]
+            unique = dedupe_near_duplicates(candidates, self.dedup_threshold)
+            ranked = rerank(query, unique, self.lexical_weight)
+            packed = pack_to_budget(ranked, self.token_budget, self.max_docs, self.model)
+            fields.update(candidates=len(candidates), returned=len(packed))
+        return packed
@@ -0,0 +1,23 @@
+import random
+import time
+from typing import Callable
+
+
+def retry_with_backoff(
+    fn: Callable,
+    *args,
+    attempts: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    retry_on: tuple = (Exception,),
+    **kwargs,
+):
+    """Call `fn(*args, **kwargs)`, retrying with jittered exponential backoff."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on:
+            if attempt == attempts:
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,188 @@
+"""
+Object storage for job descriptions and generated questions.
+
+`S3Store` talks to S3 through one reused boto3 client; `LocalObjectStore`
+keeps the same layout under a local directory (<root>/<bucket>/<key>) so the
+batch tools run without AWS.
+
+Uploads are content-addressed: the SHA-256 of the body is stored as object
+metadata, and an upload whose hash matches the existing object is skipped.
+Large bodies go up as concurrent multipart uploads (S3_MULTIPART_THRESHOLD,
+S3_UPLOAD_CONCURRENCY).
+"""
+import hashlib
+import io
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+
+JOB_BUCKET = "tensorflow-titans-bucket"
+JOB_DESCRIPTIONS_PREFIX = "job_descriptions/"
+
+S3_MULTIPART_THRESHOLD = int(os.environ.get("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+S3_MULTIPART_CHUNKSIZE = int(os.environ.get("S3_MULTIPART_CHUNKSIZE", 8 * 1024 * 1024))
+S3_UPLOAD_CONCURRENCY = int(os.environ.get("S3_UPLOAD_CONCURRENCY", 8))
+SHA256_METADATA_KEY = "sha256"
+
+
+@dataclass
+class UploadResult:
+    key: str
+    url: str
+    sha256: str
+    skipped: bool  # True when identical content was already stored
+
+
+def read_upload(file) -> bytes:
+    """
+    The upload's bytes, read once.
+
+    Streamlit uploads are BytesIO objects, whose getvalue() shares the buffer
+    instead of copying it. Hand the returned bytes to both the upload and the
+    extractor; unlike the file object, they can be read any number of times.
+    """
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+def job_description_key(job_id: str, extension: str = "pdf") -> str:
+    return f"{JOB_DESCRIPTIONS_PREFIX}{job_id}.{extension}"
+
+
+class S3Store:
+    def __init__(self, bucket: str = JOB_BUCKET, client=None, **client_kwargs):
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3", **client_kwargs)
+        self.bucket = bucket
+        self.client = client
+
+    def list_keys(self, prefix: str = "") -> Iterator[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def url(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def stored_sha256(self, key: str) -> Optional[str]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head.get("Metadata", {}).get(SHA256_METADATA_KEY)
+
+    def upload(self, key: str, data: Union[bytes, io.IOBase], content_type: Optional[str] = None) -> UploadResult:
+        """Upload `data` unless the object already holds identical content."""
+        from boto3.s3.transfer import TransferConfig
+
+        data = read_upload(data)
+        digest = hashlib.sha256(data).hexdigest()
+        if self.stored_sha256(key) == digest:
+            return UploadResult(key, self.url(key), digest, skipped=True)
+
+        extra = {"Metadata": {SHA256_METADATA_KEY: digest}}
+        if content_type:
+            extra["ContentType"] = content_type
+        config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_UPLOAD_CONCURRENCY,
+            use_threads=True,
+        )
+        # BytesIO over bytes shares the buffer, so the body isn't copied again.
+        self.client.upload_fileobj(io.BytesIO(data), self.bucket, key, ExtraArgs=extra, Config=config)
+        return UploadResult(key, self.url(key), digest, skipped=False)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_s3_store(bucket: str = JOB_BUCKET, **client_kwargs) -> S3Store:
+    """One S3Store (and boto3 client) per bucket and credentials for the whole process."""
+    key = (bucket, tuple(sorted(client_kwargs.items())))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = S3Store(bucket, **client_kwargs)
+        return _stores[key]
+
+
+class LocalObjectStore:
+    """S3Store stand-in over a local directory, for development and offline runs."""
+
+    def __init__(self, root: str, bucket: str = JOB_BUCKET):
+        self.bucket = bucket
+        self.root = os.path.join(root, bucket)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def list_keys(self, prefix: str = "") -> Iterator[str]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in sorted(filenames):
+                key = os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and not name.endswith(".tmp"):
+                    yield key
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def get_bytes(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, like an S3 PUT: readers never see a partial object.
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def url(self, key: str) -> str:
+        return f"file://{os.path.abspath(self._path(key))}"
+
+    def stored_sha256(self, key: str) -> Optional[str]:
+        if not self.exists(key):
+            return None
+        return hashlib.sha256(self.get_bytes(key)).hexdigest()
+
+    def upload(self, key: str, data: Union[bytes, io.IOBase], content_type: Optional[str] = None) -> UploadResult:
+        data = read_upload(data)
+        digest = hashlib.sha256(data).hexdigest()
+        if self.stored_sha256(key) == digest:
+            return UploadResult(key, self.url(key), digest, skipped=True)
+        self.put_bytes(key, data, content_type)
+        return UploadResult(key, self.url(key), digest, skipped=False)
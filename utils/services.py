@@ -0,0 +1,313 @@
+"""
+Compare / ask / interview-question operations behind the HTTP API.
+
+Everything the Streamlit apps used to run inline lives here, free of any UI
+or web framework: api_server.py exposes these functions over HTTP and
+utils.api_client's in-process client calls them directly. Follow-up state is
+kept server-side in utils.sessions, so any worker can answer any session.
+
+LLM calls hold an `llm_slot` (LLM_MAX_IN_FLIGHT, across workers with
+PRESENCE_BACKEND=sqlite) and raise LLMBusyError when none frees up. Cached
+briefs never take one.
+"""
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from load_vectorstore_from_gcp import (
+    get_query_embeddings, load_vectorstore_from_gcp, prefetch_vectorstores, vectorstore_cache,
+)
+from utils import hybrid, vectorstore_mirror
+from utils.answer_pipeline import AnswerPipeline
+from utils.interview import DEFAULT_SYSTEM_PROMPT, generate_questions
+from utils.llm_chain import brief_flights, get_combined_response, stream_combined_response
+from utils.llm_clients import get_chat_model, llm_slot
+from utils.loaders import load_url_content, load_url_extracts
+from utils.memory import TokenBudgetMemory, build_static_context
+from utils.mmap_docstore import iter_documents
+from utils.pdf_extract import extract_pdf_text
+from utils.prewarm_stats import load_stats as load_prewarm_stats
+from utils.presence import get_presence_tracker
+from utils.program_index import ProgramIndex
+from utils.programs import TIMESPRO_URLS, vectorstore_folder
+from utils.retrieval import BudgetedRetriever
+from utils.sessions import get_session_store
+from utils.streaming import QueueCallbackHandler, StreamedResponse, stream_from_thread
+from utils.tokens import count_tokens
+from utils.tracing import LLMTraceHandler, tracer
+
+# Prompt tokens allowed for retrieved TimesPro chunks in each follow-up answer.
+RETRIEVAL_TOKEN_BUDGET = 3000
+# Conversation history kept verbatim before older turns are summarized.
+HISTORY_TOKEN_BUDGET = 1500
+# Each of the TimesPro page, competitor page and brief is trimmed to this for the answer prompt.
+STATIC_CONTEXT_TOKENS_PER_SECTION = 1200
+
+VECTORSTORE_BUCKET = os.environ.get("VECTORSTORE_BUCKET", "test_bucket_brian")
+VECTORSTORE_PREFIX = os.environ.get("VECTORSTORE_PREFIX", "vectorstores")
+
+ANSWER_SYSTEM_TEMPLATE = """
+You are a smart, sales-savvy AI assistant helping learners and internal sales teams understand and compare educational programs.
+You're informed by three sources:
+1. Vectorstore-based TimesPro documents (for factual answers).
+2. Web content from TimesPro and competitor URLs (for additional insights).
+3. A previously generated sales brief (optional).
+
+Use all relevant info to provide insightful, strategic, and helpful answers. Intelligently fill in with general knowledge even when the details aren't available. Keep the tone clear, concise, and helpful.
+Avoid mentioning platform names like Coursera, Emeritus, etc.
+
+--- TIMESPRO VECTORSTORE ---
+{context}
+
+{static_context}
+"""
+
+_gcp_credentials = None
+_program_index = None
+_prefetch_started = False
+_config_lock = threading.Lock()
+
+
+def configure(gcp_credentials: Optional[dict] = None):
+    """Set the service account used for the vectorstore bucket (Streamlit passes its secret)."""
+    global _gcp_credentials
+    with _config_lock:
+        _gcp_credentials = gcp_credentials
+
+
+def gcp_credentials() -> dict:
+    """Configured credentials, else the JSON file named by GCP_SERVICE_ACCOUNT_FILE."""
+    with _config_lock:
+        if _gcp_credentials is not None:
+            return _gcp_credentials
+    path = os.environ.get("GCP_SERVICE_ACCOUNT_FILE") or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if not path:
+        raise RuntimeError("No GCP credentials: call services.configure() or set GCP_SERVICE_ACCOUNT_FILE")
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_program_shard(url: str):
+    return load_vectorstore_from_gcp(
+        bucket_name=VECTORSTORE_BUCKET,
+        path=f"{VECTORSTORE_PREFIX}/{vectorstore_folder(url)}",
+        creds_dict=gcp_credentials(),
+    )
+
+
+def get_program_index() -> ProgramIndex:
+    """The process-wide index over every program shard, warmed in the background on first use."""
+    global _program_index
+    with _config_lock:
+        if _program_index is None:
+            _program_index = ProgramIndex(load_program_shard, TIMESPRO_URLS)
+            _program_index.warm_in_background()
+        return _program_index
+
+
+def prefetch():
+    """
+    Sync every program's vectorstore mirror in parallel, then load the program
+    index, on a daemon thread; once per process. Called at startup so the
+    first user doesn't wait for downloads.
+    """
+    global _prefetch_started
+    with _config_lock:
+        if _prefetch_started:
+            return
+        _prefetch_started = True
+
+    def run():
+        try:
+            prefetch_vectorstores(VECTORSTORE_BUCKET, VECTORSTORE_PREFIX, gcp_credentials())
+        except Exception:
+            pass  # no credentials yet; the first session loads its shard in the foreground
+        get_program_index()
+
+    threading.Thread(target=run, daemon=True, name="vectorstore-prefetch").start()
+
+
+def _check_programs(urls: Iterable[str]):
+    unknown = [url for url in urls if url not in TIMESPRO_URLS]
+    if unknown:
+        raise ValueError(f"Not a TimesPro program URL: {', '.join(unknown)}")
+
+
+# === Briefs ===
+
+def generate_brief(timespro_url: str, competitor_url: str, model: str = "gpt-4o", use_cache: bool = True) -> str:
+    url_texts = load_url_content([timespro_url, competitor_url])
+    return get_combined_response(
+        "", url_texts, timespro_url=timespro_url, competitor_url=competitor_url,
+        model_choice=model, use_cache=use_cache,
+    )
+
+
+def stream_brief(
+    timespro_url: str,
+    competitor_url: str,
+    model: str = "gpt-4o",
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+) -> StreamedResponse:
+    """Streamed brief; with `session_id`, the finished text is saved as that session's brief."""
+    if session_id is not None:
+        get_session(session_id)
+    url_texts = load_url_content([timespro_url, competitor_url])
+    response = stream_combined_response(
+        "", url_texts, timespro_url=timespro_url, competitor_url=competitor_url,
+        model_choice=model, use_cache=use_cache,
+    )
+    on_complete = None
+    if session_id is not None:
+        on_complete = lambda r: get_session_store().update(session_id, brief=r.text)  # noqa: E731
+    return StreamedResponse(response, on_complete=on_complete)
+
+
+def preview(program_url: str, competitor_url: str = "", n_docs: int = 5, char_limit: int = 5000) -> Dict:
+    """The first program chunks and the cleaned competitor page, as shown by "Print Extracted Data"."""
+    _check_programs([program_url])
+    docs = list(iter_documents(get_program_index().load_shard(program_url).docstore))[:n_docs]
+    result = {"program": "\n\n--- DOC SPLIT ---\n\n".join(d.page_content for d in docs)[:char_limit]}
+    if competitor_url:
+        extract = load_url_extracts([competitor_url])[competitor_url]
+        result.update(competitor=extract.text[:char_limit], competitor_tokens=extract.token_count)
+    return result
+
+
+# === Sessions ===
+
+def _public(session: dict) -> Dict:
+    memory = session.pop("memory")
+    return {**session, "turns": memory["turns"], "summary": memory["summary"]}
+
+
+def create_session(
+    program_url: str, competitor_url: str = "", extra_programs: Iterable[str] = (), brief: str = ""
+) -> Dict:
+    extra_programs = list(extra_programs or [])
+    _check_programs([program_url] + extra_programs)
+    # Load the shard now so a missing vectorstore fails the create, not the first question.
+    get_program_index().load_shard(program_url)
+    return _public(get_session_store().create(program_url, competitor_url, extra_programs, brief))
+
+
+def get_session(session_id: str) -> Dict:
+    return _public(get_session_store().get(session_id))
+
+
+def update_session(session_id: str, **fields) -> Dict:
+    programs = ([fields["program_url"]] if fields.get("program_url") else []) + list(fields.get("extra_programs") or [])
+    _check_programs(programs)
+    if fields.get("program_url"):
+        get_program_index().load_shard(fields["program_url"])
+    return _public(get_session_store().update(session_id, **fields))
+
+
+def delete_session(session_id: str):
+    get_session_store().delete(session_id)
+
+
+def ask(session_id: str, question: str, callbacks: Optional[list] = None) -> Dict:
+    """Answer a follow-up in the session's context and save the turn to its memory."""
+    if not question.strip():
+        raise ValueError("Empty question")
+    store = get_session_store()
+    session = store.get(session_id)
+    program_url, competitor_url = session["program_url"], session["competitor_url"]
+
+    memory = TokenBudgetMemory(
+        memory_key="chat_history", input_key="question", output_key="answer",
+        return_messages=True, max_token_limit=HISTORY_TOKEN_BUDGET,
+        summary_llm=get_chat_model("gpt-4o-mini", temperature=0),
+        on_summary=lambda summary: store.set_summary(session_id, summary),
+    )
+    memory.restore_state(session["memory"])
+    retriever = BudgetedRetriever(
+        vectorstore=get_program_index().hybrid([program_url] + session["extra_programs"]),
+        fetch_k=40,
+        token_budget=RETRIEVAL_TOKEN_BUDGET,
+    )
+    pipeline = AnswerPipeline(
+        # Only the answer model streams; the condense-question call stays silent.
+        answer_llm=get_chat_model("gpt-4o", temperature=0.4, streaming=True).with_config(
+            callbacks=[LLMTraceHandler("llm.answer")]
+        ),
+        condense_llm=get_chat_model("gpt-4o", temperature=0.4).with_config(
+            callbacks=[LLMTraceHandler("llm.condense")]
+        ),
+        retriever=retriever,
+        memory=memory,
+        system_template=ANSWER_SYSTEM_TEMPLATE,
+    )
+
+    def static_context():
+        pages = load_url_content([u for u in (program_url, competitor_url) if u])
+        return build_static_context(
+            {
+                "TIMESPRO URL CONTENT": pages.get(program_url, ""),
+                "COMPETITOR URL CONTENT": pages.get(competitor_url, "") if competitor_url else "",
+                "SALES BRIEF (if any)": session["brief"],
+            },
+            STATIC_CONTEXT_TOKENS_PER_SECTION,
+        )
+
+    with llm_slot():
+        result = pipeline.run(question, static_context, callbacks=callbacks)
+    store.save_turns(session_id, memory.export_state()["turns"], session["rev"])
+
+    docs = result["source_documents"]
+    return {
+        "answer": result["answer"],
+        "condensed": result["condensed"],
+        "retrieval_query": result["retrieval_query"],
+        "sources": [doc.metadata for doc in docs],
+        "turn_tokens": {
+            "static_context": result["static_tokens"],
+            **memory.last_turn_tokens,
+            "retrieved": sum(count_tokens(d.page_content) for d in docs),
+        },
+    }
+
+
+def stream_ask(session_id: str, question: str, result: dict) -> StreamedResponse:
+    """Streamed `ask`; its return value lands in `result["output"]` once the stream is exhausted."""
+    get_session_store().get(session_id)
+    handler = QueueCallbackHandler()
+    return StreamedResponse(
+        stream_from_thread(lambda: ask(session_id, question, callbacks=[handler]), handler, result)
+    )
+
+
+# === Interview questions ===
+
+def interview_questions(
+    job_id: str,
+    job_description: str = "",
+    pdf_bytes: Optional[bytes] = None,
+    num_questions: int = 10,
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+    model: str = "gpt-4",
+) -> List[str]:
+    """Questions for a job description given as text or as the PDF's bytes."""
+    if pdf_bytes:
+        job_description = extract_pdf_text(pdf_bytes)
+    if not job_description:
+        raise ValueError("No job description text (empty or image-only PDF?)")
+    with llm_slot():
+        return generate_questions(job_description, job_id, num_questions, system_prompt, model)
+
+
+def stats() -> Dict:
+    prewarm = load_prewarm_stats()
+    return {
+        "vectorstores": vectorstore_cache.stats(),
+        "vectorstore_mirror": vectorstore_mirror.stats(),
+        "query_embeddings": get_query_embeddings().stats(),
+        "hybrid_retrieval": hybrid.stats(),
+        "stage_latency": tracer.snapshot(),
+        "llm_in_flight": get_presence_tracker().in_flight("llm"),
+        "coalesced_briefs": brief_flights.stats(),
+        "prewarm": {"started_at": prewarm["started_at"], "briefs": prewarm["briefs"]["by_status"]} if prewarm else None,
+    }
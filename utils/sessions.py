@@ -0,0 +1,154 @@
+"""
+Server-side chat sessions for the follow-up chatbot.
+
+A session holds what a follow-up question needs between requests: the
+selected program, competitor and extra programs, the sales brief and the
+chat memory (TokenBudgetMemory.export_state: recent turns plus the running
+summary). Rows live in SQLite, so every API worker on the host sees the same
+sessions and any worker can answer the next question. Sessions idle for
+SESSION_TTL_SECONDS are purged when new ones are created.
+
+Each row carries a `rev` that every turn bumps. `save_turns` only writes if
+the rev is still the one the question was answered against, so two
+concurrent questions on one session can't silently drop a turn; the loser
+gets SessionConflict. The summary is written on its own (`set_summary`) and
+never overwritten by a turn save.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+from utils.disk_cache import DEFAULT_CACHE_DIR
+
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", os.path.join(DEFAULT_CACHE_DIR, "sessions.sqlite3"))
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", 24 * 3600))
+
+SESSION_FIELDS = ("program_url", "competitor_url", "extra_programs", "brief")
+
+
+class SessionNotFound(KeyError):
+    """Raised for unknown or expired session ids."""
+
+
+class SessionConflict(RuntimeError):
+    """Raised when another request saved a turn to the session first."""
+
+
+class SessionStore:
+    """Chat sessions in a SQLite file shared by the workers on one host."""
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, program_url TEXT NOT NULL, competitor_url TEXT NOT NULL,"
+            " extra_programs TEXT NOT NULL, brief TEXT NOT NULL, memory TEXT NOT NULL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL, rev INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row["name"] for row in self._conn().execute("PRAGMA table_info(sessions)")}
+        if "rev" not in columns:  # files written before sessions had revisions
+            self._conn().execute("ALTER TABLE sessions ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        self._conn().execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        session = dict(row)
+        session["extra_programs"] = json.loads(session["extra_programs"])
+        session["memory"] = json.loads(session["memory"])
+        return session
+
+    def create(
+        self, program_url: str, competitor_url: str = "", extra_programs: Iterable[str] = (), brief: str = ""
+    ) -> dict:
+        self.purge()
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO sessions (id, program_url, competitor_url, extra_programs, brief, memory, created_at,"
+            " updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, program_url, competitor_url or "", json.dumps(list(extra_programs)), brief or "",
+             json.dumps({"summary": "", "turns": []}), now, now),
+        )
+        return self.get(session_id)
+
+    def get(self, session_id: str) -> dict:
+        row = self._conn().execute(
+            "SELECT * FROM sessions WHERE id = ? AND updated_at >= ?", (session_id, time.time() - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            raise SessionNotFound(session_id)
+        return self._to_dict(row)
+
+    def update(self, session_id: str, **fields) -> dict:
+        unknown = set(fields) - set(SESSION_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown session fields: {', '.join(sorted(unknown))}")
+        if "extra_programs" in fields:
+            fields["extra_programs"] = json.dumps(list(fields["extra_programs"] or []))
+        for name in ("competitor_url", "brief"):
+            if name in fields:
+                fields[name] = fields[name] or ""
+        self._write(session_id, fields)
+        return self.get(session_id)
+
+    def save_turns(self, session_id: str, turns: list, rev: int):
+        """Store the memory's turns if the session is still at `rev`; the stored summary is kept."""
+        cursor = self._conn().execute(
+            "UPDATE sessions SET memory = json_set(memory, '$.turns', json(?)), rev = rev + 1, updated_at = ?"
+            " WHERE id = ? AND rev = ?",
+            (json.dumps(turns), time.time(), session_id, rev),
+        )
+        if cursor.rowcount == 0:
+            self.get(session_id)  # raises SessionNotFound if it expired meanwhile
+            raise SessionConflict(f"Session {session_id} was updated by another request; ask again")
+
+    def set_summary(self, session_id: str, summary: str):
+        """Store a summary folded in after the turn was saved, keeping the stored turns."""
+        self._conn().execute(
+            "UPDATE sessions SET memory = json_set(memory, '$.summary', ?) WHERE id = ?", (summary, session_id)
+        )
+
+    def _write(self, session_id: str, columns: dict):
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        cursor = self._conn().execute(
+            f"UPDATE sessions SET {assignments}, updated_at = ? WHERE id = ?",
+            (*columns.values(), time.time(), session_id),
+        )
+        if cursor.rowcount == 0:
+            raise SessionNotFound(session_id)
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge(self) -> int:
+        cursor = self._conn().execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        return cursor.rowcount
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide session store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
@@ -0,0 +1,84 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+_DONE = object()
+
+
+class StreamedResponse:
+    """
+    Wraps a token iterator so the UI can draw tokens as they arrive.
+
+    Iterate it (e.g. with `st.write_stream`) to receive tokens. Once exhausted,
+    `text` holds the full completion and the two latencies are filled in:
+    `time_to_first_token` and `total_latency`, both in seconds from the start
+    of iteration. `on_complete` is called with the finished response.
+    """
+
+    def __init__(self, tokens: Iterable[str], on_complete: Optional[Callable] = None):
+        self._tokens = tokens
+        self._on_complete = on_complete
+        self.text = ""
+        self.time_to_first_token = None
+        self.total_latency = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        parts = []
+        for token in self._tokens:
+            if not token:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+            parts.append(token)
+            yield token
+        self.total_latency = time.perf_counter() - start
+        if self.time_to_first_token is None:
+            self.time_to_first_token = self.total_latency
+        self.text = "".join(parts)
+        if self._on_complete is not None:
+            self._on_complete(self)
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Pushes each new LLM token onto a queue read by `stream_from_thread`."""
+
+    # queue.put never blocks, so async runs can call this on the event loop instead of an executor.
+    run_inline = True
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self.queue.put(token)
+
+
+def stream_from_thread(run: Callable, handler: QueueCallbackHandler, result: dict):
+    """
+    Run a blocking chain call in a worker thread and yield its tokens.
+
+    `run` is called with no arguments; its return value is stored in
+    `result["output"]` once the generator is exhausted. Exceptions raised by
+    `run` are re-raised in the consuming thread.
+    """
+    def target():
+        try:
+            result["output"] = run()
+        except Exception as e:
+            result["error"] = e
+        finally:
+            handler.queue.put(_DONE)
+
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    while True:
+        token = handler.queue.get()
+        if token is _DONE:
+            break
+        yield token
+    worker.join()
+    if "error" in result:
+        raise result["error"]
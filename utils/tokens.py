@@ -0,0 +1,60 @@
+import threading
+import time
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken ships with langchain-openai, but keep a fallback
+    tiktoken = None
+
+# After a failed load (usually the BPE download), wait this long before trying tiktoken again.
+ENCODING_RETRY_SECONDS = 60
+
+_encodings = {}
+_failed_at = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    """tiktoken encoding for `model`, or None if tiktoken or its BPE files are unavailable right now."""
+    if tiktoken is None:
+        return None
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    if time.monotonic() - _failed_at.get(model, float("-inf")) < ENCODING_RETRY_SECONDS:
+        return None
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken downloads BPE files on first use; don't fail a request over it, and don't
+        # remember the failure for longer than the backoff.
+        with _encodings_lock:
+            _failed_at[model] = time.monotonic()
+        return None
+    with _encodings_lock:
+        _encodings[model] = encoding
+        _failed_at.pop(model, None)
+    return encoding
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Token count for `text`; falls back to ~4 characters per token without tiktoken."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,192 @@
+"""
+Lightweight per-stage latency and token tracing.
+
+    with span("url.fetch", url=url):
+        ...
+
+Finished spans are aggregated per name (count, p50/p95/max latency, tokens)
+and, when TRACE_EXPORT_PATH is set, appended to that file as JSON lines.
+TRACE_METRICS_PORT starts a local HTTP endpoint serving the aggregates at
+/metrics. `profile_request` dumps a cProfile file for one request when
+PROFILE_REQUESTS=1 (or when forced by the caller).
+"""
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.tokens import count_tokens
+
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH")
+TRACE_METRICS_PORT = os.environ.get("TRACE_METRICS_PORT")
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/jobready_profiles")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class Tracer:
+    def __init__(self, export_path: str = TRACE_EXPORT_PATH, window: int = 500):
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+        self._tokens = defaultdict(lambda: {"prompt": 0, "completion": 0})
+
+    def record(self, name: str, duration_seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0, **attrs):
+        """Record a finished stage; used directly when a `with` block doesn't fit (e.g. streams)."""
+        with self._lock:
+            self._durations[name].append(duration_seconds * 1000)
+            self._counts[name] += 1
+            self._tokens[name]["prompt"] += prompt_tokens
+            self._tokens[name]["completion"] += completion_tokens
+        if self.export_path:
+            record = {
+                "name": name,
+                "trace_id": _current_trace.get(),
+                "ts": time.time(),
+                "duration_ms": round(duration_seconds * 1000, 2),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                **attrs,
+            }
+            with self._lock, open(self.export_path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block. Extra attributes or token counts can be set on the yielded dict."""
+        token = None
+        if _current_trace.get() is None:
+            token = _current_trace.set(uuid.uuid4().hex[:12])
+        fields = dict(attrs)
+        start = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields["error"] = repr(e)
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, **fields)
+            if token is not None:
+                _current_trace.reset(token)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": self._counts[name],
+                    "p50_ms": round(_percentile(durations, 0.5), 2),
+                    "p95_ms": round(_percentile(durations, 0.95), 2),
+                    "max_ms": round(max(durations), 2) if durations else 0.0,
+                    "prompt_tokens": self._tokens[name]["prompt"],
+                    "completion_tokens": self._tokens[name]["completion"],
+                }
+                for name, durations in self._durations.items()
+            }
+
+
+tracer = Tracer()
+span = tracer.span
+
+
+class LLMTraceHandler(BaseCallbackHandler):
+    """
+    Records an LLM call as a span named `name`, with prompt/completion tokens.
+
+    Uses the provider's token_usage when present; streamed responses don't
+    report it, so the prompt and completion are counted locally instead.
+    """
+
+    def __init__(self, name: str, model: str = "gpt-4o"):
+        self.name = name
+        self.model = model
+        self._runs = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._runs[run_id] = (time.perf_counter(), sum(count_tokens(p, self.model) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        text = "\n".join(str(m.content) for batch in messages for m in batch)
+        self._runs[run_id] = (time.perf_counter(), count_tokens(text, self.model))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start, prompt_tokens = self._runs.pop(run_id, (time.perf_counter(), 0))
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion = "".join(g.text for gens in response.generations for g in gens)
+        tracer.record(
+            self.name,
+            time.perf_counter() - start,
+            prompt_tokens=usage.get("prompt_tokens", prompt_tokens),
+            completion_tokens=usage.get("completion_tokens", count_tokens(completion, self.model)),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start, _ = self._runs.pop(run_id, (time.perf_counter(), 0))
+        tracer.record(self.name, time.perf_counter() - start, error=repr(error))
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def start_metrics_server(port=TRACE_METRICS_PORT, host: str = "127.0.0.1"):
+    """Serve `tracer.snapshot()` as JSON on http://host:port/metrics, once per process."""
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_lock:
+        if _metrics_server is not None:
+            return _metrics_server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = json.dumps(tracer.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            _metrics_server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+        except OSError:
+            return None  # another worker already owns the port
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True, name="metrics-server").start()
+        return _metrics_server
+
+
+@contextmanager
+def profile_request(name: str, enabled: bool = False):
+    """Dump a cProfile file for this block to PROFILE_DIR when profiling is on."""
+    if not (enabled or PROFILE_REQUESTS):
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.prof")
+        profiler.dump_stats(path)
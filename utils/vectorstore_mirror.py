@@ -0,0 +1,280 @@
+"""
+Per-program local mirror of the vectorstore folders in GCS.
+
+Each program path gets its own directory under VECTORSTORE_MIRROR_DIR:
+
+    <bucket>_<path>/
+        versions/<version>/   complete files for one set of GCS object generations
+        current               symlink to the published version
+        .lock
+
+`VectorstoreMirror.sync` compares the GCS generations with the manifest of
+the current version and downloads only the objects that changed, streamed in
+MIRROR_CHUNK_BYTES chunks; unchanged files are hard-linked from the current
+version. Each download is pinned to its listed generation (read by
+generation on version-aware filesystems, and re-checked after the copy), so
+an upload landing mid-sync raises GenerationChanged instead of mixing bytes
+from two uploads under the old generation. The new version is assembled in a
+staging directory, renamed into versions/ and published by replacing the
+`current` symlink in one rename, so a reader never sees a half-written
+folder. A sync only publishes generations newer than the current ones; a
+caller still holding older generations gets its folder back, or the current
+one, without rolling the mirror back, and is told which generations the
+folder holds. Files are never rewritten in place, so a store that still
+memory-maps an older version keeps working. Every sync touches the folder it
+returns, and versions used within MIRROR_PRUNE_GRACE_SECONDS are not pruned,
+so a loader has time to open what it was handed.
+Syncs of the same program from other threads or worker processes wait on
+the lock file. The mirror lives under the shared cache dir, so it survives
+restarts and a fresh worker only fetches what changed since.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from utils.disk_cache import DEFAULT_CACHE_DIR
+from utils.fs_utils import make_staging_dir
+
+VECTORSTORE_MIRROR_DIR = os.environ.get("VECTORSTORE_MIRROR_DIR", os.path.join(DEFAULT_CACHE_DIR, "vectorstores"))
+MIRROR_CHUNK_BYTES = int(os.environ.get("VECTORSTORE_MIRROR_CHUNK_BYTES", 1024 * 1024))
+# Staging folders left behind by a crashed sync are removed after this long.
+STALE_STAGING_SECONDS = 3600
+# A version handed out by a sync within this long is kept, even once superseded.
+MIRROR_PRUNE_GRACE_SECONDS = float(os.environ.get("VECTORSTORE_MIRROR_PRUNE_GRACE_SECONDS", 300))
+
+MANIFEST_FILE = "mirror_manifest.json"
+# Written by build_vectorstores.upload_folder after the files it lists: {"generations": ..., "sizes": ...}.
+UPLOAD_MANIFEST_FILE = "upload_manifest.json"
+CURRENT_LINK = "current"
+
+_stats_lock = threading.Lock()
+mirror_stats = {"syncs": 0, "published": 0, "downloaded_files": 0, "downloaded_bytes": 0, "linked_files": 0}
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            mirror_stats[name] += value
+
+
+class GenerationChanged(IOError):
+    """The object was replaced in GCS while it was being mirrored."""
+
+
+def object_generation(info: dict) -> str:
+    """Generation of an fsspec `info` entry; mtime for filesystems without object generations."""
+    return str(info.get("generation") or info.get("mtime") or info.get("updated"))
+
+
+def _generation_key(generation: str):
+    # GCS generations are integers; the mtime fallbacks may be floats or timestamps.
+    for number in (int, float):
+        try:
+            return 0, number(generation)
+        except (TypeError, ValueError):
+            pass
+    return 1, str(generation)
+
+
+def _is_newer(wanted: Dict[str, str], current: Dict[str, str]) -> bool:
+    """True unless some object in `wanted` is older than in `current`; objects new to the layout count as newer."""
+    return all(
+        _generation_key(generation) >= _generation_key(current[name])
+        for name, generation in wanted.items() if name in current
+    )
+
+
+def version_id(generations: Tuple[Tuple[str, str], ...]) -> str:
+    return hashlib.sha256(repr(tuple(generations)).encode()).hexdigest()[:16]
+
+
+def _link_or_copy(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class VectorstoreMirror:
+    """Local copy of one GCS vectorstore folder (`bucket_path`), versioned by object generation."""
+
+    def __init__(self, bucket_path: str, root_dir: str = VECTORSTORE_MIRROR_DIR):
+        self.bucket_path = bucket_path.strip("/")
+        self.root = os.path.join(root_dir, self.bucket_path.replace("/", "_"))
+        self.versions_dir = os.path.join(self.root, "versions")
+        self.current_link = os.path.join(self.root, CURRENT_LINK)
+
+    def current_version(self) -> Optional[str]:
+        try:
+            return os.path.basename(os.readlink(self.current_link))
+        except OSError:
+            return None
+
+    def current(self) -> Optional[str]:
+        """Folder of the published version, or None before the first sync."""
+        version = self.current_version()
+        return os.path.join(self.versions_dir, version) if version else None
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.versions_dir, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _manifest(folder: Optional[str]) -> Dict[str, str]:
+        if not folder:
+            return {}
+        try:
+            with open(os.path.join(folder, MANIFEST_FILE)) as f:
+                return json.load(f)["generations"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def sync(
+        self, fs, generations: Tuple[Tuple[str, str], ...], sizes: Optional[Dict[str, int]] = None
+    ) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        """
+        Make the version for `generations` ((filename, generation), ...) current.
+
+        Returns (folder, generations of the files in that folder). `fs` is the
+        fsspec filesystem holding `bucket_path`; it is only read for files
+        whose generation differs from the current version. If the current
+        version is already newer than `generations` (a caller with a stale
+        listing), nothing is published: the folder for `generations` is
+        returned if it is still on disk, else the current one with its own
+        generations.
+        """
+        version = version_id(generations)
+        folder = os.path.join(self.versions_dir, version)
+        if self.current_version() == version and self._touch(folder):
+            return folder, tuple(generations)
+
+        with self._locked():
+            _count(syncs=1)
+            wanted = dict(generations)
+            previous = self.current_version()
+            current_generations = self._manifest(self.current())
+            if previous is not None and not _is_newer(wanted, current_generations):
+                if self._manifest(folder) != wanted:
+                    folder, generations = self.current(), tuple(current_generations.items())
+                self._touch(folder)
+                return folder, tuple(generations)
+            if self._manifest(folder) != wanted:
+                self._assemble(fs, folder, generations, sizes or {})
+            self._touch(folder)
+            if previous != version:
+                self._publish(version)
+                self._prune(keep={version, previous})
+        return folder, tuple(generations)
+
+    @staticmethod
+    def _touch(folder: str) -> bool:
+        """Mark a version as just handed out, so `_prune` leaves it alone for a while; False if it is gone."""
+        try:
+            os.utime(folder)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _assemble(self, fs, folder: str, generations, sizes: Dict[str, int]):
+        current = self.current()
+        current_generations = self._manifest(current)
+        staging = make_staging_dir(folder)
+        try:
+            for name, generation in generations:
+                target = os.path.join(staging, name)
+                if current_generations.get(name) == generation and os.path.exists(os.path.join(current, name)):
+                    _link_or_copy(os.path.join(current, name), target)
+                    _count(linked_files=1)
+                else:
+                    self._download(fs, name, generation, target, sizes.get(name))
+            with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+                json.dump({"bucket_path": self.bucket_path, "generations": dict(generations),
+                           "synced_at": time.time()}, f)
+            # A folder without a matching manifest is a leftover of an older layout; replace it.
+            shutil.rmtree(folder, ignore_errors=True)
+            os.rename(staging, folder)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _download(self, fs, name: str, generation: str, target: str, expected_size: Optional[int]):
+        path = f"{self.bucket_path}/{name}"
+        written = 0
+        # One reused chunk buffer, so peak memory stays at MIRROR_CHUNK_BYTES whatever the file size.
+        buffer = bytearray(MIRROR_CHUNK_BYTES)
+        view = memoryview(buffer)
+        options = {"generation": generation} if getattr(fs, "version_aware", False) else {}
+        with fs.open(path, "rb", block_size=MIRROR_CHUNK_BYTES, **options) as f_in, \
+                open(target, "wb") as f_out:
+            while True:
+                n = f_in.readinto(buffer)
+                if not n:
+                    break
+                f_out.write(view[:n])
+                written += n
+        if not options:
+            # Generations only move forward: if it still matches after the copy, so did every byte read.
+            if hasattr(fs, "invalidate_cache"):
+                fs.invalidate_cache(path)
+            current = object_generation(fs.info(path))
+            if current != generation:
+                raise GenerationChanged(f"{path}: generation {generation} was replaced by {current} during download")
+        if expected_size and written != expected_size:
+            raise IOError(f"{path}: got {written} of {expected_size} bytes")
+        _count(downloaded_files=1, downloaded_bytes=written)
+
+    def _publish(self, version: str):
+        staging_link = os.path.join(self.root, f".{CURRENT_LINK}.{os.getpid()}.{threading.get_ident()}")
+        if os.path.lexists(staging_link):
+            os.unlink(staging_link)
+        os.symlink(os.path.join("versions", version), staging_link)
+        os.replace(staging_link, self.current_link)
+        _count(published=1)
+
+    def _prune(self, keep: set):
+        """
+        Drop versions other than `keep` (the current one and the one it replaced) and stale staging dirs.
+
+        Versions handed out within MIRROR_PRUNE_GRACE_SECONDS are kept too,
+        since their caller may not have opened the files yet.
+        """
+        for entry in os.listdir(self.versions_dir):
+            path = os.path.join(self.versions_dir, entry)
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if entry.startswith("."):
+                if age > STALE_STAGING_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif entry not in keep and age > MIRROR_PRUNE_GRACE_SECONDS:
+                # Mapped files stay readable after unlink on POSIX.
+                shutil.rmtree(path, ignore_errors=True)
+
+
+_mirrors: Dict[str, VectorstoreMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(bucket_path: str) -> VectorstoreMirror:
+    with _mirrors_lock:
+        if bucket_path not in _mirrors:
+            _mirrors[bucket_path] = VectorstoreMirror(bucket_path)
+        return _mirrors[bucket_path]
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(mirror_stats)